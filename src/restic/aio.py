@@ -0,0 +1,492 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import sys
+from asyncio.subprocess import PIPE, Process
+from contextlib import suppress
+from re import MULTILINE, search
+from subprocess import CalledProcessError
+from typing import TYPE_CHECKING, Any, assert_never, cast
+
+from restic.logging import LOGGER
+from restic.progress import decode_message, parse_progress
+from restic.repo import expand_repo_options, get_repo_env
+from restic.results import (
+    BackupResult,
+    CopyResult,
+    ForgetResult,
+    PruneResult,
+    RestoreResult,
+    time_phase,
+)
+from restic.settings import SETTINGS, resolve_settings
+from restic.utilities import (
+    describe_paths,
+    expand_bool,
+    expand_dry_run,
+    expand_exclude,
+    expand_exclude_i,
+    expand_include,
+    expand_include_i,
+    expand_keep,
+    expand_keep_within,
+    expand_max,
+    expand_tag,
+    format_size,
+    parse_size,
+    to_paths,
+    yield_password_env,
+)
+
+if TYPE_CHECKING:
+    from asyncio import StreamReader
+    from collections.abc import AsyncIterator, Mapping, Sequence
+
+    from utilities.types import PathLike
+
+    from restic.progress import Message, ProgressCallback
+    from restic.repo import Repo
+    from restic.types import PasswordLike
+
+
+_LINE_LIMIT = 64 * 1024 * 1024
+_QUIET_PROGRESS_INTERVAL = 3600
+_TERMINATE_TIMEOUT = 10
+
+
+async def astream_json(
+    cmd: str, /, *args: str, env: Mapping[str, str] | None = None
+) -> AsyncIterator[Message]:
+    env_use = None if env is None else {**os.environ, **env}
+    process = await asyncio.create_subprocess_exec(
+        cmd, *args, stdout=PIPE, stderr=PIPE, env=env_use, limit=_LINE_LIMIT
+    )
+    stderr: list[str] = []
+    drain = asyncio.create_task(_drain(process.stderr, stderr))
+    try:
+        async for line in cast("StreamReader", process.stdout):
+            if (stripped := line.decode(errors="replace").strip()) != "":
+                yield decode_message(stripped)
+        return_code = await process.wait()
+        await drain
+    except BaseException:
+        _ = drain.cancel()
+        await _terminate(process)
+        raise
+    if return_code != 0:
+        raise CalledProcessError(
+            return_code, [cmd, *args], output=None, stderr="".join(stderr)
+        )
+
+
+@resolve_settings
+async def backup(
+    path: PathLike | Sequence[PathLike],
+    repo: Repo,
+    /,
+    *,
+    password: PasswordLike = SETTINGS.password,
+    dry_run: bool = SETTINGS.dry_run,
+    exclude: list[str] | None = SETTINGS.exclude_backup,
+    exclude_i: list[str] | None = SETTINGS.exclude_i_backup,
+    progress: ProgressCallback | None = None,
+    progress_interval: int = SETTINGS.progress_interval,
+    read_concurrency: int = SETTINGS.read_concurrency,
+    tag: list[str] | None = SETTINGS.tag_backup,
+    restic_cache_dir: PathLike | None = SETTINGS.restic_cache_dir,
+    timeout: float | None = None,
+) -> BackupResult:
+    paths = to_paths(path)
+    desc = describe_paths(paths)
+    LOGGER.info("Backing up %s to '%s'...", desc, repo)
+    result = BackupResult()
+    args = [
+        "backup",
+        *expand_repo_options(repo),
+        *expand_dry_run(dry_run=dry_run),
+        *expand_exclude(exclude=exclude),
+        *expand_exclude_i(exclude_i=exclude_i),
+        "--read-concurrency",
+        str(read_concurrency),
+        *expand_tag(tag=tag),
+        *map(str, paths),
+    ]
+    async with asyncio.timeout(timeout):
+        with yield_password_env(password=password) as password_env:
+            env = {
+                **get_repo_env(repo, restic_cache_dir=restic_cache_dir),
+                **password_env,
+            }
+            try:
+                with time_phase(result.timings, "backup"):
+                    messages = await _run(
+                        *args,
+                        env=env,
+                        progress=progress,
+                        progress_interval=progress_interval,
+                    )
+            except CalledProcessError as error:
+                if not search(
+                    "Is there a repository at the following location?",
+                    error.stderr,
+                    flags=MULTILINE,
+                ):
+                    raise
+                LOGGER.info("Auto-initializing repo...")
+                with time_phase(result.timings, "init"):
+                    await _init(repo, env=env)
+                with time_phase(result.timings, "backup"):
+                    messages = await _run(
+                        *args,
+                        env=env,
+                        progress=progress,
+                        progress_interval=progress_interval,
+                    )
+    result.add_messages(messages)
+    LOGGER.info(
+        "Backed up %s to '%s'; snapshots %s, %d new/%d changed/%d unmodified files, %s added",
+        desc,
+        repo,
+        result.snapshot_ids,
+        result.files_new,
+        result.files_changed,
+        result.files_unmodified,
+        format_size(result.data_added),
+    )
+    return result
+
+
+@resolve_settings
+async def copy(
+    src: Repo,
+    dest: Repo,
+    /,
+    *,
+    src_password: PasswordLike = SETTINGS.password,
+    dest_password: PasswordLike = SETTINGS.password,
+    connections: int | None = SETTINGS.connections,
+    limit_download: int | None = SETTINGS.limit_download,
+    limit_upload: int | None = SETTINGS.limit_upload,
+    progress: ProgressCallback | None = None,
+    progress_interval: int = SETTINGS.progress_interval,
+    tag: list[str] | None = SETTINGS.tag_copy,
+    snapshots: Sequence[str] | None = None,
+    timeout: float | None = None,
+) -> CopyResult:
+    LOGGER.info("Copying snapshots from '%s' to '%s'...", src, dest)
+    result = CopyResult()
+    args = [
+        "copy",
+        *expand_repo_options(
+            dest,
+            src=src,
+            connections=connections,
+            limit_download=limit_download,
+            limit_upload=limit_upload,
+        ),
+        *(expand_tag(tag=tag) if snapshots is None else snapshots),
+    ]
+    async with asyncio.timeout(timeout):
+        with (
+            yield_password_env(
+                password=src_password, env_var="RESTIC_FROM_PASSWORD_FILE"
+            ) as src_env,
+            yield_password_env(password=dest_password) as dest_env,
+            time_phase(result.timings, "copy"),
+        ):
+            env = {
+                **get_repo_env(src, env_var="RESTIC_FROM_REPOSITORY"),
+                **get_repo_env(dest),
+                **src_env,
+                **dest_env,
+            }
+            result.add_messages(
+                await _run(
+                    *args,
+                    env=env,
+                    progress=progress,
+                    progress_interval=progress_interval,
+                )
+            )
+    LOGGER.info(
+        "Finished copying %d snapshot(s) from '%s' to '%s'",
+        len(result.snapshot_ids),
+        src,
+        dest,
+    )
+    return result
+
+
+@resolve_settings
+async def forget(
+    repo: Repo,
+    /,
+    *,
+    password: PasswordLike = SETTINGS.password,
+    dry_run: bool = SETTINGS.dry_run,
+    keep_last: int | None = SETTINGS.keep_last,
+    keep_hourly: int | None = SETTINGS.keep_hourly,
+    keep_daily: int | None = SETTINGS.keep_daily,
+    keep_weekly: int | None = SETTINGS.keep_weekly,
+    keep_monthly: int | None = SETTINGS.keep_monthly,
+    keep_yearly: int | None = SETTINGS.keep_yearly,
+    keep_within: str | None = SETTINGS.keep_within,
+    keep_within_hourly: str | None = SETTINGS.keep_within_hourly,
+    keep_within_daily: str | None = SETTINGS.keep_within_daily,
+    keep_within_weekly: str | None = SETTINGS.keep_within_weekly,
+    keep_within_monthly: str | None = SETTINGS.keep_within_monthly,
+    keep_within_yearly: str | None = SETTINGS.keep_within_yearly,
+    prune: bool = SETTINGS.prune,
+    tag: list[str] | None = SETTINGS.tag_forget,
+    timeout: float | None = None,
+) -> ForgetResult:
+    LOGGER.info("Forgetting snapshots in '%s'...", repo)
+    result = ForgetResult()
+    args = [
+        "forget",
+        *expand_repo_options(repo),
+        *expand_dry_run(dry_run=dry_run),
+        *expand_keep("last", n=keep_last),
+        *expand_keep("hourly", n=keep_hourly),
+        *expand_keep("daily", n=keep_daily),
+        *expand_keep("weekly", n=keep_weekly),
+        *expand_keep("monthly", n=keep_monthly),
+        *expand_keep("yearly", n=keep_yearly),
+        *expand_keep_within("within", duration=keep_within),
+        *expand_keep_within("within-hourly", duration=keep_within_hourly),
+        *expand_keep_within("within-daily", duration=keep_within_daily),
+        *expand_keep_within("within-weekly", duration=keep_within_weekly),
+        *expand_keep_within("within-monthly", duration=keep_within_monthly),
+        *expand_keep_within("within-yearly", duration=keep_within_yearly),
+        *expand_bool("prune", bool_=prune),
+        *expand_tag(tag=tag),
+    ]
+    async with asyncio.timeout(timeout):
+        with (
+            yield_password_env(password=password) as password_env,
+            time_phase(result.timings, "forget"),
+        ):
+            env = {**get_repo_env(repo), **password_env}
+            result.add_messages(await _run(*args, env=env))
+    LOGGER.info(
+        "Finished forgetting snapshots in '%s'; kept %d, removed %d",
+        repo,
+        result.kept,
+        result.removed,
+    )
+    return result
+
+
+@resolve_settings
+async def init(
+    repo: Repo,
+    /,
+    *,
+    password: PasswordLike = SETTINGS.password,
+    timeout: float | None = None,
+) -> None:
+    LOGGER.info("Initializing '%s'", repo)
+    async with asyncio.timeout(timeout):
+        with yield_password_env(password=password) as password_env:
+            await _init(repo, env={**get_repo_env(repo), **password_env})
+    LOGGER.info("Finished initializing '%s'", repo)
+
+
+@resolve_settings
+async def prune(
+    repo: Repo,
+    /,
+    *,
+    password: PasswordLike = SETTINGS.password,
+    dry_run: bool = SETTINGS.dry_run,
+    max_unused: str | None = SETTINGS.max_unused,
+    max_repack_size: str | None = SETTINGS.max_repack_size,
+    min_reclaim: str | None = SETTINGS.min_reclaim,
+    min_unused_pct: float | None = SETTINGS.min_unused_pct,
+    timeout: float | None = None,
+) -> PruneResult:
+    LOGGER.info("Estimating reclaimable space in '%s'...", repo)
+    result = PruneResult()
+    args = [
+        "prune",
+        *expand_repo_options(repo),
+        *expand_max("unused", value=max_unused),
+        *expand_max("repack-size", value=max_repack_size),
+    ]
+    async with asyncio.timeout(timeout):
+        with yield_password_env(password=password) as password_env:
+            env = {**get_repo_env(repo), **password_env}
+            with time_phase(result.timings, "estimate"):
+                result.add_messages([
+                    m async for m in astream_json("restic", *args, "--dry-run", env=env)
+                ])
+            if not result.exceeds(
+                min_reclaim=None if min_reclaim is None else parse_size(min_reclaim),
+                min_unused_pct=min_unused_pct,
+            ):
+                LOGGER.info("Skipping pruning '%s'; below thresholds", repo)
+            elif dry_run:
+                LOGGER.info("Would prune '%s'", repo)
+            else:
+                LOGGER.info("Pruning '%s'...", repo)
+                with time_phase(result.timings, "prune"):
+                    async for message in astream_json("restic", *args, env=env):
+                        _write(message)
+                result.pruned = True
+    LOGGER.info("Finished pruning '%s'", repo)
+    return result
+
+
+@resolve_settings
+async def restore(
+    repo: Repo,
+    target: PathLike,
+    /,
+    *,
+    password: PasswordLike = SETTINGS.password,
+    delete: bool = SETTINGS.delete,
+    dry_run: bool = SETTINGS.dry_run,
+    exclude: list[str] | None = SETTINGS.exclude_restore,
+    exclude_i: list[str] | None = SETTINGS.exclude_i_restore,
+    include: list[str] | None = SETTINGS.include_restore,
+    include_i: list[str] | None = SETTINGS.include_i_restore,
+    progress: ProgressCallback | None = None,
+    progress_interval: int = SETTINGS.progress_interval,
+    verify: bool = False,
+    tag: list[str] | None = SETTINGS.tag_restore,
+    snapshot: str = SETTINGS.snapshot,
+    timeout: float | None = None,
+) -> RestoreResult:
+    LOGGER.info("Restoring snapshot '%s' of '%s' to '%s'...", snapshot, repo, target)
+    result = RestoreResult()
+    args = [
+        "restore",
+        *expand_repo_options(repo),
+        *expand_bool("delete", bool_=delete),
+        *expand_dry_run(dry_run=dry_run),
+        *expand_exclude(exclude=exclude),
+        *expand_exclude_i(exclude_i=exclude_i),
+        *expand_include(include=include),
+        *expand_include_i(include_i=include_i),
+        *expand_tag(tag=tag),
+        "--target",
+        str(target),
+        *expand_bool("verify", bool_=verify),
+        snapshot,
+    ]
+    async with asyncio.timeout(timeout):
+        with (
+            yield_password_env(password=password) as password_env,
+            time_phase(result.timings, "restore"),
+        ):
+            env = {**get_repo_env(repo), **password_env}
+            result.add_messages(
+                await _run(
+                    *args,
+                    env=env,
+                    progress=progress,
+                    progress_interval=progress_interval,
+                )
+            )
+    LOGGER.info(
+        "Finished restoring snapshot '%s' of '%s' to '%s'; %d files, %s restored",
+        snapshot,
+        repo,
+        target,
+        result.files_restored,
+        format_size(result.bytes_restored),
+    )
+    return result
+
+
+@resolve_settings
+async def snapshots(
+    repo: Repo,
+    /,
+    *,
+    password: PasswordLike = SETTINGS.password,
+    tag: list[str] | None = None,
+    timeout: float | None = None,
+) -> list[dict[str, Any]]:
+    args = ["snapshots", "--no-lock", *expand_repo_options(repo), *expand_tag(tag=tag)]
+    async with asyncio.timeout(timeout):
+        with yield_password_env(password=password) as password_env:
+            env = {**get_repo_env(repo), **password_env}
+            return [
+                s
+                async for m in astream_json("restic", "--json", *args, env=env)
+                if isinstance(m, list)
+                for s in m
+            ]
+
+
+async def _drain(stream: StreamReader | None, lines: list[str], /) -> None:
+    if stream is None:
+        return
+    async for line in stream:
+        text = line.decode(errors="replace")
+        lines.append(text)
+        _ = sys.stderr.write(text)
+
+
+async def _init(repo: Repo, /, *, env: Mapping[str, str]) -> None:
+    async for message in astream_json(
+        "restic", "init", *expand_repo_options(repo), env=env
+    ):
+        _write(message)
+
+
+@resolve_settings
+async def _run(
+    *args: str,
+    env: Mapping[str, str] | None = None,
+    progress: ProgressCallback | None = None,
+    progress_interval: int = SETTINGS.progress_interval,
+) -> list[Message]:
+    interval = _QUIET_PROGRESS_INTERVAL if progress is None else progress_interval
+    env_use = {**({} if env is None else env), "RESTIC_PROGRESS_FPS": str(1 / interval)}
+    messages: list[Message] = []
+    async for message in astream_json("restic", "--json", *args, env=env_use):
+        match message:
+            case str():
+                _write(message)
+                messages.append(message)
+            case {"message_type": "status"}:
+                if (progress is not None) and (
+                    (progress_i := parse_progress(message)) is not None
+                ):
+                    progress(progress_i)
+            case dict() | list():
+                messages.append(message)
+            case never:
+                assert_never(never)
+    return messages
+
+
+async def _terminate(process: Process, /) -> None:
+    with suppress(ProcessLookupError):
+        process.terminate()
+    try:
+        _ = await asyncio.wait_for(process.wait(), timeout=_TERMINATE_TIMEOUT)
+    except TimeoutError:
+        with suppress(ProcessLookupError):
+            process.kill()
+        _ = await process.wait()
+
+
+def _write(message: Message, /) -> None:
+    if isinstance(message, str):
+        _ = sys.stdout.write(f"{message}\n")
+
+
+__all__ = [
+    "astream_json",
+    "backup",
+    "copy",
+    "forget",
+    "init",
+    "prune",
+    "restore",
+    "snapshots",
+]
@@ -0,0 +1,340 @@
+from __future__ import annotations
+
+import datetime as dt
+import json
+import platform
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from random import Random
+from subprocess import check_call, check_output
+from tempfile import TemporaryDirectory
+from typing import TYPE_CHECKING, Any, Self
+
+from restic.lib import backup, copy, forget, init, restore
+from restic.logging import LOGGER
+from restic.repo import Local
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Iterator
+
+    from utilities.types import PathLike
+
+
+_KIB = 1024
+_MIB = 1024 * _KIB
+_COPY_BATCH_SIZE = 100
+_PASSWORD = "benchmark"  # noqa: S105
+_REPORT_VERSION = 1
+
+
+@dataclass(kw_only=True, slots=True)
+class BenchmarkResult:
+    dataset: str
+    operation: str
+    params: dict[str, Any] = field(default_factory=dict)
+    seconds: list[float] = field(default_factory=list)
+    files: int = 0
+    bytes: int = 0
+
+    @property
+    def best(self) -> float:
+        return min(self.seconds)
+
+    @property
+    def key(self) -> str:
+        params = ",".join(f"{k}={v}" for k, v in sorted(self.params.items()))
+        return f"{self.dataset}/{self.operation}[{params}]"
+
+    @classmethod
+    def parse(cls, data: dict[str, Any], /) -> Self:
+        return cls(
+            dataset=data["dataset"],
+            operation=data["operation"],
+            params=data.get("params", {}),
+            seconds=data["seconds"],
+            files=data.get("files", 0),
+            bytes=data.get("bytes", 0),
+        )
+
+
+@dataclass(kw_only=True, slots=True)
+class Comparison:
+    key: str
+    old: float
+    new: float
+    regressed: bool = False
+
+    @property
+    def ratio(self) -> float:
+        return self.new / self.old if self.old > 0 else float("inf")
+
+
+def compare_reports(
+    old: Iterable[BenchmarkResult],
+    new: Iterable[BenchmarkResult],
+    /,
+    *,
+    threshold: float = 0.1,
+) -> list[Comparison]:
+    old_by_key = {r.key: r for r in old}
+    return [
+        Comparison(
+            key=r.key,
+            old=old_by_key[r.key].best,
+            new=r.best,
+            regressed=r.best > old_by_key[r.key].best * (1 + threshold),
+        )
+        for r in new
+        if r.key in old_by_key
+    ]
+
+
+def make_dataset(
+    name: str, path: PathLike, /, *, scale: float = 1.0, seed: int = 0
+) -> None:
+    try:
+        maker = _DATASETS[name]
+    except KeyError:
+        msg = f"Invalid dataset {name!r}; expected one of {sorted(_DATASETS)}"
+        raise ValueError(msg) from None
+    root = Path(path)
+    root.mkdir(parents=True, exist_ok=True)
+    maker(root, Random(seed), scale)
+
+
+def measure_startup(module: str = "restic.cli", /, *, repeats: int = 5) -> list[float]:
+    seconds: list[float] = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        _ = check_call([sys.executable, "-c", f"import {module}"])
+        seconds.append(time.perf_counter() - start)
+    return seconds
+
+
+def read_report(path: PathLike, /) -> list[BenchmarkResult]:
+    data = json.loads(Path(path).read_text())
+    if data.get("version") != _REPORT_VERSION:
+        msg = f"Unsupported benchmark report version {data.get('version')!r}"
+        raise ValueError(msg)
+    return [BenchmarkResult.parse(r) for r in data["results"]]
+
+
+def run_benchmarks(
+    *,
+    datasets: Iterable[str] | None = None,
+    read_concurrency: Iterable[int] = (2,),
+    repeats: int = 1,
+    scale: float = 1.0,
+    work_dir: PathLike | None = None,
+) -> list[BenchmarkResult]:
+    results = [
+        BenchmarkResult(
+            dataset="startup",
+            operation="import",
+            params={"module": "restic.cli"},
+            seconds=measure_startup(repeats=max(repeats, 5)),
+        )
+    ]
+    with TemporaryDirectory(dir=work_dir) as temp:
+        for name in sorted(_DATASETS) if datasets is None else datasets:
+            data = Path(temp, "data", name)
+            LOGGER.info("Creating dataset '%s'...", name)
+            make_dataset(name, data, scale=scale)
+            for n in read_concurrency:
+                results.extend(
+                    _run_dataset(name, data, Path(temp, f"{name}-{n}"), n, repeats)
+                )
+    return results
+
+
+def write_report(results: Iterable[BenchmarkResult], path: PathLike, /) -> None:
+    data = {
+        "version": _REPORT_VERSION,
+        "created": dt.datetime.now(dt.UTC).isoformat(),
+        "python": platform.python_version(),
+        "restic": check_output(["restic", "version"], text=True).strip(),
+        "results": [asdict(r) for r in results],
+    }
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    _ = path.write_text(json.dumps(data, indent=2))
+
+
+def _make_deep(root: Path, random: Random, scale: float, /) -> None:
+    path = root
+    for i in range(64):
+        path = path.joinpath(f"level-{i}")
+        path.mkdir()
+        for j in range(max(round(4 * scale), 1)):
+            _ = path.joinpath(f"file-{j}").write_bytes(random.randbytes(4 * _KIB))
+
+
+def _make_duplicate(root: Path, random: Random, scale: float, /) -> None:
+    block = random.randbytes(_MIB)
+    for i in range(max(round(100 * scale), 1)):
+        _ = root.joinpath(f"file-{i}").write_bytes(block)
+
+
+def _make_huge(root: Path, random: Random, scale: float, /) -> None:
+    size = max(round(128 * _MIB * scale), _MIB)
+    for i in range(2):
+        with root.joinpath(f"file-{i}").open("wb") as fh:
+            for _ in range(0, size, _MIB):
+                _ = fh.write(random.randbytes(_MIB))
+
+
+def _make_tiny(root: Path, random: Random, scale: float, /) -> None:
+    for i in range(max(round(5000 * scale), 1)):
+        path = root.joinpath(f"dir-{i % 50}", f"file-{i}")
+        path.parent.mkdir(exist_ok=True)
+        _ = path.write_bytes(random.randbytes(_KIB))
+
+
+_DATASETS: dict[str, Callable[[Path, Random, float], None]] = {
+    "deep": _make_deep,
+    "duplicate": _make_duplicate,
+    "huge": _make_huge,
+    "tiny": _make_tiny,
+}
+
+
+def _run_dataset(
+    name: str, data: Path, work: Path, read_concurrency: int, repeats: int, /
+) -> list[BenchmarkResult]:
+    params = {"read_concurrency": read_concurrency}
+    cache_dir, restic_cache_dir = work.joinpath("cache"), work.joinpath("restic-cache")
+    ops = ["backup", "backup-unchanged", "restore", "forget", "copy"]
+    results = {
+        op: BenchmarkResult(dataset=name, operation=op, params=params) for op in ops
+    }
+    for i in range(repeats):
+        LOGGER.info(
+            "Benchmarking '%s' (read_concurrency=%d, run %d/%d)...",
+            name,
+            read_concurrency,
+            i + 1,
+            repeats,
+        )
+        repo, mirror = (
+            Local(work.joinpath(f"repo-{i}")),
+            Local(work.joinpath(f"mirror-{i}")),
+        )
+        for op in ["backup", "backup-unchanged"]:
+            with _timed(results[op]):
+                backup_result = backup(
+                    data,
+                    repo,
+                    chmod=False,
+                    chown=None,
+                    password=_PASSWORD,
+                    dry_run=False,
+                    exclude=None,
+                    exclude_i=None,
+                    groups=None,
+                    read_concurrency=read_concurrency,
+                    auto_read_concurrency=False,
+                    skip_unchanged=False,
+                    tag_backup=None,
+                    run_forget=False,
+                    cache_dir=cache_dir,
+                    restic_cache_dir=restic_cache_dir,
+                    max_cache_size=None,
+                    metrics=None,
+                    retries=0,
+                    sleep=None,
+                )
+            results[op].files = backup_result.total_files_processed
+            results[op].bytes = backup_result.total_bytes_processed
+        with _timed(results["restore"]):
+            restore_result = restore(
+                repo,
+                work.joinpath(f"target-{i}"),
+                password=_PASSWORD,
+                restic_cache_dir=restic_cache_dir,
+                delete=False,
+                dry_run=False,
+                exclude=None,
+                exclude_i=None,
+                include=None,
+                include_i=None,
+                shards=None,
+                verify="none",
+                tag=None,
+                snapshot="latest",
+                metrics=None,
+            )
+        results["restore"].files = restore_result.files_restored
+        results["restore"].bytes = restore_result.bytes_restored
+        with _timed(results["forget"]):
+            _ = forget(
+                repo,
+                password=_PASSWORD,
+                restic_cache_dir=restic_cache_dir,
+                cache_dir=cache_dir,
+                dry_run=False,
+                keep_last=1,
+                keep_hourly=None,
+                keep_daily=None,
+                keep_weekly=None,
+                keep_monthly=None,
+                keep_yearly=None,
+                keep_within=None,
+                keep_within_hourly=None,
+                keep_within_daily=None,
+                keep_within_weekly=None,
+                keep_within_monthly=None,
+                keep_within_yearly=None,
+                prune=True,
+                max_unused=None,
+                max_repack_size=None,
+                repack_cacheable_only=False,
+                repack_small=False,
+                repack_uncompressed=False,
+                skip_noop=False,
+                tag=None,
+                metrics=None,
+                retries=0,
+            )
+        init(mirror, password=_PASSWORD, restic_cache_dir=restic_cache_dir)
+        with _timed(results["copy"]):
+            _ = copy(
+                repo,
+                mirror,
+                src_password=_PASSWORD,
+                dest_password=_PASSWORD,
+                connections=None,
+                limit_download=None,
+                limit_upload=None,
+                tag=None,
+                incremental=True,
+                batch_size=_COPY_BATCH_SIZE,
+                cache_dir=cache_dir,
+                restic_cache_dir=restic_cache_dir,
+                max_age=None,
+                metrics=None,
+                retries=0,
+                sleep=None,
+            )
+    return list(results.values())
+
+
+@contextmanager
+def _timed(result: BenchmarkResult, /) -> Iterator[None]:
+    start = time.perf_counter()
+    yield
+    result.seconds.append(time.perf_counter() - start)
+
+
+__all__ = [
+    "BenchmarkResult",
+    "Comparison",
+    "compare_reports",
+    "make_dataset",
+    "measure_startup",
+    "read_report",
+    "run_benchmarks",
+    "write_report",
+]
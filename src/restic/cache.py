@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Self
+
+from restic.logging import LOGGER
+from restic.utilities import format_size
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    from utilities.types import PathLike
+
+
+_STATS_FILE = "py-restic-stats.json"
+_STATS_VERSION = 1
+
+
+@dataclass(kw_only=True, slots=True)
+class RepoCache:
+    id: str
+    path: Path
+    size: int = 0
+    files: int = 0
+    last_used: float = 0.0
+
+
+@dataclass(kw_only=True, slots=True)
+class CacheStats:
+    runs: int = 0
+    hits: int = 0
+    misses: int = 0
+    bytes_fetched: int = 0
+    evictions: int = 0
+    bytes_evicted: int = 0
+    repos: list[RepoCache] = field(default_factory=list)
+
+    @property
+    def hit_ratio(self) -> float | None:
+        total = self.hits + self.misses
+        return None if total == 0 else self.hits / total
+
+    @property
+    def size(self) -> int:
+        return sum(r.size for r in self.repos)
+
+    @classmethod
+    def parse(cls, data: dict[str, Any], /) -> Self:
+        return cls(
+            runs=data.get("runs", 0),
+            hits=data.get("hits", 0),
+            misses=data.get("misses", 0),
+            bytes_fetched=data.get("bytes_fetched", 0),
+            evictions=data.get("evictions", 0),
+            bytes_evicted=data.get("bytes_evicted", 0),
+        )
+
+
+def evict_cache(cache_dir: PathLike, /, *, max_size: int) -> list[RepoCache]:
+    repos = get_repo_caches(cache_dir)
+    total = sum(r.size for r in repos)
+    evicted: list[RepoCache] = []
+    for repo in sorted(repos, key=lambda r: r.last_used):
+        if total <= max_size:
+            break
+        LOGGER.info(
+            "Evicting cache of repository %s (%s)", repo.id, format_size(repo.size)
+        )
+        shutil.rmtree(repo.path, ignore_errors=True)
+        total -= repo.size
+        evicted.append(repo)
+    if len(evicted) >= 1:
+        stats = read_stats(cache_dir)
+        stats.evictions += len(evicted)
+        stats.bytes_evicted += sum(r.size for r in evicted)
+        _write_stats(cache_dir, stats)
+    return evicted
+
+
+def get_cache_stats(cache_dir: PathLike, /) -> CacheStats:
+    stats = read_stats(cache_dir)
+    stats.repos = get_repo_caches(cache_dir)
+    return stats
+
+
+def get_repo_caches(cache_dir: PathLike, /) -> list[RepoCache]:
+    try:
+        entries = [e for e in os.scandir(cache_dir) if e.is_dir(follow_symlinks=False)]
+    except FileNotFoundError:
+        return []
+    repos: list[RepoCache] = []
+    for entry in entries:
+        files = _list_files(Path(entry.path))
+        times = [max(st.st_mtime, st.st_atime) for st in files.values()]
+        repos.append(
+            RepoCache(
+                id=entry.name,
+                path=Path(entry.path),
+                size=sum(st.st_size for st in files.values()),
+                files=len(files),
+                last_used=max(entry.stat(follow_symlinks=False).st_mtime, *times),
+            )
+        )
+    return sorted(repos, key=lambda r: r.id)
+
+
+def read_stats(cache_dir: PathLike, /) -> CacheStats:
+    path = Path(cache_dir, _STATS_FILE)
+    try:
+        data = json.loads(path.read_text())
+    except FileNotFoundError:
+        return CacheStats()
+    except json.JSONDecodeError:
+        LOGGER.warning("Ignoring corrupt cache statistics '%s'", path)
+        return CacheStats()
+    if data.get("version") != _STATS_VERSION:
+        return CacheStats()
+    return CacheStats.parse(data)
+
+
+@contextmanager
+def track_cache(cache_dir: PathLike, /) -> Iterator[None]:
+    before = _list_files(Path(cache_dir))
+    try:
+        yield
+    finally:
+        after = _list_files(Path(cache_dir))
+        fetched = {k: v.st_size for k, v in after.items() if k not in before}
+        stats = read_stats(cache_dir)
+        stats.runs += 1
+        stats.hits += len(after) - len(fetched)
+        stats.misses += len(fetched)
+        stats.bytes_fetched += sum(fetched.values())
+        _write_stats(cache_dir, stats)
+        LOGGER.info(
+            "Cache '%s': %d file(s) reused, %d fetched (%s)",
+            cache_dir,
+            len(after) - len(fetched),
+            len(fetched),
+            format_size(sum(fetched.values())),
+        )
+
+
+def _list_files(root: Path, /) -> dict[str, os.stat_result]:
+    files: dict[str, os.stat_result] = {}
+    stack = [root]
+    while len(stack) >= 1:
+        try:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(Path(entry.path))
+                    elif entry.is_file(follow_symlinks=False) and (
+                        entry.name != _STATS_FILE
+                    ):
+                        files[entry.path] = entry.stat(follow_symlinks=False)
+        except FileNotFoundError:
+            continue
+    return files
+
+
+def _write_stats(cache_dir: PathLike, stats: CacheStats, /) -> None:
+    path = Path(cache_dir, _STATS_FILE)
+    data = {"version": _STATS_VERSION, **asdict(stats)}
+    del data["repos"]
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp = path.with_name(f"{path.name}.tmp")
+    _ = temp.write_text(json.dumps(data))
+    _ = temp.replace(path)
+
+
+__all__ = [
+    "CacheStats",
+    "RepoCache",
+    "evict_cache",
+    "get_cache_stats",
+    "get_repo_caches",
+    "read_stats",
+    "track_cache",
+]
@@ -1,10 +1,12 @@
 from __future__ import annotations
 
+import datetime as dt
+from functools import partial
 from pathlib import Path
 from typing import TYPE_CHECKING
 
 import click
-from click import argument, group
+from click import ClickException, argument, echo, group
 from typed_settings import click_options
 from utilities.click import CONTEXT_SETTINGS
 from utilities.logging import basic_config
@@ -12,21 +14,35 @@ from utilities.os import is_pytest
 
 import restic.click
 import restic.repo
-from restic.lib import backup, copy, forget, init, restore, snapshots
 from restic.logging import LOGGER
+from restic.progress import log_progress
 from restic.settings import (
-    LOADERS,
     BackupSettings,
+    BenchmarkSettings,
+    CacheSettings,
+    CompareSettings,
     CopySettings,
     ForgetSettings,
     InitSettings,
+    PruneSettings,
+    QuerySettings,
     RestoreSettings,
+    RunSettings,
     SnapshotsSettings,
+    WarmSettings,
+    get_loaders,
+    get_settings,
 )
+from restic.utilities import describe_paths, format_size, parse_datetime, parse_size
 
 if TYPE_CHECKING:
     from utilities.types import PathLike
 
+    from restic.progress import Progress
+
+
+_LOADERS = get_loaders()
+
 
 @group(**CONTEXT_SETTINGS)
 def _main() -> None: ...
@@ -34,34 +50,53 @@ def _main() -> None: ...
 
 @_main.command(name="init", **CONTEXT_SETTINGS)
 @argument("repo", type=restic.click.Repo())
-@click_options(InitSettings, LOADERS, show_envvars_in_help=True)
+@click_options(InitSettings, _LOADERS, show_envvars_in_help=True)
 def init_sub_cmd(settings: InitSettings, /, *, repo: restic.repo.Repo) -> None:
     if is_pytest():
         return
     basic_config(obj=LOGGER)
+    from restic.lib import init
+
     init(repo, password=settings.password)
 
 
 @_main.command(name="backup", **CONTEXT_SETTINGS)
-@argument("path", type=click.Path(path_type=Path))
+@argument("paths", type=click.Path(path_type=Path), nargs=-1, required=True)
 @argument("repo", type=restic.click.Repo())
-@click_options(BackupSettings, LOADERS, show_envvars_in_help=True)
+@click_options(BackupSettings, _LOADERS, show_envvars_in_help=True)
 def backup_sub_cmd(
-    settings: BackupSettings, /, *, path: PathLike, repo: restic.repo.Repo
+    settings: BackupSettings, /, *, paths: tuple[Path, ...], repo: restic.repo.Repo
 ) -> None:
     if is_pytest():
         return
     basic_config(obj=LOGGER)
-    backup(
-        path,
+    _start_trace(settings.trace)
+    from restic.lib import backup
+
+    metrics = _start_metrics(
+        settings.metrics,
+        settings.metrics_port,
+        settings.metrics_addr,
+        settings.cache_dir,
+    )
+    func = partial(
+        backup,
+        paths,
         repo,
         chmod=settings.chmod,
         chown=settings.chown,
+        chmod_manifest=settings.chmod_manifest,
         password=settings.password,
         dry_run=settings.dry_run,
         exclude=settings.exclude,
         exclude_i=settings.exclude_i,
+        groups=settings.groups,
+        progress=log_progress if settings.progress else None,
+        progress_interval=settings.progress_interval,
         read_concurrency=settings.read_concurrency,
+        auto_read_concurrency=settings.auto_read_concurrency,
+        recalibrate=settings.recalibrate,
+        skip_unchanged=settings.skip_unchanged,
         tag_backup=settings.tag_backup,
         run_forget=settings.run_forget,
         keep_last=settings.keep_last,
@@ -77,44 +112,229 @@ def backup_sub_cmd(
         keep_within_monthly=settings.keep_within_monthly,
         keep_within_yearly=settings.keep_within_yearly,
         prune=settings.prune,
+        max_unused=settings.max_unused,
+        max_repack_size=settings.max_repack_size,
         repack_cacheable_only=settings.repack_cacheable_only,
         repack_small=settings.repack_small,
         repack_uncompressed=settings.repack_uncompressed,
+        skip_noop_forget=settings.skip_noop_forget,
         tag_forget=settings.tag_forget,
+        cache_dir=settings.cache_dir,
+        restic_cache_dir=settings.restic_cache_dir,
+        max_cache_size=settings.max_cache_size,
+        metrics=metrics,
+        retries=settings.retries,
         sleep=settings.sleep,
     )
+    if settings.watch:
+        from restic.watch import watch
+
+        watch(
+            paths,
+            func,
+            exclude=settings.exclude,
+            exclude_i=settings.exclude_i,
+            debounce=settings.watch_debounce,
+            min_interval=settings.watch_min_interval,
+            max_interval=settings.watch_max_interval,
+        )
+        return
+    from restic.scheduler import run_or_schedule
+
+    run_or_schedule(
+        f"backup {describe_paths(paths)} to {repo}",
+        func,
+        schedule=settings.schedule,
+        jitter=settings.jitter,
+        catch_up=settings.catch_up,
+        state_dir=Path(settings.cache_dir, "scheduler"),
+    )
+
+
+@_main.command(name="benchmark", **CONTEXT_SETTINGS)
+@click_options(BenchmarkSettings, _LOADERS, show_envvars_in_help=True)
+def benchmark_sub_cmd(settings: BenchmarkSettings, /) -> None:
+    if is_pytest():
+        return
+    basic_config(obj=LOGGER)
+    from restic.benchmark import run_benchmarks, write_report
+
+    results = run_benchmarks(
+        datasets=settings.datasets,
+        read_concurrency=settings.read_concurrency or [get_settings().read_concurrency],
+        repeats=settings.repeats,
+        scale=settings.scale,
+    )
+    write_report(results, settings.output)
+    for result in results:
+        echo(f"{result.key:60}  {result.best:10.3f}s")
+    echo(f"Wrote {len(results)} result(s) to '{settings.output}'")
+
+
+@_main.command(name="cache", **CONTEXT_SETTINGS)
+@click_options(CacheSettings, _LOADERS, show_envvars_in_help=True)
+def cache_sub_cmd(settings: CacheSettings, /) -> None:
+    if is_pytest():
+        return
+    basic_config(obj=LOGGER)
+    from restic.cache import evict_cache, get_cache_stats
+
+    if settings.restic_cache_dir is None:
+        msg = "No restic cache directory is configured"
+        raise ClickException(msg)
+    if settings.max_cache_size is not None:
+        _ = evict_cache(
+            settings.restic_cache_dir, max_size=parse_size(settings.max_cache_size)
+        )
+    stats = get_cache_stats(settings.restic_cache_dir)
+    for repo in sorted(stats.repos, key=lambda r: r.last_used, reverse=True):
+        echo(
+            f"{repo.id[:8]}  {format_size(repo.size):>10}  {repo.files:8} files  last used {dt.datetime.fromtimestamp(repo.last_used, tz=dt.UTC).astimezone():%Y-%m-%d %H:%M:%S}"
+        )
+    hit_ratio = "n/a" if stats.hit_ratio is None else f"{stats.hit_ratio:.1%}"
+    echo(
+        f"total {format_size(stats.size)} in {len(stats.repos)} repo(s); {stats.runs} run(s), {stats.hits} hit(s), {stats.misses} miss(es) ({hit_ratio} hit ratio), {format_size(stats.bytes_fetched)} fetched, {stats.evictions} eviction(s)"
+    )
+
+
+@_main.command(name="compare", **CONTEXT_SETTINGS)
+@argument("old", type=click.Path(exists=True, path_type=Path))
+@argument("new", type=click.Path(exists=True, path_type=Path))
+@click_options(CompareSettings, _LOADERS, show_envvars_in_help=True)
+def compare_sub_cmd(settings: CompareSettings, /, *, old: Path, new: Path) -> None:
+    if is_pytest():
+        return
+    basic_config(obj=LOGGER)
+    from restic.benchmark import compare_reports, read_report
+
+    comparisons = compare_reports(
+        read_report(old), read_report(new), threshold=settings.threshold
+    )
+    for comparison in comparisons:
+        flag = "REGRESSED" if comparison.regressed else ""
+        echo(
+            f"{comparison.key:60}  {comparison.old:10.3f}s  {comparison.new:10.3f}s  {comparison.ratio:6.2f}x  {flag}"
+        )
+    regressed = sum(c.regressed for c in comparisons)
+    if regressed >= 1:
+        msg = (
+            f"{regressed} benchmark(s) regressed by more than {settings.threshold:.0%}"
+        )
+        raise ClickException(msg)
 
 
 @_main.command(name="copy", **CONTEXT_SETTINGS)
 @argument("src", type=restic.click.Repo())
-@argument("dest", type=restic.click.Repo())
-@click_options(CopySettings, LOADERS, show_envvars_in_help=True)
+@argument("dests", type=restic.click.Repo(), nargs=-1, required=True)
+@click_options(CopySettings, _LOADERS, show_envvars_in_help=True)
 def copy_sub_cmd(
-    settings: CopySettings, /, *, src: restic.repo.Repo, dest: restic.repo.Repo
+    settings: CopySettings,
+    /,
+    *,
+    src: restic.repo.Repo,
+    dests: tuple[restic.repo.Repo, ...],
 ) -> None:
     if is_pytest():
         return
     basic_config(obj=LOGGER)
-    copy(
+    _start_trace(settings.trace)
+    from restic.scheduler import run_or_schedule
+
+    metrics = _start_metrics(
+        settings.metrics,
+        settings.metrics_port,
+        settings.metrics_addr,
+        settings.cache_dir,
+    )
+    run_or_schedule(
+        f"copy {src} to {', '.join(map(str, dests))}",
+        partial(_copy_many, src, dests, settings, metrics=metrics),
+        schedule=settings.schedule,
+        jitter=settings.jitter,
+        catch_up=settings.catch_up,
+        state_dir=Path(settings.cache_dir, "scheduler"),
+    )
+
+
+def _copy_many(
+    src: restic.repo.Repo,
+    dests: tuple[restic.repo.Repo, ...],
+    settings: CopySettings,
+    /,
+    *,
+    metrics: Path | None = None,
+) -> None:
+    from restic.lib import copy_many
+
+    password = get_settings().password
+    results = copy_many(
         src,
-        dest,
-        src_password=settings.src_password,
-        dest_password=settings.dest_password,
+        dests,
+        src_password=password
+        if settings.src_password is None
+        else settings.src_password,
+        dest_password=password
+        if settings.dest_password is None
+        else settings.dest_password,
+        connections=settings.connections,
+        limit_download=settings.limit_download,
+        limit_upload=settings.limit_upload,
+        progress=_log_dest_progress if settings.progress else None,
+        progress_interval=settings.progress_interval,
         tag=settings.tag,
+        incremental=settings.incremental,
+        batch_size=settings.batch_size,
+        cache_dir=settings.cache_dir,
+        max_age=settings.index_max_age,
+        metrics=metrics,
+        retries=settings.retries,
         sleep=settings.sleep,
     )
+    failed = [f"'{d}'" for d, r in results.items() if r.error is not None]
+    if len(failed) >= 1:
+        msg = f"Failed to copy snapshots to {', '.join(failed)}"
+        raise ClickException(msg)
+
+
+def _log_dest_progress(dest: restic.repo.Repo, progress: Progress, /) -> None:
+    log_progress(progress, label=str(dest))
+
+
+def _start_metrics(
+    metrics: str | None, port: int | None, addr: str, cache_dir: str, /
+) -> Path | None:
+    if port is None:
+        return None if metrics is None else Path(metrics)
+    from restic.metrics import serve_metrics
+
+    path = Path(cache_dir, "metrics.prom") if metrics is None else Path(metrics)
+    _ = serve_metrics(path, port=port, addr=addr)
+    return path
+
+
+def _start_trace(trace: str | None, /) -> None:
+    if trace is None:
+        return
+    from restic.tracing import ChromeTraceSink, add_sink
+
+    add_sink(ChromeTraceSink(trace))
+    LOGGER.info("Writing trace to '%s'", trace)
 
 
 @_main.command(name="forget", **CONTEXT_SETTINGS)
 @argument("repo", type=restic.click.Repo())
-@click_options(ForgetSettings, LOADERS, show_envvars_in_help=True)
+@click_options(ForgetSettings, _LOADERS, show_envvars_in_help=True)
 def forget_sub_cmd(settings: ForgetSettings, /, *, repo: restic.repo.Repo) -> None:
     if is_pytest():
         return
     basic_config(obj=LOGGER)
-    forget(
+    _start_trace(settings.trace)
+    from restic.lib import forget
+
+    _ = forget(
         repo,
         password=settings.password,
+        cache_dir=settings.cache_dir,
         dry_run=settings.dry_run,
         keep_last=settings.keep_last,
         keep_hourly=settings.keep_hourly,
@@ -129,24 +349,138 @@ def forget_sub_cmd(settings: ForgetSettings, /, *, repo: restic.repo.Repo) -> No
         keep_within_monthly=settings.keep_within_monthly,
         keep_within_yearly=settings.keep_within_yearly,
         prune=settings.prune,
+        max_unused=settings.max_unused,
+        max_repack_size=settings.max_repack_size,
         repack_cacheable_only=settings.repack_cacheable_only,
         repack_small=settings.repack_small,
         repack_uncompressed=settings.repack_uncompressed,
+        skip_noop=settings.skip_noop,
         tag=settings.tag,
+        metrics=settings.metrics,
+        retries=settings.retries,
     )
 
 
+@_main.command(name="plan", **CONTEXT_SETTINGS)
+@argument("repo", type=restic.click.Repo())
+@click_options(ForgetSettings, _LOADERS, show_envvars_in_help=True)
+def plan_sub_cmd(settings: ForgetSettings, /, *, repo: restic.repo.Repo) -> None:
+    if is_pytest():
+        return
+    basic_config(obj=LOGGER)
+    from restic.lib import plan
+
+    retention = plan(
+        repo,
+        password=settings.password,
+        cache_dir=settings.cache_dir,
+        max_age=settings.index_max_age,
+        keep_last=settings.keep_last,
+        keep_hourly=settings.keep_hourly,
+        keep_daily=settings.keep_daily,
+        keep_weekly=settings.keep_weekly,
+        keep_monthly=settings.keep_monthly,
+        keep_yearly=settings.keep_yearly,
+        keep_within=settings.keep_within,
+        keep_within_hourly=settings.keep_within_hourly,
+        keep_within_daily=settings.keep_within_daily,
+        keep_within_weekly=settings.keep_within_weekly,
+        keep_within_monthly=settings.keep_within_monthly,
+        keep_within_yearly=settings.keep_within_yearly,
+        tag=settings.tag,
+    )
+    for snapshot in sorted(retention.keep + retention.remove, reverse=True):
+        reasons = retention.reasons.get(snapshot.id)
+        echo(
+            f"{'keep' if reasons else 'remove':6}  {snapshot.short_id}  {snapshot.time:%Y-%m-%d %H:%M:%S}  {snapshot.hostname}  {' '.join(snapshot.paths)}  {', '.join(reasons or [])}"
+        )
+    echo(f"keep {len(retention.keep)}, remove {len(retention.remove)}")
+
+
+@_main.command(name="prune", **CONTEXT_SETTINGS)
+@argument("repo", type=restic.click.Repo())
+@click_options(PruneSettings, _LOADERS, show_envvars_in_help=True)
+def prune_sub_cmd(settings: PruneSettings, /, *, repo: restic.repo.Repo) -> None:
+    if is_pytest():
+        return
+    basic_config(obj=LOGGER)
+    _start_trace(settings.trace)
+    from restic.lib import prune
+    from restic.scheduler import run_or_schedule
+
+    metrics = _start_metrics(
+        settings.metrics,
+        settings.metrics_port,
+        settings.metrics_addr,
+        settings.cache_dir,
+    )
+    run_or_schedule(
+        f"prune {repo}",
+        partial(
+            prune,
+            repo,
+            password=settings.password,
+            dry_run=settings.dry_run,
+            max_unused=settings.max_unused,
+            max_repack_size=settings.max_repack_size,
+            min_reclaim=settings.min_reclaim,
+            min_unused_pct=settings.min_unused_pct,
+            repack_cacheable_only=settings.repack_cacheable_only,
+            repack_small=settings.repack_small,
+            repack_uncompressed=settings.repack_uncompressed,
+            metrics=metrics,
+            retries=settings.retries,
+            sleep=settings.sleep,
+        ),
+        schedule=settings.schedule,
+        jitter=settings.jitter,
+        catch_up=settings.catch_up,
+        state_dir=Path(settings.cache_dir, "scheduler"),
+    )
+
+
+@_main.command(name="query", **CONTEXT_SETTINGS)
+@argument("repo", type=restic.click.Repo())
+@click_options(QuerySettings, _LOADERS, show_envvars_in_help=True)
+def query_sub_cmd(settings: QuerySettings, /, *, repo: restic.repo.Repo) -> None:
+    if is_pytest():
+        return
+    basic_config(obj=LOGGER)
+    from restic.lib import query
+
+    found = query(
+        repo,
+        password=settings.password,
+        cache_dir=settings.cache_dir,
+        max_age=settings.index_max_age,
+        host=settings.host,
+        path=settings.path,
+        tag=settings.tag,
+        since=None if settings.since is None else parse_datetime(settings.since),
+        until=None if settings.until is None else parse_datetime(settings.until),
+        latest=settings.latest,
+    )
+    for snapshot in found:
+        echo(
+            f"{snapshot.short_id}  {snapshot.time:%Y-%m-%d %H:%M:%S}  {snapshot.hostname}  {','.join(snapshot.tags)}  {' '.join(snapshot.paths)}"
+        )
+    echo(f"{len(found)} snapshot(s)")
+
+
 @_main.command(name="restore", **CONTEXT_SETTINGS)
 @argument("repo", type=restic.click.Repo())
 @argument("target", type=click.Path(path_type=Path))
-@click_options(RestoreSettings, LOADERS, show_envvars_in_help=True)
+@click_options(RestoreSettings, _LOADERS, show_envvars_in_help=True)
 def restore_sub_cmd(
     settings: RestoreSettings, /, *, repo: restic.repo.Repo, target: PathLike
 ) -> None:
     if is_pytest():
         return
     basic_config(obj=LOGGER)
-    restore(
+    _start_trace(settings.trace)
+    from restic.lib import restore
+
+    result = restore(
         repo,
         target,
         password=settings.password,
@@ -156,22 +490,78 @@ def restore_sub_cmd(
         exclude_i=settings.exclude_i,
         include=settings.include,
         include_i=settings.include_i,
+        progress=log_progress if settings.progress else None,
+        progress_interval=settings.progress_interval,
+        shards=settings.shards,
+        workers=settings.workers,
+        verify=get_settings().verify_restore
+        if settings.verify is None
+        else settings.verify,
+        verify_fraction=settings.verify_fraction,
+        verify_workers=settings.verify_workers,
         tag=settings.tag,
         snapshot=settings.snapshot,
+        metrics=settings.metrics,
     )
+    if len(result.verify_failures) >= 1:
+        msg = f"Verification failed for {len(result.verify_failures)} file(s)"
+        raise ClickException(msg)
+
+
+@_main.command(name="run", **CONTEXT_SETTINGS)
+@argument("inventory", type=click.Path(exists=True, path_type=Path))
+@click_options(RunSettings, _LOADERS, show_envvars_in_help=True)
+def run_sub_cmd(settings: RunSettings, /, *, inventory: Path) -> None:
+    if is_pytest():
+        return
+    basic_config(obj=LOGGER)
+    _start_trace(settings.trace)
+    from restic.inventory import read_inventory, run_inventory, write_report
+
+    reports = run_inventory(read_inventory(inventory), workers=settings.workers)
+    for report in reports:
+        flag = "MISSED DEADLINE" if report.missed_deadline else ""
+        echo(
+            f"{report.name:30}  {report.command:8}  {report.status:6}  {report.seconds:8.1f}s  {report.repo}  {flag}"
+        )
+    if settings.report is not None:
+        write_report(reports, settings.report)
+    failed = [f"'{r.name}'" for r in reports if r.status == "failed"]
+    if len(failed) >= 1:
+        msg = f"{len(failed)} job(s) failed: {', '.join(failed)}"
+        raise ClickException(msg)
 
 
 @_main.command(name="snapshots", **CONTEXT_SETTINGS)
 @argument("repo", type=restic.click.Repo())
-@click_options(SnapshotsSettings, LOADERS, show_envvars_in_help=True)
+@click_options(SnapshotsSettings, _LOADERS, show_envvars_in_help=True)
 def snapshots_sub_cmd(
     settings: SnapshotsSettings, /, *, repo: restic.repo.Repo
 ) -> None:
     if is_pytest():
         return
     basic_config(obj=LOGGER)
+    from restic.lib import snapshots
+
     snapshots(repo, password=settings.password)
 
 
+@_main.command(name="warm", **CONTEXT_SETTINGS)
+@argument("repo", type=restic.click.Repo())
+@click_options(WarmSettings, _LOADERS, show_envvars_in_help=True)
+def warm_sub_cmd(settings: WarmSettings, /, *, repo: restic.repo.Repo) -> None:
+    if is_pytest():
+        return
+    basic_config(obj=LOGGER)
+    from restic.lib import warm_cache
+
+    _ = warm_cache(
+        repo,
+        password=settings.password,
+        restic_cache_dir=settings.restic_cache_dir,
+        max_cache_size=settings.max_cache_size,
+    )
+
+
 if __name__ == "__main__":
     _main()
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from hashlib import sha256
+from pathlib import Path
+from stat import S_ISDIR
+from typing import TYPE_CHECKING
+
+from restic.logging import LOGGER
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+    from concurrent.futures import Future
+
+    from utilities.types import PathLike
+
+    from restic.repo import Repo
+
+
+_MANIFEST_VERSION = 1
+
+
+def fingerprint_tree(
+    paths: Iterable[PathLike], /, *, max_workers: int | None = None
+) -> str:
+    digests: dict[str, str] = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending: set[Future[tuple[str, str, list[str]]]] = set()
+        for path in paths:
+            root = Path(path).absolute()
+            try:
+                st = root.stat(follow_symlinks=False)
+            except FileNotFoundError:
+                digests[str(root)] = "missing"
+                continue
+            if S_ISDIR(st.st_mode):
+                pending.add(pool.submit(_visit, str(root)))
+            else:
+                digests[str(root)] = _format_stat(root.name, st)
+        while len(pending) >= 1:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                dir_, digest, subdirs = future.result()
+                digests[dir_] = digest
+                pending.update(pool.submit(_visit, s) for s in subdirs)
+    total = sha256()
+    for dir_, digest in sorted(digests.items()):
+        total.update(f"{dir_}\0{digest}\n".encode())
+    return total.hexdigest()
+
+
+def get_manifest_key(
+    repo: Repo, paths: Iterable[PathLike], /, **options: object
+) -> str:
+    data = {
+        "repo": repo.repository,
+        "paths": sorted(str(Path(p).absolute()) for p in paths),
+        "options": options,
+    }
+    return sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()
+
+
+def read_fingerprint(path: PathLike, /, *, key: str) -> str | None:
+    return _read_manifest(path).get(key)
+
+
+def write_fingerprint(path: PathLike, /, *, key: str, fingerprint: str) -> None:
+    path = Path(path)
+    data = {
+        "version": _MANIFEST_VERSION,
+        "fingerprints": _read_manifest(path) | {key: fingerprint},
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp = path.with_name(f"{path.name}.tmp")
+    _ = temp.write_text(json.dumps(data))
+    _ = temp.replace(path)
+
+
+def _format_stat(name: str, st: os.stat_result, /) -> str:
+    return f"{name}\0{st.st_mode}:{st.st_size}:{st.st_mtime_ns}:{st.st_ctime_ns}:{st.st_ino}"
+
+
+def _read_manifest(path: PathLike, /) -> dict[str, str]:
+    try:
+        data = json.loads(Path(path).read_text())
+    except FileNotFoundError:
+        return {}
+    except json.JSONDecodeError:
+        LOGGER.warning("Ignoring corrupt fingerprint manifest '%s'", path)
+        return {}
+    if data.get("version") != _MANIFEST_VERSION:
+        return {}
+    return data["fingerprints"]
+
+
+def _visit(dir_: str, /) -> tuple[str, str, list[str]]:
+    digest = sha256(_format_stat("", Path(dir_).stat(follow_symlinks=False)).encode())
+    subdirs: list[str] = []
+    try:
+        with os.scandir(dir_) as it:
+            entries = sorted(it, key=lambda e: e.name)
+    except PermissionError:
+        return dir_, "denied", []
+    for entry in entries:
+        try:
+            st = entry.stat(follow_symlinks=False)
+        except FileNotFoundError:
+            continue
+        digest.update(f"{_format_stat(entry.name, st)}\n".encode())
+        if S_ISDIR(st.st_mode):
+            subdirs.append(entry.path)
+    return dir_, digest.hexdigest(), subdirs
+
+
+__all__ = [
+    "fingerprint_tree",
+    "get_manifest_key",
+    "read_fingerprint",
+    "write_fingerprint",
+]
@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from hashlib import sha256
+from itertools import chain
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Self
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from utilities.types import PathLike
+
+    from restic.repo import Repo
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id TEXT PRIMARY KEY,
+    time REAL NOT NULL,
+    hostname TEXT NOT NULL,
+    original TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS snapshots_time ON snapshots (time);
+CREATE INDEX IF NOT EXISTS snapshots_hostname ON snapshots (hostname, time);
+CREATE TABLE IF NOT EXISTS paths (
+    id TEXT NOT NULL REFERENCES snapshots (id) ON DELETE CASCADE,
+    path TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS paths_path ON paths (path, id);
+CREATE TABLE IF NOT EXISTS tags (
+    id TEXT NOT NULL REFERENCES snapshots (id) ON DELETE CASCADE,
+    tag TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tags_tag ON tags (tag, id);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+
+@dataclass(order=True, kw_only=True, slots=True)
+class Snapshot:
+    time: datetime
+    id: str
+    hostname: str = ""
+    username: str = ""
+    paths: list[str] = field(default_factory=list)
+    tags: list[str] = field(default_factory=list)
+    parent: str | None = None
+    tree: str | None = None
+    original: str | None = None
+    data: dict[str, Any] = field(default_factory=dict, compare=False, repr=False)
+
+    @classmethod
+    def parse(cls, data: dict[str, Any], /) -> Self:
+        return cls(
+            time=datetime.fromisoformat(data["time"]),
+            id=data["id"],
+            hostname=data.get("hostname", ""),
+            username=data.get("username", ""),
+            paths=data.get("paths") or [],
+            tags=data.get("tags") or [],
+            parent=data.get("parent"),
+            tree=data.get("tree"),
+            original=data.get("original"),
+            data=data,
+        )
+
+    @property
+    def short_id(self) -> str:
+        return self.id[:8]
+
+
+class SnapshotIndex:
+    def __init__(self, path: PathLike, /) -> None:
+        super().__init__()
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        _ = self._conn.execute("PRAGMA foreign_keys = ON")
+        _ = self._conn.execute("PRAGMA journal_mode = WAL")
+        _ = self._conn.executescript(_SCHEMA)
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    @classmethod
+    def for_repo(cls, repo: Repo, cache_dir: PathLike, /) -> Self:
+        key = sha256(repo.repository.encode()).hexdigest()[:16]
+        return cls(Path(cache_dir, "index", f"{key}.sqlite"))
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def ids(self) -> set[str]:
+        return {row[0] for row in self._conn.execute("SELECT id FROM snapshots")}
+
+    @property
+    def synced_at(self) -> float | None:
+        row = self._conn.execute(
+            "SELECT value FROM meta WHERE key = 'synced_at'"
+        ).fetchone()
+        return None if row is None else float(row[0])
+
+    def update(
+        self, /, *, add: Iterable[Snapshot] = (), remove: Iterable[str] = ()
+    ) -> None:
+        add = list(add)
+        with self._conn:
+            _ = self._conn.executemany(
+                "DELETE FROM snapshots WHERE id = ?",
+                [(id_,) for id_ in chain(remove, (s.id for s in add))],
+            )
+            for snapshot in add:
+                _ = self._conn.execute(
+                    "INSERT INTO snapshots VALUES (?, ?, ?, ?, ?)",
+                    (
+                        snapshot.id,
+                        snapshot.time.timestamp(),
+                        snapshot.hostname,
+                        snapshot.original,
+                        json.dumps(snapshot.data),
+                    ),
+                )
+                _ = self._conn.executemany(
+                    "INSERT INTO paths VALUES (?, ?)",
+                    [(snapshot.id, p) for p in snapshot.paths],
+                )
+                _ = self._conn.executemany(
+                    "INSERT INTO tags VALUES (?, ?)",
+                    [(snapshot.id, t) for t in snapshot.tags],
+                )
+            _ = self._conn.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('synced_at', ?)", (time.time(),)
+            )
+
+    def query(
+        self,
+        /,
+        *,
+        host: str | None = None,
+        path: str | None = None,
+        tag: list[str] | None = None,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        latest: int | None = None,
+    ) -> list[Snapshot]:
+        clauses: list[str] = []
+        params: list[Any] = []
+        if host is not None:
+            clauses.append("hostname = ?")
+            params.append(host)
+        if path is not None:
+            clauses.append("id IN (SELECT id FROM paths WHERE path = ?)")
+            params.append(path)
+        if (tag is not None) and (len(tag) >= 1):
+            groups: list[str] = []
+            for tags in tag:
+                parts = [t for t in tags.split(",") if t != ""]
+                groups.append(
+                    " AND ".join(
+                        ["id IN (SELECT id FROM tags WHERE tag = ?)"] * len(parts)
+                    )
+                    or "1"
+                )
+                params.extend(parts)
+            clauses.append(f"({' OR '.join(f'({g})' for g in groups)})")
+        if since is not None:
+            clauses.append("time >= ?")
+            params.append(since.timestamp())
+        if until is not None:
+            clauses.append("time < ?")
+            params.append(until.timestamp())
+        sql = " ".join([
+            "SELECT data FROM snapshots WHERE",
+            " AND ".join(clauses or ["1"]),
+            "ORDER BY time DESC LIMIT ?",
+        ])
+        params.append(-1 if latest is None else latest)
+        rows = self._conn.execute(sql, params).fetchall()
+        return sorted(Snapshot.parse(json.loads(row[0])) for row in rows)
+
+
+def find_missing(
+    src: Iterable[Snapshot], dest: Iterable[Snapshot], /
+) -> list[Snapshot]:
+    copied = {s.original or s.id for s in dest}
+    return sorted(s for s in src if (s.original or s.id) not in copied)
+
+
+__all__ = ["Snapshot", "SnapshotIndex", "find_missing"]
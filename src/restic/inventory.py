@@ -0,0 +1,394 @@
+from __future__ import annotations
+
+import datetime as dt
+import inspect
+import json
+import time
+import tomllib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from threading import Condition
+from typing import TYPE_CHECKING, Any, Literal, assert_never, cast
+
+from attrs import fields_dict
+from typed_settings import Secret, load_settings
+from typed_settings.loaders import DictLoader
+
+from restic.logging import LOGGER
+from restic.repo import SFTP, Backblaze, Local, get_backend_name, parse_repo
+from restic.settings import Settings, get_loaders
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable
+
+    from utilities.types import PathLike
+
+    from restic.repo import Repo
+
+
+type Command = Literal["backup", "copy", "forget", "prune"]
+
+
+_COMMANDS: set[str] = {"backup", "copy", "forget", "prune"}
+_JOB_KEYS = {
+    "name",
+    "command",
+    "repo",
+    "paths",
+    "dests",
+    "deadline",
+    "priority",
+    "src_password",
+    "dest_password",
+}
+_RENAMES: dict[str, dict[str, str]] = {
+    "backup": {"exclude": "exclude_backup", "exclude_i": "exclude_i_backup"},
+    "copy": {
+        "src_password": "password",
+        "dest_password": "password",
+        "tag": "tag_copy",
+        "incremental": "incremental_copy",
+        "batch_size": "copy_batch_size",
+        "max_age": "index_max_age",
+    },
+    "forget": {"skip_noop": "skip_noop_forget", "tag": "tag_forget"},
+    "prune": {},
+}
+_SKIPPED = {"progress", "sleep"}
+_REPORT_VERSION = 1
+
+
+@dataclass(kw_only=True, slots=True)
+class InventoryJob:
+    name: str
+    command: Command
+    repo: Repo
+    paths: list[str] = field(default_factory=list)
+    dests: list[Repo] = field(default_factory=list)
+    deadline: dt.datetime | None = None
+    priority: int = 0
+    src_password: Secret[str] | None = None
+    dest_password: Secret[str] | None = None
+    options: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def repos(self) -> list[Repo]:
+        return [self.repo, *self.dests]
+
+
+@dataclass(kw_only=True, slots=True)
+class Inventory:
+    jobs: list[InventoryJob] = field(default_factory=list)
+    workers: int = 4
+    per_backend: dict[str, int] = field(default_factory=dict)
+    per_host: int | None = None
+
+
+@dataclass(kw_only=True, slots=True)
+class JobReport:
+    name: str
+    command: str
+    repo: str
+    status: Literal["ok", "failed"] = "ok"
+    started: str = ""
+    seconds: float = 0.0
+    deadline: str | None = None
+    missed_deadline: bool = False
+    error: str | None = None
+
+
+def get_backend(repo: Repo, /) -> tuple[str, str]:
+    backend = get_backend_name(repo)
+    match repo:
+        case Backblaze():
+            return backend, f"{backend}:{repo.key_id.get_secret_value()}"
+        case SFTP():
+            return backend, f"{backend}:{repo.hostname}"
+        case Local():
+            return backend, backend
+        case never:
+            assert_never(never)
+
+
+def read_inventory(path: PathLike, /, *, now: dt.datetime | None = None) -> Inventory:
+    data = tomllib.loads(Path(path).read_text())
+    now_use = dt.datetime.now().astimezone() if now is None else now
+    defaults: dict[str, Any] = data.get("defaults", {})
+    limits: dict[str, Any] = data.get("limits", {})
+    jobs = [_parse_job(j, defaults, now_use) for j in data.get("jobs", [])]
+    names = Counter(j.name for j in jobs)
+    if len(duplicates := [n for n, c in names.items() if c >= 2]) >= 1:
+        msg = f"Duplicate job name(s) {sorted(duplicates)}"
+        raise ValueError(msg)
+    inventory = Inventory(
+        jobs=jobs,
+        workers=limits.get("workers", 4),
+        per_backend=limits.get("backends", {}),
+        per_host=limits.get("per_host"),
+    )
+    caps = [inventory.workers, *inventory.per_backend.values()]
+    if inventory.per_host is not None:
+        caps.append(inventory.per_host)
+    if any(c <= 0 for c in caps):
+        msg = "Inventory limits must be positive"
+        raise ValueError(msg)
+    return inventory
+
+
+def run_inventory(
+    inventory: Inventory,
+    /,
+    *,
+    workers: int | None = None,
+    execute: Callable[[InventoryJob], object] | None = None,
+) -> list[JobReport]:
+    execute_use = run_job if execute is None else execute
+    dispatcher = _Dispatcher(
+        inventory.jobs, per_backend=inventory.per_backend, per_host=inventory.per_host
+    )
+    reports: dict[str, JobReport] = {}
+
+    def worker() -> None:
+        while (job := dispatcher.acquire()) is not None:
+            try:
+                reports[job.name] = _run_reported(job, execute_use)
+            finally:
+                dispatcher.release(job)
+
+    n = inventory.workers if workers is None else workers
+    LOGGER.info("Running %d job(s) with %d worker(s)...", len(inventory.jobs), n)
+    with ThreadPoolExecutor(max_workers=n) as pool:
+        for future in [pool.submit(worker) for _ in range(n)]:
+            future.result()
+    ordered = [reports[j.name] for j in _order(inventory.jobs)]
+    failed = sum(r.status == "failed" for r in ordered)
+    missed = sum(r.missed_deadline for r in ordered)
+    LOGGER.info(
+        "Finished %d job(s); %d failed, %d missed their deadline",
+        len(ordered),
+        failed,
+        missed,
+    )
+    return ordered
+
+
+def run_job(job: InventoryJob, /) -> object:
+    from restic import lib
+
+    settings = load_settings(Settings, [*get_loaders(), DictLoader(job.options)])
+    func: Callable[..., object]
+    args: tuple[Any, ...]
+    match job.command:
+        case "backup":
+            func, args = lib.backup, (job.paths, job.repo)
+        case "copy":
+            func, args = lib.copy_many, (job.repo, job.dests)
+        case "forget":
+            func, args = lib.forget, (job.repo,)
+        case "prune":
+            func, args = lib.prune, (job.repo,)
+        case never:
+            assert_never(never)
+    kwargs = _get_kwargs(func, job.command, settings)
+    if job.src_password is not None:
+        kwargs["src_password"] = job.src_password
+    if job.dest_password is not None:
+        kwargs["dest_password"] = job.dest_password
+    return func(*args, **kwargs)
+
+
+def write_report(reports: Iterable[JobReport], path: PathLike, /) -> None:
+    path = Path(path)
+    data = {"version": _REPORT_VERSION, "jobs": [asdict(r) for r in reports]}
+    path.parent.mkdir(parents=True, exist_ok=True)
+    _ = path.write_text(json.dumps(data, indent=2))
+
+
+class _Dispatcher:
+    def __init__(
+        self,
+        jobs: Iterable[InventoryJob],
+        /,
+        *,
+        per_backend: dict[str, int],
+        per_host: int | None,
+    ) -> None:
+        super().__init__()
+        self._pending = _order(jobs)
+        self._per_backend = per_backend
+        self._per_host = per_host
+        self._backends: Counter[str] = Counter()
+        self._hosts: Counter[str] = Counter()
+        self._condition = Condition()
+
+    def acquire(self) -> InventoryJob | None:
+        with self._condition:
+            while len(self._pending) >= 1:
+                for i, job in enumerate(self._pending):
+                    if self._fits(job):
+                        del self._pending[i]
+                        for backend, host in _get_backends(job):
+                            self._backends[backend] += 1
+                            self._hosts[host] += 1
+                        return job
+                _ = self._condition.wait()
+            return None
+
+    def release(self, job: InventoryJob, /) -> None:
+        with self._condition:
+            for backend, host in _get_backends(job):
+                self._backends[backend] -= 1
+                self._hosts[host] -= 1
+            self._condition.notify_all()
+
+    def _fits(self, job: InventoryJob, /) -> bool:
+        entries = _get_backends(job)
+        for backend, n in Counter(b for b, _ in entries).items():
+            cap = self._per_backend.get(backend)
+            if _exceeds(self._backends[backend], n, cap):
+                return False
+        return not any(
+            _exceeds(self._hosts[host], 1, self._per_host) for _, host in entries
+        )
+
+
+def _exceeds(count: int, n: int, cap: int | None, /) -> bool:
+    # a job needing more slots than the cap runs alone rather than never
+    return (cap is not None) and (count >= 1) and (count + n > cap)
+
+
+def _get_backends(job: InventoryJob, /) -> set[tuple[str, str]]:
+    return {get_backend(r) for r in job.repos}
+
+
+def _get_kwargs(
+    func: Callable[..., object], command: str, settings: Settings, /
+) -> dict[str, Any]:
+    names = fields_dict(Settings)
+    renames = _RENAMES[command]
+    kwargs: dict[str, Any] = {}
+    for name, param in inspect.signature(func).parameters.items():
+        if (param.kind is not param.KEYWORD_ONLY) or (name in _SKIPPED):
+            continue
+        if (field_name := renames.get(name, name)) in names:
+            kwargs[name] = getattr(settings, field_name)
+    return kwargs
+
+
+def _order(jobs: Iterable[InventoryJob], /) -> list[InventoryJob]:
+    return sorted(
+        jobs,
+        key=lambda j: (
+            j.deadline is None,
+            dt.datetime.max.replace(tzinfo=dt.UTC)
+            if j.deadline is None
+            else j.deadline,
+            -j.priority,
+            j.name,
+        ),
+    )
+
+
+def _parse_deadline(value: Any, now: dt.datetime, /) -> dt.datetime | None:
+    match value:
+        case None:
+            return None
+        case dt.datetime():
+            return value if value.tzinfo is not None else value.astimezone()
+        case dt.time():
+            return dt.datetime.combine(now.date(), value, tzinfo=now.tzinfo)
+        case str():
+            return _parse_deadline(dt.datetime.fromisoformat(value), now)
+        case _:
+            msg = f"Invalid deadline {value!r}; expected a datetime or time"
+            raise ValueError(msg)
+
+
+def _parse_job(
+    data: dict[str, Any], defaults: dict[str, Any], now: dt.datetime, /
+) -> InventoryJob:
+    try:
+        name: str = data["name"]
+        command: str = data["command"]
+        repo = parse_repo(data["repo"])
+    except KeyError as error:
+        msg = f"Inventory job {data!r} is missing {error.args[0]!r}"
+        raise ValueError(msg) from None
+    if command not in _COMMANDS:
+        msg = f"Job {name!r} has invalid command {command!r}; expected one of {sorted(_COMMANDS)}"
+        raise ValueError(msg)
+    options = {**defaults, **{k: v for k, v in data.items() if k not in _JOB_KEYS}}
+    if len(unknown := set(options) - set(fields_dict(Settings))) >= 1:
+        msg = f"Job {name!r} has unknown option(s) {sorted(unknown)}"
+        raise ValueError(msg)
+    paths: list[str] = data.get("paths", [])
+    dests = [parse_repo(d) for d in data.get("dests", [])]
+    if (command == "backup") and (len(paths) == 0):
+        msg = f"Backup job {name!r} requires 'paths'"
+        raise ValueError(msg)
+    if (command == "copy") and (len(dests) == 0):
+        msg = f"Copy job {name!r} requires 'dests'"
+        raise ValueError(msg)
+    passwords = {k: data[k] for k in ["src_password", "dest_password"] if k in data}
+    if (command != "copy") and (len(passwords) >= 1):
+        msg = f"Job {name!r} has copy-only option(s) {sorted(passwords)}"
+        raise ValueError(msg)
+    return InventoryJob(
+        name=name,
+        command=cast("Command", command),
+        repo=repo,
+        paths=paths,
+        dests=dests,
+        deadline=_parse_deadline(data.get("deadline"), now),
+        priority=data.get("priority", 0),
+        src_password=_to_secret(passwords.get("src_password")),
+        dest_password=_to_secret(passwords.get("dest_password")),
+        options=options,
+    )
+
+
+def _run_reported(
+    job: InventoryJob, execute: Callable[[InventoryJob], object], /
+) -> JobReport:
+    report = JobReport(
+        name=job.name,
+        command=job.command,
+        repo=job.repo.repository,
+        started=dt.datetime.now().astimezone().isoformat(),
+        deadline=None if job.deadline is None else job.deadline.isoformat(),
+    )
+    LOGGER.info("Starting job '%s'...", job.name)
+    start = time.perf_counter()
+    try:
+        _ = execute(job)
+    except Exception as error:  # noqa: BLE001
+        LOGGER.exception("Job '%s' failed", job.name)
+        report.status = "failed"
+        report.error = repr(error)
+    report.seconds = time.perf_counter() - start
+    report.missed_deadline = (job.deadline is not None) and (
+        dt.datetime.now().astimezone() > job.deadline
+    )
+    LOGGER.info(
+        "Finished job '%s' (%s) in %.1fs", job.name, report.status, report.seconds
+    )
+    return report
+
+
+def _to_secret(value: str | None, /) -> Secret[str] | None:
+    return None if value is None else Secret(value)
+
+
+__all__ = [
+    "Command",
+    "Inventory",
+    "InventoryJob",
+    "JobReport",
+    "get_backend",
+    "read_inventory",
+    "run_inventory",
+    "run_job",
+    "write_report",
+]
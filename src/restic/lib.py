@@ -1,17 +1,37 @@
 from __future__ import annotations
 
+import os
+import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from functools import partial
+from pathlib import Path
 from re import MULTILINE, search
-from subprocess import CalledProcessError
-from typing import TYPE_CHECKING
-
-from utilities.subprocess import run
-from whenever import TimeDelta
+from subprocess import DEVNULL, PIPE, CalledProcessError, check_call
+from subprocess import run as run_subprocess
+from threading import Lock
+from typing import TYPE_CHECKING, Any, assert_never
 
+from restic.cache import evict_cache, get_cache_stats, track_cache
 from restic.logging import LOGGER
-from restic.repo import yield_repo_env
-from restic.settings import SETTINGS
+from restic.permissions import DIR_MODE, FILE_MODE, normalize_permissions
+from restic.progress import combine_progress, parse_progress, stream_json
+from restic.repo import expand_repo_options, get_repo_env
+from restic.results import (
+    BackupResult,
+    CopyResult,
+    ForgetResult,
+    PruneResult,
+    RestoreResult,
+    time_phase,
+)
+from restic.retention import plan_retention
+from restic.retry import call_with_retry
+from restic.settings import SETTINGS, resolve_settings
+from restic.tracing import span, trace_subprocess, traced
 from restic.utilities import (
+    describe_paths,
     expand_bool,
     expand_dry_run,
     expand_exclude,
@@ -20,30 +40,56 @@ from restic.utilities import (
     expand_include_i,
     expand_keep,
     expand_keep_within,
+    expand_max,
     expand_tag,
-    run_chmod,
-    yield_password,
+    format_size,
+    group_paths,
+    parse_size,
+    to_paths,
+    yield_password_env,
 )
 
 if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator, Mapping, Sequence
+    from datetime import datetime
+
     from utilities.types import PathLike
 
+    from restic.cache import CacheStats
+    from restic.index import Snapshot, SnapshotIndex
+    from restic.progress import Message, Progress, ProgressCallback
     from restic.repo import Repo
-    from restic.types import PasswordLike
+    from restic.retention import RetentionPlan
+    from restic.types import PasswordLike, VerifyMode
+
 
+_MAX_SNAPSHOT_ARGS = 500
+_QUIET_PROGRESS_INTERVAL = 3600
 
+
+@traced("backup")
+@resolve_settings
 def backup(
-    path: PathLike,
+    path: PathLike | Sequence[PathLike],
     repo: Repo,
     /,
     *,
     chmod: bool = SETTINGS.chmod,
     chown: str | None = SETTINGS.chown,
+    chmod_manifest: PathLike | None = SETTINGS.chmod_manifest,
     password: PasswordLike = SETTINGS.password,
+    env: Mapping[str, str] | None = None,
+    auto_init: bool = True,
     dry_run: bool = SETTINGS.dry_run,
     exclude: list[str] | None = SETTINGS.exclude_backup,
     exclude_i: list[str] | None = SETTINGS.exclude_i_backup,
+    groups: int | None = SETTINGS.groups,
+    progress: ProgressCallback | None = None,
+    progress_interval: int = SETTINGS.progress_interval,
     read_concurrency: int = SETTINGS.read_concurrency,
+    auto_read_concurrency: bool = SETTINGS.auto_read_concurrency,
+    recalibrate: bool = SETTINGS.recalibrate,
+    skip_unchanged: bool = SETTINGS.skip_unchanged,
     tag_backup: list[str] | None = SETTINGS.tag_backup,
     run_forget: bool = SETTINGS.run_forget,
     keep_last: int | None = SETTINGS.keep_last,
@@ -59,116 +105,240 @@ def backup(
     keep_within_monthly: str | None = SETTINGS.keep_within_monthly,
     keep_within_yearly: str | None = SETTINGS.keep_within_yearly,
     prune: bool = SETTINGS.prune,
+    max_unused: str | None = SETTINGS.max_unused,
+    max_repack_size: str | None = SETTINGS.max_repack_size,
     repack_cacheable_only: bool = SETTINGS.repack_cacheable_only,
     repack_small: bool = SETTINGS.repack_small,
     repack_uncompressed: bool = SETTINGS.repack_uncompressed,
+    skip_noop_forget: bool = SETTINGS.skip_noop_forget,
     tag_forget: list[str] | None = SETTINGS.tag_forget,
+    cache_dir: PathLike = SETTINGS.cache_dir,
+    restic_cache_dir: PathLike | None = SETTINGS.restic_cache_dir,
+    max_cache_size: str | None = SETTINGS.max_cache_size,
+    metrics: PathLike | None = SETTINGS.metrics,
+    retries: int = SETTINGS.retries,
     sleep: int | None = SETTINGS.sleep,
-) -> None:
-    LOGGER.info("Backing up '%s' to '%s'...", path, repo)
-    if chmod:
-        run_chmod(path, "d", "u=rwx,g=rx,o=rx")
-        run_chmod(path, "f", "u=rw,g=r,o=r")
-    if chown is not None:
-        run("sudo", "chown", "-R", f"{chown}:{chown}", str(path))
-    try:
-        _backup_core(
-            path,
-            repo,
-            password=password,
-            dry_run=dry_run,
-            exclude=exclude,
-            exclude_i=exclude_i,
-            read_concurrency=read_concurrency,
-            tag=tag_backup,
+) -> BackupResult:
+    paths = to_paths(path)
+    desc = describe_paths(paths)
+    LOGGER.info("Backing up %s to '%s'...", desc, repo)
+    result = BackupResult()
+    if chmod or (chown is not None):
+        with time_phase(result.timings, "permissions"):
+            for path_i in paths:
+                with span("normalize", path=str(path_i)) as attrs:
+                    normalized = normalize_permissions(
+                        path_i,
+                        dir_mode=DIR_MODE if chmod else None,
+                        file_mode=FILE_MODE if chmod else None,
+                        owner=chown,
+                        manifest=chmod_manifest,
+                    )
+                    attrs["changed"] = normalized.changed
+                LOGGER.info(
+                    "Normalized permissions of '%s'; examined %d, changed %d, skipped %d",
+                    path_i,
+                    normalized.examined,
+                    normalized.changed,
+                    normalized.skipped,
+                )
+    manifest = Path(cache_dir, "fingerprints.json")
+    key: str | None = None
+    fingerprint: str | None = None
+    if skip_unchanged and not dry_run:
+        from restic.fingerprint import (
+            fingerprint_tree,
+            get_manifest_key,
+            read_fingerprint,
         )
-    except CalledProcessError as error:
-        if search(
-            "Is there a repository at the following location?",
-            error.stderr,
-            flags=MULTILINE,
-        ):
-            LOGGER.info("Auto-initializing repo...")
-            init(repo, password=password)
-            _backup_core(
-                path,
+
+        key = get_manifest_key(
+            repo, paths, exclude=exclude, exclude_i=exclude_i, tag=tag_backup
+        )
+        with time_phase(result.timings, "fingerprint"):
+            fingerprint = fingerprint_tree(paths)
+        if read_fingerprint(manifest, key=key) == fingerprint:
+            LOGGER.info(
+                "Skipped backing up %s to '%s'; nothing changed since the last backup",
+                desc,
                 repo,
-                password=password,
-                dry_run=dry_run,
-                exclude=exclude,
-                exclude_i=exclude_i,
-                read_concurrency=read_concurrency,
-                tag=tag_backup,
             )
-        else:
-            raise
-    if run_forget:
-        forget(
+            result.skipped = True
+    if not result.skipped:
+        if auto_read_concurrency:
+            from restic.tuning import resolve_read_concurrency
+
+            with time_phase(result.timings, "calibrate"):
+                read_concurrency = resolve_read_concurrency(
+                    paths, cache_dir=cache_dir, recalibrate=recalibrate
+                )
+            LOGGER.info("Using read_concurrency=%d", read_concurrency)
+        retry = partial(call_with_retry, repo=repo, password=password, retries=retries)
+        with (
+            nullcontext() if restic_cache_dir is None else track_cache(restic_cache_dir)
+        ):
+            for group in group_paths(paths, n=groups):
+                if groups is not None:
+                    LOGGER.info("Backing up group %s...", describe_paths(group))
+                core = partial(
+                    _backup_core,
+                    group,
+                    repo,
+                    password=password,
+                    env=env,
+                    dry_run=dry_run,
+                    exclude=exclude,
+                    exclude_i=exclude_i,
+                    progress=progress,
+                    progress_interval=progress_interval,
+                    read_concurrency=read_concurrency,
+                    tag=tag_backup,
+                    restic_cache_dir=restic_cache_dir,
+                )
+                try:
+                    with time_phase(result.timings, "backup"):
+                        messages = retry(core)
+                except CalledProcessError as error:
+                    if auto_init and search(
+                        "Is there a repository at the following location?",
+                        error.stderr,
+                        flags=MULTILINE,
+                    ):
+                        LOGGER.info("Auto-initializing repo...")
+                        with time_phase(result.timings, "init"):
+                            init(
+                                repo,
+                                password=password,
+                                env=env,
+                                restic_cache_dir=restic_cache_dir,
+                            )
+                        with time_phase(result.timings, "backup"):
+                            messages = retry(core)
+                    else:
+                        raise
+                result.add_messages(messages)
+        if (key is not None) and (fingerprint is not None):
+            from restic.fingerprint import write_fingerprint
+
+            write_fingerprint(manifest, key=key, fingerprint=fingerprint)
+        LOGGER.info(
+            "Backed up %s to '%s'; snapshots %s, %d new/%d changed/%d unmodified files, %s added",
+            desc,
             repo,
-            password=password,
-            keep_last=keep_last,
-            keep_hourly=keep_hourly,
-            keep_daily=keep_daily,
-            keep_weekly=keep_weekly,
-            keep_monthly=keep_monthly,
-            keep_yearly=keep_yearly,
-            keep_within=keep_within,
-            keep_within_hourly=keep_within_hourly,
-            keep_within_daily=keep_within_daily,
-            keep_within_weekly=keep_within_weekly,
-            keep_within_monthly=keep_within_monthly,
-            keep_within_yearly=keep_within_yearly,
-            prune=prune,
-            repack_cacheable_only=repack_cacheable_only,
-            repack_small=repack_small,
-            repack_uncompressed=repack_uncompressed,
-            tag=tag_forget,
+            result.snapshot_ids,
+            result.files_new,
+            result.files_changed,
+            result.files_unmodified,
+            format_size(result.data_added),
         )
+        if run_forget:
+            with time_phase(result.timings, "forget"):
+                result.forget = forget(
+                    repo,
+                    password=password,
+                    env=env,
+                    cache_dir=cache_dir,
+                    restic_cache_dir=restic_cache_dir,
+                    keep_last=keep_last,
+                    keep_hourly=keep_hourly,
+                    keep_daily=keep_daily,
+                    keep_weekly=keep_weekly,
+                    keep_monthly=keep_monthly,
+                    keep_yearly=keep_yearly,
+                    keep_within=keep_within,
+                    keep_within_hourly=keep_within_hourly,
+                    keep_within_daily=keep_within_daily,
+                    keep_within_weekly=keep_within_weekly,
+                    keep_within_monthly=keep_within_monthly,
+                    keep_within_yearly=keep_within_yearly,
+                    prune=prune,
+                    max_unused=max_unused,
+                    max_repack_size=max_repack_size,
+                    repack_cacheable_only=repack_cacheable_only,
+                    repack_small=repack_small,
+                    repack_uncompressed=repack_uncompressed,
+                    skip_noop=skip_noop_forget,
+                    tag=tag_forget,
+                    metrics=metrics,
+                    retries=retries,
+                )
+        if (restic_cache_dir is not None) and (max_cache_size is not None):
+            with time_phase(result.timings, "evict"):
+                _ = evict_cache(restic_cache_dir, max_size=parse_size(max_cache_size))
+    if (metrics is not None) and not dry_run:
+        from restic.metrics import record_backup
+
+        record_backup(metrics, result, repo=repo, paths=paths)
     if sleep is None:
-        LOGGER.info("Finished backing up '%s' to '%s'", path, repo)
+        LOGGER.info("Finished backing up %s to '%s'", desc, repo)
     else:
+        from whenever import TimeDelta
+
         delta = TimeDelta(seconds=sleep)
         LOGGER.info(
-            "Finished backing up '%s' to '%s'; sleeping for %s...", path, repo, delta
+            "Finished backing up %s to '%s'; sleeping for %s...", desc, repo, delta
         )
-        time.sleep(sleep)
+        with time_phase(result.timings, "sleep"):
+            time.sleep(sleep)
         LOGGER.info("Finishing sleeping for %s", delta)
+    return result
 
 
+@resolve_settings
 def _backup_core(
-    path: PathLike,
+    paths: list[PathLike],
     repo: Repo,
     /,
     *,
     password: PasswordLike = SETTINGS.password,
+    env: Mapping[str, str] | None = None,
     dry_run: bool = SETTINGS.dry_run,
     exclude: list[str] | None = SETTINGS.exclude_backup,
     exclude_i: list[str] | None = SETTINGS.exclude_i_backup,
+    progress: ProgressCallback | None = None,
+    progress_interval: int = SETTINGS.progress_interval,
     read_concurrency: int = SETTINGS.read_concurrency,
     tag: list[str] | None = SETTINGS.tag_backup,
-) -> None:
-    with yield_repo_env(repo), yield_password(password=password):
-        run(
-            "restic",
+    restic_cache_dir: PathLike | None = SETTINGS.restic_cache_dir,
+) -> list[Message]:
+    with _yield_env(
+        repo, password=password, env=env, restic_cache_dir=restic_cache_dir
+    ) as env_use:
+        return _run(
             "backup",
+            *expand_repo_options(repo),
             *expand_dry_run(dry_run=dry_run),
             *expand_exclude(exclude=exclude),
             *expand_exclude_i(exclude_i=exclude_i),
             "--read-concurrency",
             str(read_concurrency),
             *expand_tag(tag=tag),
-            str(path),
-            print=True,
+            *map(str, paths),
+            env=env_use,
+            progress=progress,
+            progress_interval=progress_interval,
         )
 
 
-def init(repo: Repo, /, *, password: PasswordLike = SETTINGS.password) -> None:
+@resolve_settings
+def init(
+    repo: Repo,
+    /,
+    *,
+    password: PasswordLike = SETTINGS.password,
+    env: Mapping[str, str] | None = None,
+    restic_cache_dir: PathLike | None = SETTINGS.restic_cache_dir,
+) -> None:
     LOGGER.info("Initializing '%s'", repo)
-    with yield_repo_env(repo), yield_password(password=password):
-        run("restic", "init", print=True)
+    with _yield_env(
+        repo, password=password, env=env, restic_cache_dir=restic_cache_dir
+    ) as env_use:
+        _call("init", *expand_repo_options(repo), env=env_use)
     LOGGER.info("Finished initializing '%s'", repo)
 
 
+@traced("copy")
+@resolve_settings
 def copy(
     src: Repo,
     dest: Repo,
@@ -176,33 +346,320 @@ def copy(
     *,
     src_password: PasswordLike = SETTINGS.password,
     dest_password: PasswordLike = SETTINGS.password,
+    connections: int | None = SETTINGS.connections,
+    limit_download: int | None = SETTINGS.limit_download,
+    limit_upload: int | None = SETTINGS.limit_upload,
+    progress: ProgressCallback | None = None,
+    progress_interval: int = SETTINGS.progress_interval,
     tag: list[str] | None = SETTINGS.tag_copy,
+    incremental: bool = SETTINGS.incremental_copy,
+    batch_size: int = SETTINGS.copy_batch_size,
+    cache_dir: PathLike = SETTINGS.cache_dir,
+    restic_cache_dir: PathLike | None = SETTINGS.restic_cache_dir,
+    max_age: int | None = SETTINGS.index_max_age,
+    metrics: PathLike | None = SETTINGS.metrics,
+    retries: int = SETTINGS.retries,
     sleep: int | None = SETTINGS.sleep,
-) -> None:
+) -> CopyResult:
     LOGGER.info("Copying snapshots from '%s' to '%s'...", src, dest)
-    with (
-        yield_repo_env(src, env_var="RESTIC_FROM_REPOSITORY"),
-        yield_repo_env(dest),
-        yield_password(password=src_password, env_var="RESTIC_FROM_PASSWORD_FILE"),
-        yield_password(password=dest_password),
-    ):
-        run("restic", "copy", *expand_tag(tag=tag), print=True)
+    result = _copy_core(
+        src,
+        dest,
+        src_password=src_password,
+        dest_password=dest_password,
+        connections=connections,
+        limit_download=limit_download,
+        limit_upload=limit_upload,
+        progress=progress,
+        progress_interval=progress_interval,
+        tag=tag,
+        snapshots=_copy_candidates(
+            src,
+            password=src_password,
+            tag=tag,
+            incremental=incremental,
+            cache_dir=cache_dir,
+            restic_cache_dir=restic_cache_dir,
+            max_age=max_age,
+        ),
+        batch_size=batch_size,
+        cache_dir=cache_dir,
+        restic_cache_dir=restic_cache_dir,
+        max_age=max_age,
+        retries=retries,
+    )
+    if metrics is not None:
+        from restic.metrics import record_copy
+
+        record_copy(metrics, result, src=src, dest=dest)
+    if sleep is None:
+        LOGGER.info(
+            "Finished copying %d snapshot(s) from '%s' to '%s'",
+            len(result.snapshot_ids),
+            src,
+            dest,
+        )
+    else:
+        from whenever import TimeDelta
+
+        delta = TimeDelta(seconds=sleep)
+        LOGGER.info(
+            "Finished copying %d snapshot(s) from '%s' to '%s'; sleeping for %s...",
+            len(result.snapshot_ids),
+            src,
+            dest,
+            delta,
+        )
+        with time_phase(result.timings, "sleep"):
+            time.sleep(sleep)
+        LOGGER.info("Finishing sleeping for %s", delta)
+    return result
+
+
+@traced("copy")
+@resolve_settings
+def copy_many(
+    src: Repo,
+    dests: Sequence[Repo],
+    /,
+    *,
+    src_password: PasswordLike = SETTINGS.password,
+    dest_password: PasswordLike = SETTINGS.password,
+    dest_passwords: Sequence[PasswordLike] | None = None,
+    connections: int | None = SETTINGS.connections,
+    limit_download: int | None = SETTINGS.limit_download,
+    limit_upload: int | None = SETTINGS.limit_upload,
+    progress: Callable[[Repo, Progress], None] | None = None,
+    progress_interval: int = SETTINGS.progress_interval,
+    tag: list[str] | None = SETTINGS.tag_copy,
+    incremental: bool = SETTINGS.incremental_copy,
+    batch_size: int = SETTINGS.copy_batch_size,
+    cache_dir: PathLike = SETTINGS.cache_dir,
+    max_age: int | None = SETTINGS.index_max_age,
+    metrics: PathLike | None = SETTINGS.metrics,
+    retries: int = SETTINGS.retries,
+    sleep: int | None = SETTINGS.sleep,
+) -> dict[Repo, CopyResult]:
+    passwords = (
+        [dest_password] * len(dests) if dest_passwords is None else dest_passwords
+    )
+    if len(passwords) != len(dests):
+        msg = f"Expected {len(dests)} destination password(s); got {len(passwords)}"
+        raise ValueError(msg)
+    desc = ", ".join(f"'{d}'" for d in dests)
+    LOGGER.info("Copying snapshots from '%s' to %s...", src, desc)
+    snapshots = _copy_candidates(
+        src,
+        password=src_password,
+        tag=tag,
+        incremental=incremental,
+        cache_dir=cache_dir,
+        max_age=max_age,
+    )
+    with ThreadPoolExecutor(max_workers=max(len(dests), 1)) as pool:
+        futures = {
+            dest: pool.submit(
+                _copy_core,
+                src,
+                dest,
+                src_password=src_password,
+                dest_password=password,
+                connections=connections,
+                limit_download=_share(limit_download, len(dests)),
+                limit_upload=_share(limit_upload, len(dests)),
+                progress=None if progress is None else partial(progress, dest),
+                progress_interval=progress_interval,
+                tag=tag,
+                snapshots=snapshots,
+                batch_size=batch_size,
+                cache_dir=cache_dir,
+                max_age=max_age,
+                retries=retries,
+            )
+            for dest, password in zip(dests, passwords, strict=True)
+        }
+    results: dict[Repo, CopyResult] = {}
+    for dest, future in futures.items():
+        try:
+            results[dest] = future.result()
+        except Exception as error:  # noqa: BLE001
+            LOGGER.error(
+                "Failed to copy snapshots from '%s' to '%s': %s", src, dest, error
+            )
+            results[dest] = CopyResult(error=repr(error))
+        else:
+            LOGGER.info(
+                "Copied %d snapshot(s) from '%s' to '%s'",
+                len(results[dest].snapshot_ids),
+                src,
+                dest,
+            )
+            if metrics is not None:
+                from restic.metrics import record_copy
+
+                record_copy(metrics, results[dest], src=src, dest=dest)
+    failed = sum(r.error is not None for r in results.values())
     if sleep is None:
-        LOGGER.info("Finished copying snapshots from '%s' to '%s'", src, dest)
+        LOGGER.info(
+            "Finished copying snapshots from '%s' to %s; %d failed", src, desc, failed
+        )
     else:
+        from whenever import TimeDelta
+
         delta = TimeDelta(seconds=sleep)
         LOGGER.info(
-            "Finished copying snapshots from '%s' to '%s'; sleeping for %s...", delta
+            "Finished copying snapshots from '%s' to %s; %d failed; sleeping for %s...",
+            src,
+            desc,
+            failed,
+            delta,
         )
         time.sleep(sleep)
         LOGGER.info("Finishing sleeping for %s", delta)
+    return results
+
+
+@resolve_settings
+def _copy_core(
+    src: Repo,
+    dest: Repo,
+    /,
+    *,
+    src_password: PasswordLike = SETTINGS.password,
+    dest_password: PasswordLike = SETTINGS.password,
+    connections: int | None = SETTINGS.connections,
+    limit_download: int | None = SETTINGS.limit_download,
+    limit_upload: int | None = SETTINGS.limit_upload,
+    progress: ProgressCallback | None = None,
+    progress_interval: int = SETTINGS.progress_interval,
+    tag: list[str] | None = SETTINGS.tag_copy,
+    snapshots: list[Snapshot] | None = None,
+    batch_size: int = SETTINGS.copy_batch_size,
+    cache_dir: PathLike = SETTINGS.cache_dir,
+    restic_cache_dir: PathLike | None = SETTINGS.restic_cache_dir,
+    max_age: int | None = SETTINGS.index_max_age,
+    retries: int = SETTINGS.retries,
+) -> CopyResult:
+    result = CopyResult()
+    with (
+        yield_password_env(
+            password=src_password, env_var="RESTIC_FROM_PASSWORD_FILE"
+        ) as src_env,
+        yield_password_env(password=dest_password) as dest_env,
+    ):
+        env = {
+            **get_repo_env(
+                src, env_var="RESTIC_FROM_REPOSITORY", restic_cache_dir=restic_cache_dir
+            ),
+            **get_repo_env(dest, restic_cache_dir=restic_cache_dir),
+            **src_env,
+            **dest_env,
+        }
+        args = [
+            "copy",
+            *expand_repo_options(
+                dest,
+                src=src,
+                connections=connections,
+                limit_download=limit_download,
+                limit_upload=limit_upload,
+            ),
+        ]
+        retry = partial(
+            call_with_retry, repo=dest, password=dest_password, retries=retries
+        )
+        if snapshots is None:
+            with time_phase(result.timings, "copy"):
+                result.add_messages(
+                    retry(
+                        partial(
+                            _run,
+                            *args,
+                            *expand_tag(tag=tag),
+                            env=env,
+                            progress=progress,
+                            progress_interval=progress_interval,
+                        )
+                    )
+                )
+            return result
+        from restic.index import find_missing
+
+        with (
+            time_phase(result.timings, "plan"),
+            sync_index(
+                dest,
+                password=dest_password,
+                cache_dir=cache_dir,
+                max_age=max_age,
+                restic_cache_dir=restic_cache_dir,
+            ) as index,
+        ):
+            missing = find_missing(snapshots, index.query())
+        if len(missing) == 0:
+            LOGGER.info("Nothing to copy to '%s'; all snapshots present", dest)
+            return result
+        batches = [
+            missing[i : i + batch_size] for i in range(0, len(missing), batch_size)
+        ]
+        for i, batch in enumerate(batches, start=1):
+            LOGGER.info(
+                "Copying batch %d/%d (%d snapshot(s)) to '%s'...",
+                i,
+                len(batches),
+                len(batch),
+                dest,
+            )
+            with time_phase(result.timings, "copy"):
+                result.add_messages(
+                    retry(
+                        partial(
+                            _run,
+                            *args,
+                            *(s.id for s in batch),
+                            env=env,
+                            progress=progress,
+                            progress_interval=progress_interval,
+                        )
+                    )
+                )
+    return result
 
 
+@resolve_settings
+def _copy_candidates(
+    src: Repo,
+    /,
+    *,
+    password: PasswordLike = SETTINGS.password,
+    tag: list[str] | None = SETTINGS.tag_copy,
+    incremental: bool = SETTINGS.incremental_copy,
+    cache_dir: PathLike = SETTINGS.cache_dir,
+    restic_cache_dir: PathLike | None = SETTINGS.restic_cache_dir,
+    max_age: int | None = SETTINGS.index_max_age,
+) -> list[Snapshot] | None:
+    if not incremental:
+        return None
+    with sync_index(
+        src,
+        password=password,
+        cache_dir=cache_dir,
+        max_age=max_age,
+        restic_cache_dir=restic_cache_dir,
+    ) as index:
+        return index.query(tag=tag)
+
+
+@traced("forget")
+@resolve_settings
 def forget(
     repo: Repo,
     /,
     *,
     password: PasswordLike = SETTINGS.password,
+    env: Mapping[str, str] | None = None,
+    restic_cache_dir: PathLike | None = SETTINGS.restic_cache_dir,
+    cache_dir: PathLike = SETTINGS.cache_dir,
     dry_run: bool = SETTINGS.dry_run,
     keep_last: int | None = SETTINGS.keep_last,
     keep_hourly: int | None = SETTINGS.keep_hourly,
@@ -217,59 +674,315 @@ def forget(
     keep_within_monthly: str | None = SETTINGS.keep_within_monthly,
     keep_within_yearly: str | None = SETTINGS.keep_within_yearly,
     prune: bool = SETTINGS.prune,
+    max_unused: str | None = SETTINGS.max_unused,
+    max_repack_size: str | None = SETTINGS.max_repack_size,
     repack_cacheable_only: bool = SETTINGS.repack_cacheable_only,
     repack_small: bool = SETTINGS.repack_small,
     repack_uncompressed: bool = SETTINGS.repack_uncompressed,
+    skip_noop: bool = SETTINGS.skip_noop_forget,
     tag: list[str] | None = SETTINGS.tag_forget,
-) -> None:
+    metrics: PathLike | None = SETTINGS.metrics,
+    retries: int = SETTINGS.retries,
+) -> ForgetResult:
     LOGGER.info("Forgetting snapshots in '%s'...", repo)
-    with yield_repo_env(repo), yield_password(password=password):
-        run(
-            "restic",
-            "forget",
-            *expand_dry_run(dry_run=dry_run),
-            *expand_keep("last", n=keep_last),
-            *expand_keep("hourly", n=keep_hourly),
-            *expand_keep("daily", n=keep_daily),
-            *expand_keep("weekly", n=keep_weekly),
-            *expand_keep("monthly", n=keep_monthly),
-            *expand_keep("yearly", n=keep_yearly),
-            *expand_keep_within("within", duration=keep_within),
-            *expand_keep_within("within-hourly", duration=keep_within_hourly),
-            *expand_keep_within("within-daily", duration=keep_within_daily),
-            *expand_keep_within("within-weekly", duration=keep_within_weekly),
-            *expand_keep_within("within-monthly", duration=keep_within_monthly),
-            *expand_keep_within("within-yearly", duration=keep_within_yearly),
-            *expand_bool("prune", bool_=prune),
-            *expand_bool("repack-cacheable-only", bool_=repack_cacheable_only),
-            *expand_bool("repack-small", bool_=repack_small),
-            *expand_bool("repack-uncompressed", bool_=repack_uncompressed),
-            *expand_tag(tag=tag),
-            print=True,
+    result = ForgetResult()
+    if skip_noop:
+        with time_phase(result.timings, "plan"):
+            retention = plan(
+                repo,
+                password=password,
+                env=env,
+                cache_dir=cache_dir,
+                max_age=None,
+                restic_cache_dir=restic_cache_dir,
+                keep_last=keep_last,
+                keep_hourly=keep_hourly,
+                keep_daily=keep_daily,
+                keep_weekly=keep_weekly,
+                keep_monthly=keep_monthly,
+                keep_yearly=keep_yearly,
+                keep_within=keep_within,
+                keep_within_hourly=keep_within_hourly,
+                keep_within_daily=keep_within_daily,
+                keep_within_weekly=keep_within_weekly,
+                keep_within_monthly=keep_within_monthly,
+                keep_within_yearly=keep_within_yearly,
+                tag=tag,
+            )
+        if len(retention.remove) == 0:
+            result.kept = len(retention.keep)
+            LOGGER.info(
+                "Nothing to forget in '%s'; keeping all %d snapshot(s)",
+                repo,
+                result.kept,
+            )
+            if (metrics is not None) and not dry_run:
+                from restic.metrics import record_forget
+
+                record_forget(metrics, result, repo=repo)
+            return result
+    with (
+        time_phase(result.timings, "forget"),
+        _yield_env(
+            repo, password=password, env=env, restic_cache_dir=restic_cache_dir
+        ) as env_use,
+    ):
+        messages = call_with_retry(
+            partial(
+                _run,
+                "forget",
+                *expand_repo_options(repo),
+                *expand_dry_run(dry_run=dry_run),
+                *expand_keep("last", n=keep_last),
+                *expand_keep("hourly", n=keep_hourly),
+                *expand_keep("daily", n=keep_daily),
+                *expand_keep("weekly", n=keep_weekly),
+                *expand_keep("monthly", n=keep_monthly),
+                *expand_keep("yearly", n=keep_yearly),
+                *expand_keep_within("within", duration=keep_within),
+                *expand_keep_within("within-hourly", duration=keep_within_hourly),
+                *expand_keep_within("within-daily", duration=keep_within_daily),
+                *expand_keep_within("within-weekly", duration=keep_within_weekly),
+                *expand_keep_within("within-monthly", duration=keep_within_monthly),
+                *expand_keep_within("within-yearly", duration=keep_within_yearly),
+                *expand_bool("prune", bool_=prune),
+                *(
+                    _expand_prune(
+                        max_unused=max_unused,
+                        max_repack_size=max_repack_size,
+                        repack_cacheable_only=repack_cacheable_only,
+                        repack_small=repack_small,
+                        repack_uncompressed=repack_uncompressed,
+                    )
+                    if prune
+                    else []
+                ),
+                *expand_tag(tag=tag),
+                env=env_use,
+            ),
+            repo=repo,
+            password=password,
+            retries=retries,
+        )
+    result.add_messages(messages)
+    if (metrics is not None) and not dry_run:
+        from restic.metrics import record_forget
+
+        record_forget(metrics, result, repo=repo)
+    LOGGER.info(
+        "Finished forgetting snapshots in '%s'; kept %d, removed %d",
+        repo,
+        result.kept,
+        result.removed,
+    )
+    return result
+
+
+@resolve_settings
+def plan(
+    repo: Repo,
+    /,
+    *,
+    password: PasswordLike = SETTINGS.password,
+    env: Mapping[str, str] | None = None,
+    restic_cache_dir: PathLike | None = SETTINGS.restic_cache_dir,
+    cache_dir: PathLike = SETTINGS.cache_dir,
+    max_age: int | None = SETTINGS.index_max_age,
+    keep_last: int | None = SETTINGS.keep_last,
+    keep_hourly: int | None = SETTINGS.keep_hourly,
+    keep_daily: int | None = SETTINGS.keep_daily,
+    keep_weekly: int | None = SETTINGS.keep_weekly,
+    keep_monthly: int | None = SETTINGS.keep_monthly,
+    keep_yearly: int | None = SETTINGS.keep_yearly,
+    keep_within: str | None = SETTINGS.keep_within,
+    keep_within_hourly: str | None = SETTINGS.keep_within_hourly,
+    keep_within_daily: str | None = SETTINGS.keep_within_daily,
+    keep_within_weekly: str | None = SETTINGS.keep_within_weekly,
+    keep_within_monthly: str | None = SETTINGS.keep_within_monthly,
+    keep_within_yearly: str | None = SETTINGS.keep_within_yearly,
+    tag: list[str] | None = SETTINGS.tag_forget,
+) -> RetentionPlan:
+    with sync_index(
+        repo,
+        password=password,
+        env=env,
+        cache_dir=cache_dir,
+        max_age=max_age,
+        restic_cache_dir=restic_cache_dir,
+    ) as index:
+        snapshots = index.query()
+    return plan_retention(
+        snapshots,
+        keep_last=keep_last,
+        keep_hourly=keep_hourly,
+        keep_daily=keep_daily,
+        keep_weekly=keep_weekly,
+        keep_monthly=keep_monthly,
+        keep_yearly=keep_yearly,
+        keep_within=keep_within,
+        keep_within_hourly=keep_within_hourly,
+        keep_within_daily=keep_within_daily,
+        keep_within_weekly=keep_within_weekly,
+        keep_within_monthly=keep_within_monthly,
+        keep_within_yearly=keep_within_yearly,
+        tag=tag,
+    )
+
+
+@traced("prune")
+@resolve_settings
+def prune(
+    repo: Repo,
+    /,
+    *,
+    password: PasswordLike = SETTINGS.password,
+    env: Mapping[str, str] | None = None,
+    restic_cache_dir: PathLike | None = SETTINGS.restic_cache_dir,
+    dry_run: bool = SETTINGS.dry_run,
+    max_unused: str | None = SETTINGS.max_unused,
+    max_repack_size: str | None = SETTINGS.max_repack_size,
+    min_reclaim: str | None = SETTINGS.min_reclaim,
+    min_unused_pct: float | None = SETTINGS.min_unused_pct,
+    repack_cacheable_only: bool = SETTINGS.repack_cacheable_only,
+    repack_small: bool = SETTINGS.repack_small,
+    repack_uncompressed: bool = SETTINGS.repack_uncompressed,
+    metrics: PathLike | None = SETTINGS.metrics,
+    retries: int = SETTINGS.retries,
+    sleep: int | None = SETTINGS.sleep,
+) -> PruneResult:
+    LOGGER.info("Estimating reclaimable space in '%s'...", repo)
+    result = PruneResult()
+    args = [
+        *expand_repo_options(repo),
+        *_expand_prune(
+            max_unused=max_unused,
+            max_repack_size=max_repack_size,
+            repack_cacheable_only=repack_cacheable_only,
+            repack_small=repack_small,
+            repack_uncompressed=repack_uncompressed,
+        ),
+    ]
+    retry = partial(call_with_retry, repo=repo, password=password, retries=retries)
+    with _yield_env(
+        repo, password=password, env=env, restic_cache_dir=restic_cache_dir
+    ) as env_use:
+        with time_phase(result.timings, "estimate"):
+            result.add_messages(
+                retry(
+                    lambda: list(
+                        stream_json("restic", "prune", "--dry-run", *args, env=env_use)
+                    )
+                )
+            )
+        LOGGER.info(
+            "Estimated '%s'; %s reclaimable, %s unused (%.2f%%), %s to repack in %d pack(s)",
+            repo,
+            format_size(result.reclaimable),
+            format_size(result.unused),
+            result.unused_pct,
+            format_size(result.to_repack),
+            result.packs_to_repack,
         )
-    LOGGER.info("Finished forgetting snapshots in '%s'", repo)
+        if not result.exceeds(
+            min_reclaim=None if min_reclaim is None else parse_size(min_reclaim),
+            min_unused_pct=min_unused_pct,
+        ):
+            LOGGER.info("Skipping pruning '%s'; below thresholds", repo)
+        elif dry_run:
+            LOGGER.info("Would prune '%s'", repo)
+        else:
+            LOGGER.info("Pruning '%s'...", repo)
+            with time_phase(result.timings, "prune"):
+                retry(partial(_call, "prune", *args, env=env_use))
+            result.pruned = True
+    if (metrics is not None) and not dry_run:
+        from restic.metrics import record_prune
+
+        record_prune(metrics, result, repo=repo)
+    if sleep is None:
+        LOGGER.info("Finished pruning '%s'", repo)
+    else:
+        from whenever import TimeDelta
+
+        delta = TimeDelta(seconds=sleep)
+        LOGGER.info("Finished pruning '%s'; sleeping for %s...", repo, delta)
+        with time_phase(result.timings, "sleep"):
+            time.sleep(sleep)
+        LOGGER.info("Finishing sleeping for %s", delta)
+    return result
+
 
+@resolve_settings
+def query(
+    repo: Repo,
+    /,
+    *,
+    password: PasswordLike = SETTINGS.password,
+    env: Mapping[str, str] | None = None,
+    restic_cache_dir: PathLike | None = SETTINGS.restic_cache_dir,
+    cache_dir: PathLike = SETTINGS.cache_dir,
+    max_age: int | None = SETTINGS.index_max_age,
+    host: str | None = SETTINGS.host_query,
+    path: str | None = SETTINGS.path_query,
+    tag: list[str] | None = SETTINGS.tag_query,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    latest: int | None = SETTINGS.latest_query,
+) -> list[Snapshot]:
+    with sync_index(
+        repo,
+        password=password,
+        env=env,
+        cache_dir=cache_dir,
+        max_age=max_age,
+        restic_cache_dir=restic_cache_dir,
+    ) as index:
+        return index.query(
+            host=host, path=path, tag=tag, since=since, until=until, latest=latest
+        )
 
+
+@traced("restore")
+@resolve_settings
 def restore(
     repo: Repo,
     target: PathLike,
     /,
     *,
     password: PasswordLike = SETTINGS.password,
+    env: Mapping[str, str] | None = None,
+    restic_cache_dir: PathLike | None = SETTINGS.restic_cache_dir,
     delete: bool = SETTINGS.delete,
     dry_run: bool = SETTINGS.dry_run,
     exclude: list[str] | None = SETTINGS.exclude_restore,
     exclude_i: list[str] | None = SETTINGS.exclude_i_restore,
     include: list[str] | None = SETTINGS.include_restore,
     include_i: list[str] | None = SETTINGS.include_i_restore,
+    progress: ProgressCallback | None = None,
+    progress_interval: int = SETTINGS.progress_interval,
+    shards: int | None = SETTINGS.restore_shards,
+    workers: int | None = SETTINGS.restore_workers,
+    verify: VerifyMode = SETTINGS.verify_restore,
+    verify_fraction: float = SETTINGS.verify_fraction,
+    verify_workers: int | None = SETTINGS.verify_workers,
     tag: list[str] | None = SETTINGS.tag_restore,
     snapshot: str = SETTINGS.snapshot,
-) -> None:
+    metrics: PathLike | None = SETTINGS.metrics,
+) -> RestoreResult:
+    if (shards is not None) and (
+        delete or (include is not None) or (include_i is not None)
+    ):
+        msg = "Sharded restores cannot be combined with 'delete' or include patterns"
+        raise ValueError(msg)
     LOGGER.info("Restoring snapshot '%s' of '%s' to '%s'...", snapshot, repo, target)
-    with yield_repo_env(repo), yield_password(password=password):
-        run(
-            "restic",
+    result = RestoreResult()
+    with _yield_env(
+        repo, password=password, env=env, restic_cache_dir=restic_cache_dir
+    ) as env_use:
+        options = expand_repo_options(repo)
+        args = [
             "restore",
+            *options,
             *expand_bool("delete", bool_=delete),
             *expand_dry_run(dry_run=dry_run),
             *expand_exclude(exclude=exclude),
@@ -279,20 +992,368 @@ def restore(
             *expand_tag(tag=tag),
             "--target",
             str(target),
-            "--verify",
-            snapshot,
-            print=True,
-        )
+            *(["--verify"] if verify == "full" else []),
+        ]
+        snapshot_id = snapshot
+        roots: list[str] = []
+        nodes: list[dict[str, Any]] = []
+        if (shards is not None) or (verify == "sample"):
+            with time_phase(result.timings, "plan"):
+                snapshot_id, roots, nodes = _ls(
+                    snapshot, env=env_use, options=options, tag=tag
+                )
+        groups: list[list[str]] = []
+        if shards is not None:
+            from restic.sharding import get_unit_sizes, plan_shards
+
+            groups = plan_shards(get_unit_sizes(nodes, roots), n=shards)
+            if len(groups) <= 1:
+                LOGGER.info(
+                    "Restoring snapshot '%s' unsharded; %d unit(s) to shard",
+                    snapshot_id,
+                    sum(map(len, groups)),
+                )
+        if len(groups) <= 1:
+            with time_phase(result.timings, "restore"):
+                result.add_messages(
+                    _run(
+                        *args,
+                        snapshot_id,
+                        env=env_use,
+                        progress=progress,
+                        progress_interval=progress_interval,
+                    )
+                )
+        else:
+            LOGGER.info(
+                "Restoring snapshot '%s' in %d shard(s)...", snapshot_id, len(groups)
+            )
+            merger = _ProgressMerger(progress)
+            with (
+                time_phase(result.timings, "restore"),
+                ThreadPoolExecutor(max_workers=workers) as pool,
+            ):
+                futures = [
+                    pool.submit(
+                        _run,
+                        *args,
+                        *expand_include(include=group),
+                        snapshot_id,
+                        env=env_use,
+                        progress=None if progress is None else partial(merger, i),
+                        progress_interval=progress_interval,
+                    )
+                    for i, group in enumerate(groups)
+                ]
+                for future in futures:
+                    result.add_messages(future.result())
+        if (verify == "sample") and not dry_run:
+            from restic.verify import sample_files, verify_files
+
+            filtered = any(
+                p is not None for p in [exclude, exclude_i, include, include_i]
+            )
+            candidates = [
+                n
+                for n in nodes
+                if not filtered or Path(target, n["path"].lstrip("/")).exists()
+            ]
+            sample = sample_files(candidates, fraction=verify_fraction)
+            LOGGER.info("Verifying %d sampled file(s)...", len(sample))
+            with time_phase(result.timings, "verify"):
+                result.verify_failures = verify_files(
+                    snapshot_id,
+                    sample,
+                    target,
+                    env=env_use,
+                    options=options,
+                    workers=verify_workers,
+                )
+            result.files_verified = len(sample)
+            LOGGER.info(
+                "Verified %d sampled file(s); %d failed",
+                result.files_verified,
+                len(result.verify_failures),
+            )
+    if (metrics is not None) and not dry_run:
+        from restic.metrics import record_restore
+
+        record_restore(metrics, result, repo=repo, target=target)
+    LOGGER.info(
+        "Finished restoring snapshot '%s' of '%s' to '%s'; %d files, %s restored",
+        snapshot,
+        repo,
+        target,
+        result.files_restored,
+        format_size(result.bytes_restored),
+    )
+    return result
+
+
+class _ProgressMerger:
+    def __init__(self, progress: ProgressCallback | None, /) -> None:
+        super().__init__()
+        self._progress = progress
+        self._latest: dict[int, Progress] = {}
+        self._lock = Lock()
+
+    def __call__(self, shard: int, progress: Progress, /) -> None:
+        with self._lock:
+            self._latest[shard] = progress
+            combined = combine_progress(self._latest.values())
+        if self._progress is not None:
+            self._progress(combined)
+
+
+@resolve_settings
+def _ls(
+    snapshot: str,
+    /,
+    *,
+    env: Mapping[str, str],
+    options: Sequence[str] = (),
+    tag: list[str] | None = SETTINGS.tag_restore,
+) -> tuple[str, list[str], list[dict[str, Any]]]:
+    snapshot_id = snapshot
+    roots: list[str] = []
+    nodes: list[dict[str, Any]] = []
+    for message in stream_json(
+        "restic",
+        "--json",
+        "ls",
+        "--no-lock",
+        *options,
+        *expand_tag(tag=tag),
+        snapshot,
+        env=env,
+    ):
+        match message:
+            case {"struct_type": "snapshot"}:
+                snapshot_id = message["id"]
+                roots = message.get("paths") or []
+            case {"struct_type": "node"}:
+                nodes.append(message)
+            case _:
+                ...
+    return snapshot_id, roots, nodes
+
+
+@traced("warm_cache")
+@resolve_settings
+def warm_cache(
+    repo: Repo,
+    /,
+    *,
+    password: PasswordLike = SETTINGS.password,
+    restic_cache_dir: PathLike | None = SETTINGS.restic_cache_dir,
+    max_cache_size: str | None = SETTINGS.max_cache_size,
+) -> CacheStats | None:
+    if restic_cache_dir is None:
+        LOGGER.warning("Not warming the cache of '%s'; no cache directory", repo)
+        return None
+    LOGGER.info("Warming the cache of '%s'...", repo)
+    with (
+        yield_password_env(password=password) as password_env,
+        track_cache(restic_cache_dir),
+    ):
+        env = {**get_repo_env(repo, restic_cache_dir=restic_cache_dir), **password_env}
+        options = expand_repo_options(repo)
+        found = [
+            s
+            for m in stream_json(
+                "restic", "--json", "snapshots", "--no-lock", *options, env=env
+            )
+            if isinstance(m, list)
+            for s in m
+        ]
+        if len(found) >= 1:
+            latest = max(found, key=lambda s: s["time"])
+            args = ["restic", "ls", "--no-lock", *options, latest["id"]]
+            with trace_subprocess(args, repo=repo.repository):
+                _ = check_call(args, stdout=DEVNULL, env={**os.environ, **env})
+    if max_cache_size is not None:
+        _ = evict_cache(restic_cache_dir, max_size=parse_size(max_cache_size))
+    stats = get_cache_stats(restic_cache_dir)
     LOGGER.info(
-        "Finished restoring snapshot '%s' of '%s' to '%s'", snapshot, repo, target
+        "Warmed the cache of '%s'; %d snapshot(s), cache size %s",
+        repo,
+        len(found),
+        format_size(stats.size),
     )
+    return stats
 
 
-def snapshots(repo: Repo, /, *, password: PasswordLike = SETTINGS.password) -> None:
+@resolve_settings
+def snapshots(
+    repo: Repo,
+    /,
+    *,
+    password: PasswordLike = SETTINGS.password,
+    env: Mapping[str, str] | None = None,
+    restic_cache_dir: PathLike | None = SETTINGS.restic_cache_dir,
+) -> None:
     LOGGER.info("Listing snapshots in '%s'...", repo)
-    with yield_repo_env(repo), yield_password(password=password):
-        run("restic", "snapshots", print=True)
+    with _yield_env(
+        repo, password=password, env=env, restic_cache_dir=restic_cache_dir
+    ) as env_use:
+        _call("snapshots", *expand_repo_options(repo), env=env_use)
     LOGGER.info("Finished listing snapshots in '%s'", repo)
 
 
-__all__ = ["backup", "copy", "forget", "init", "restore", "snapshots"]
+@resolve_settings
+def sync_index(
+    repo: Repo,
+    /,
+    *,
+    password: PasswordLike = SETTINGS.password,
+    env: Mapping[str, str] | None = None,
+    restic_cache_dir: PathLike | None = SETTINGS.restic_cache_dir,
+    cache_dir: PathLike = SETTINGS.cache_dir,
+    max_age: int | None = SETTINGS.index_max_age,
+) -> SnapshotIndex:
+    from restic.index import Snapshot, SnapshotIndex
+
+    index = SnapshotIndex.for_repo(repo, cache_dir)
+    if (
+        (max_age is not None)
+        and ((synced_at := index.synced_at) is not None)
+        and (time.time() - synced_at <= max_age)
+    ):
+        return index
+    with _yield_env(
+        repo, password=password, env=env, restic_cache_dir=restic_cache_dir
+    ) as env_use:
+        options = expand_repo_options(repo)
+        ids = {
+            m
+            for m in stream_json(
+                "restic", "list", "snapshots", "--no-lock", *options, env=env_use
+            )
+            if isinstance(m, str)
+        }
+        existing = index.ids()
+        new, removed = ids - existing, existing - ids
+        if (len(new) == 0) and (len(removed) == 0):
+            index.update()
+            LOGGER.info("Snapshot index of '%s' is up to date (%d)", repo, len(ids))
+            return index
+        args = [] if len(new) > _MAX_SNAPSHOT_ARGS else sorted(new)
+        snapshots = [
+            Snapshot.parse(s)
+            for m in stream_json(
+                "restic",
+                "--json",
+                "snapshots",
+                "--no-lock",
+                *options,
+                *args,
+                env=env_use,
+            )
+            if isinstance(m, list)
+            for s in m
+            if s["id"] in new
+        ]
+    index.update(add=snapshots, remove=removed)
+    LOGGER.info(
+        "Synced snapshot index of '%s'; added %d, removed %d",
+        repo,
+        len(snapshots),
+        len(removed),
+    )
+    return index
+
+
+def _call(*args: str, env: Mapping[str, str]) -> None:
+    cmd = ["restic", *args]
+    with trace_subprocess(cmd) as attrs:
+        result = run_subprocess(
+            cmd, stderr=PIPE, text=True, env={**os.environ, **env}, check=False
+        )
+        _ = sys.stderr.write(result.stderr)
+        attrs["exit_code"] = result.returncode
+        if result.returncode != 0:
+            raise CalledProcessError(result.returncode, cmd, stderr=result.stderr)
+
+
+@resolve_settings
+def _expand_prune(
+    *,
+    max_unused: str | None = SETTINGS.max_unused,
+    max_repack_size: str | None = SETTINGS.max_repack_size,
+    repack_cacheable_only: bool = SETTINGS.repack_cacheable_only,
+    repack_small: bool = SETTINGS.repack_small,
+    repack_uncompressed: bool = SETTINGS.repack_uncompressed,
+) -> list[str]:
+    return [
+        *expand_max("unused", value=max_unused),
+        *expand_max("repack-size", value=max_repack_size),
+        *expand_bool("repack-cacheable-only", bool_=repack_cacheable_only),
+        *expand_bool("repack-small", bool_=repack_small),
+        *expand_bool("repack-uncompressed", bool_=repack_uncompressed),
+    ]
+
+
+def _share(limit: int | None, n: int, /) -> int | None:
+    return None if limit is None else max(limit // max(n, 1), 1)
+
+
+@contextmanager
+@resolve_settings
+def _yield_env(
+    repo: Repo,
+    /,
+    *,
+    password: PasswordLike = SETTINGS.password,
+    env: Mapping[str, str] | None = None,
+    restic_cache_dir: PathLike | None = SETTINGS.restic_cache_dir,
+) -> Iterator[dict[str, str]]:
+    if env is not None:
+        yield dict(env)
+        return
+    with yield_password_env(password=password) as password_env:
+        yield {**get_repo_env(repo, restic_cache_dir=restic_cache_dir), **password_env}
+
+
+@resolve_settings
+def _run(
+    *args: str,
+    env: Mapping[str, str] | None = None,
+    progress: ProgressCallback | None = None,
+    progress_interval: int = SETTINGS.progress_interval,
+) -> list[Message]:
+    interval = (
+        _QUIET_PROGRESS_INTERVAL if progress is None else max(progress_interval, 1)
+    )
+    env_use = {**({} if env is None else env), "RESTIC_PROGRESS_FPS": str(1 / interval)}
+    messages: list[Message] = []
+    for message in stream_json("restic", "--json", *args, env=env_use):
+        match message:
+            case str():
+                _ = sys.stdout.write(f"{message}\n")
+                messages.append(message)
+            case {"message_type": "status"}:
+                if (progress is not None) and (
+                    (progress_i := parse_progress(message)) is not None
+                ):
+                    progress(progress_i)
+            case dict() | list():
+                messages.append(message)
+            case never:
+                assert_never(never)
+    return messages
+
+
+__all__ = [
+    "backup",
+    "copy",
+    "copy_many",
+    "forget",
+    "init",
+    "plan",
+    "prune",
+    "query",
+    "restore",
+    "snapshots",
+    "sync_index",
+    "warm_cache",
+]
@@ -0,0 +1,400 @@
+from __future__ import annotations
+
+import fcntl
+import json
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from threading import Lock, Thread
+from typing import TYPE_CHECKING, Any, Literal, override
+
+from restic.logging import LOGGER
+from restic.settings import SETTINGS, resolve_settings
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator, Mapping, Sequence
+
+    from utilities.types import PathLike
+
+    from restic.repo import Repo
+    from restic.results import (
+        BackupResult,
+        CopyResult,
+        ForgetResult,
+        PruneResult,
+        RestoreResult,
+    )
+
+
+type MetricType = Literal["counter", "gauge"]
+type Operation = Literal["backup", "copy", "forget", "prune", "restore"]
+
+
+_OPENMETRICS = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+_PROMETHEUS = "text/plain; version=0.0.4; charset=utf-8"
+_STATE_VERSION = 1
+_LOCK = Lock()
+
+
+@dataclass(frozen=True, kw_only=True, slots=True)
+class Family:
+    name: str
+    type: MetricType
+    help: str
+
+
+FAMILIES: dict[str, Family] = {
+    f.name: f
+    for f in [
+        Family(
+            name="restic_operation_duration_seconds",
+            type="gauge",
+            help="Duration of each phase of the last successful operation",
+        ),
+        Family(
+            name="restic_operation_last_success_timestamp_seconds",
+            type="gauge",
+            help="Unix time of the last successful operation",
+        ),
+        Family(
+            name="restic_operation_runs",
+            type="counter",
+            help="Number of successful operations",
+        ),
+        Family(
+            name="restic_backup_bytes_processed",
+            type="gauge",
+            help="Bytes read by the last backup",
+        ),
+        Family(
+            name="restic_backup_bytes_added",
+            type="gauge",
+            help="Bytes added to the repository by the last backup, before compression",
+        ),
+        Family(
+            name="restic_backup_bytes_added_packed",
+            type="gauge",
+            help="Bytes added to the repository by the last backup, after compression",
+        ),
+        Family(
+            name="restic_backup_uploaded_bytes",
+            type="counter",
+            help="Bytes added to the repository by all backups, after compression",
+        ),
+        Family(
+            name="restic_backup_dedup_ratio",
+            type="gauge",
+            help="Fraction of the bytes read by the last backup that were already stored",
+        ),
+        Family(
+            name="restic_backup_files",
+            type="gauge",
+            help="Files seen by the last backup, by state",
+        ),
+        Family(
+            name="restic_backup_skipped",
+            type="gauge",
+            help="Whether the last backup was skipped because nothing changed",
+        ),
+        Family(
+            name="restic_copy_snapshots",
+            type="counter",
+            help="Snapshots copied into the repository",
+        ),
+        Family(
+            name="restic_forget_snapshots_kept",
+            type="gauge",
+            help="Snapshots kept by the last forget",
+        ),
+        Family(
+            name="restic_forget_snapshots_removed",
+            type="counter",
+            help="Snapshots removed by forget",
+        ),
+        Family(
+            name="restic_prune_bytes_reclaimed",
+            type="counter",
+            help="Bytes reclaimed by prune",
+        ),
+        Family(
+            name="restic_restore_bytes_restored",
+            type="gauge",
+            help="Bytes written by the last restore",
+        ),
+    ]
+}
+
+
+def get_state_path(path: PathLike, /) -> Path:
+    return Path(path).with_suffix(".json")
+
+
+def read_state(path: PathLike, /) -> dict[str, dict[str, Any]]:
+    state_path = get_state_path(path)
+    try:
+        data = json.loads(state_path.read_text())
+    except FileNotFoundError:
+        return {}
+    except json.JSONDecodeError:
+        LOGGER.warning("Ignoring corrupt metrics state '%s'", state_path)
+        return {}
+    return data.get("series", {}) if data.get("version") == _STATE_VERSION else {}
+
+
+def record_backup(
+    path: PathLike,
+    result: BackupResult,
+    /,
+    *,
+    repo: Repo,
+    paths: Sequence[PathLike],
+    now: float | None = None,
+) -> None:
+    labels = {"repo": repo.repository, "path": ",".join(map(str, paths))}
+    processed = result.total_bytes_processed
+    with _update(path, "backup", labels, result.timings, now=now) as series:
+        _set(series, "restic_backup_skipped", labels, float(result.skipped))
+        if result.skipped:
+            return
+        _set(series, "restic_backup_bytes_processed", labels, processed)
+        _set(series, "restic_backup_bytes_added", labels, result.data_added)
+        _set(
+            series, "restic_backup_bytes_added_packed", labels, result.data_added_packed
+        )
+        _inc(series, "restic_backup_uploaded_bytes", labels, result.data_added_packed)
+        _set(
+            series,
+            "restic_backup_dedup_ratio",
+            labels,
+            1 - result.data_added / processed if processed > 0 else 1.0,
+        )
+        for state, n in [
+            ("new", result.files_new),
+            ("changed", result.files_changed),
+            ("unmodified", result.files_unmodified),
+        ]:
+            _set(series, "restic_backup_files", {**labels, "state": state}, n)
+
+
+def record_copy(
+    path: PathLike,
+    result: CopyResult,
+    /,
+    *,
+    src: Repo,
+    dest: Repo,
+    now: float | None = None,
+) -> None:
+    labels = {"repo": dest.repository, "src": src.repository}
+    with _update(path, "copy", labels, result.timings, now=now) as series:
+        _inc(series, "restic_copy_snapshots", labels, len(result.snapshot_ids))
+
+
+def record_forget(
+    path: PathLike, result: ForgetResult, /, *, repo: Repo, now: float | None = None
+) -> None:
+    labels = {"repo": repo.repository}
+    with _update(path, "forget", labels, result.timings, now=now) as series:
+        _set(series, "restic_forget_snapshots_kept", labels, result.kept)
+        _inc(series, "restic_forget_snapshots_removed", labels, result.removed)
+
+
+def record_prune(
+    path: PathLike, result: PruneResult, /, *, repo: Repo, now: float | None = None
+) -> None:
+    labels = {"repo": repo.repository}
+    with _update(path, "prune", labels, result.timings, now=now) as series:
+        if result.pruned:
+            _inc(series, "restic_prune_bytes_reclaimed", labels, result.reclaimable)
+
+
+def record_restore(
+    path: PathLike,
+    result: RestoreResult,
+    /,
+    *,
+    repo: Repo,
+    target: PathLike,
+    now: float | None = None,
+) -> None:
+    labels = {"repo": repo.repository, "target": str(target)}
+    with _update(path, "restore", labels, result.timings, now=now) as series:
+        _set(series, "restic_restore_bytes_restored", labels, result.bytes_restored)
+
+
+def render(
+    series: Mapping[str, Mapping[str, Any]], /, *, openmetrics: bool = False
+) -> str:
+    by_family: dict[str, list[Mapping[str, Any]]] = {}
+    for sample in series.values():
+        by_family.setdefault(sample["name"], []).append(sample)
+    lines: list[str] = []
+    for name, family in FAMILIES.items():
+        if (samples := by_family.get(name)) is None:
+            continue
+        suffix = "_total" if family.type == "counter" else ""
+        type_name = name if openmetrics else f"{name}{suffix}"
+        lines.extend([
+            f"# TYPE {type_name} {family.type}",
+            f"# HELP {type_name} {family.help}",
+        ])
+        for sample in sorted(samples, key=lambda s: sorted(s["labels"].items())):
+            labels = ",".join(
+                f'{k}="{_escape(v)}"' for k, v in sorted(sample["labels"].items())
+            )
+            lines.append(f"{name}{suffix}{{{labels}}} {_format(sample['value'])}")
+    if openmetrics:
+        lines.append("# EOF")
+    return "".join(f"{line}\n" for line in lines)
+
+
+@resolve_settings
+def serve_metrics(
+    path: PathLike, /, *, port: int, addr: str = SETTINGS.metrics_addr
+) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((addr, port), _make_handler(Path(path)))
+    Thread(target=server.serve_forever, daemon=True).start()
+    LOGGER.info("Serving metrics on http://%s:%d/metrics", addr, server.server_port)
+    return server
+
+
+def _escape(value: str, /) -> str:
+    return value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _format(value: float, /) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _inc(
+    series: dict[str, dict[str, Any]],
+    name: str,
+    labels: Mapping[str, str],
+    value: float = 1,
+    /,
+) -> None:
+    key = _key(name, labels)
+    current = series.get(key, {}).get("value", 0)
+    series[key] = {"name": name, "labels": dict(labels), "value": current + value}
+
+
+def _is_phase(sample: Mapping[str, Any], labels: Mapping[str, str], /) -> bool:
+    return (sample["name"] == "restic_operation_duration_seconds") and (
+        {k: v for k, v in sample["labels"].items() if k != "phase"} == labels
+    )
+
+
+def _key(name: str, labels: Mapping[str, str], /) -> str:
+    return json.dumps([name, sorted(labels.items())])
+
+
+def _make_handler(path: Path, /) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.split("?", 1)[0] not in {"/", "/metrics"}:
+                self.send_error(404)
+                return
+            openmetrics = "application/openmetrics-text" in self.headers.get(
+                "Accept", ""
+            )
+            body = render(read_state(path), openmetrics=openmetrics).encode()
+            self.send_response(200)
+            self.send_header(
+                "Content-Type", _OPENMETRICS if openmetrics else _PROMETHEUS
+            )
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            _ = self.wfile.write(body)
+
+        @override
+        def log_message(self, format: str, *args: Any) -> None:
+            LOGGER.debug(format, *args)
+
+    return Handler
+
+
+def _set(
+    series: dict[str, dict[str, Any]],
+    name: str,
+    labels: Mapping[str, str],
+    value: float,
+    /,
+) -> None:
+    series[_key(name, labels)] = {"name": name, "labels": dict(labels), "value": value}
+
+
+@contextmanager
+def _update(
+    path: PathLike,
+    operation: Operation,
+    labels: Mapping[str, str],
+    timings: Mapping[str, float],
+    /,
+    *,
+    now: float | None = None,
+) -> Iterator[dict[str, dict[str, Any]]]:
+    labels = {**labels, "operation": operation}
+    with _LOCK, _lock_file(Path(path).with_suffix(".lock")):
+        series = read_state(path)
+        for key in [k for k, v in series.items() if _is_phase(v, labels)]:
+            del series[key]
+        for phase, seconds in timings.items():
+            _set(
+                series,
+                "restic_operation_duration_seconds",
+                {**labels, "phase": phase},
+                seconds,
+            )
+        yield series
+        _set(
+            series,
+            "restic_operation_last_success_timestamp_seconds",
+            labels,
+            time.time() if now is None else now,
+        )
+        _inc(series, "restic_operation_runs", labels)
+        _write(Path(path), series)
+
+
+@contextmanager
+def _lock_file(path: Path, /) -> Iterator[None]:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _write(path: Path, series: Mapping[str, Any], /) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    for target, text in [
+        (
+            get_state_path(path),
+            json.dumps({"version": _STATE_VERSION, "series": series}),
+        ),
+        (path, render(series)),
+    ]:
+        temp = target.with_name(f"{target.name}.tmp")
+        _ = temp.write_text(text)
+        _ = temp.replace(target)
+
+
+__all__ = [
+    "FAMILIES",
+    "Family",
+    "MetricType",
+    "Operation",
+    "get_state_path",
+    "read_state",
+    "record_backup",
+    "record_copy",
+    "record_forget",
+    "record_prune",
+    "record_restore",
+    "render",
+    "serve_metrics",
+]
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from grp import getgrnam
+from pathlib import Path
+from pwd import getpwnam
+from stat import S_IMODE, S_ISDIR, S_ISLNK, S_ISREG
+from typing import TYPE_CHECKING, Self
+
+from restic.logging import LOGGER
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+
+    from utilities.types import PathLike
+
+
+DIR_MODE = 0o755
+FILE_MODE = 0o644
+_SPECIAL_DIR_BITS = 0o6000
+_MANIFEST_VERSION = 1
+
+
+@dataclass(kw_only=True, slots=True)
+class NormalizeResult:
+    examined: int = 0
+    changed: int = 0
+    skipped: int = 0
+
+    def __iadd__(self, other: NormalizeResult, /) -> Self:
+        self.examined += other.examined
+        self.changed += other.changed
+        self.skipped += other.skipped
+        return self
+
+
+def normalize_permissions(
+    path: PathLike,
+    /,
+    *,
+    dir_mode: int | None = DIR_MODE,
+    file_mode: int | None = FILE_MODE,
+    owner: str | None = None,
+    manifest: PathLike | None = None,
+    max_workers: int | None = None,
+) -> NormalizeResult:
+    root = Path(path).absolute()
+    uid, gid = (None, None) if owner is None else _get_ids(owner)
+    normalizer = _Normalizer(dir_mode=dir_mode, file_mode=file_mode, uid=uid, gid=gid)
+    key = f"{dir_mode}:{file_mode}:{uid}:{gid}"
+    previous = {} if manifest is None else _read_manifest(manifest, key=key)
+    current: dict[str, int] = {}
+    result = NormalizeResult()
+    st = root.stat(follow_symlinks=False)
+    result += normalizer.fix(root, st)
+    if not S_ISDIR(st.st_mode):
+        return result
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending: set[Future[tuple[NormalizeResult, str, int, list[str]]]] = {
+            pool.submit(normalizer.visit, str(root), previous)
+        }
+        while len(pending) >= 1:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result_i, dir_, ctime, subdirs = future.result()
+                result += result_i
+                current[dir_] = ctime
+                pending.update(
+                    pool.submit(normalizer.visit, s, previous) for s in subdirs
+                )
+    if manifest is not None:
+        _write_manifest(manifest, root, current, key=key)
+    return result
+
+
+@dataclass(kw_only=True, slots=True)
+class _Normalizer:
+    dir_mode: int | None = None
+    file_mode: int | None = None
+    uid: int | None = None
+    gid: int | None = None
+
+    def fix(self, path: PathLike, st: os.stat_result, /) -> NormalizeResult:
+        changed = False
+        mode = st.st_mode
+        if S_ISDIR(mode) and (self.dir_mode is not None):
+            target = (S_IMODE(mode) & _SPECIAL_DIR_BITS) | self.dir_mode
+            if S_IMODE(mode) != target:
+                Path(path).chmod(target)
+                changed = True
+        elif S_ISREG(mode) and (self.file_mode is not None):
+            if S_IMODE(mode) != self.file_mode:
+                Path(path).chmod(self.file_mode)
+                changed = True
+        if (
+            (self.uid is not None)
+            and (self.gid is not None)
+            and ((st.st_uid != self.uid) or (st.st_gid != self.gid))
+        ):
+            os.chown(path, self.uid, self.gid, follow_symlinks=not S_ISLNK(st.st_mode))
+            changed = True
+        return NormalizeResult(examined=1, changed=int(changed))
+
+    def visit(
+        self, dir_: str, previous: dict[str, int], /
+    ) -> tuple[NormalizeResult, str, int, list[str]]:
+        ctime = Path(dir_).stat(follow_symlinks=False).st_ctime_ns
+        unchanged = previous.get(dir_) == ctime
+        result = NormalizeResult()
+        subdirs: list[str] = []
+        with os.scandir(dir_) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    result += self.fix(entry.path, entry.stat(follow_symlinks=False))
+                    subdirs.append(entry.path)
+                elif unchanged:
+                    result.skipped += 1
+                else:
+                    result += self.fix(entry.path, entry.stat(follow_symlinks=False))
+        return result, dir_, ctime, subdirs
+
+
+def _get_ids(owner: str, /) -> tuple[int, int]:
+    return getpwnam(owner).pw_uid, getgrnam(owner).gr_gid
+
+
+def _read_manifest(path: PathLike, /, *, key: str) -> dict[str, int]:
+    try:
+        data = json.loads(Path(path).read_text())
+    except FileNotFoundError:
+        return {}
+    except json.JSONDecodeError:
+        LOGGER.warning("Ignoring corrupt permissions manifest '%s'", path)
+        return {}
+    if (data.get("version") != _MANIFEST_VERSION) or (data.get("key") != key):
+        return {}
+    return data["dirs"]
+
+
+def _write_manifest(
+    path: PathLike, root: Path, dirs: dict[str, int], /, *, key: str
+) -> None:
+    path = Path(path)
+    existing = _read_manifest(path, key=key)
+    prefix = f"{root}{os.sep}"
+    kept = {
+        k: v
+        for k, v in existing.items()
+        if (k != str(root)) and not k.startswith(prefix)
+    }
+    data = {"version": _MANIFEST_VERSION, "key": key, "dirs": kept | dirs}
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp = path.with_name(f"{path.name}.tmp")
+    _ = temp.write_text(json.dumps(data))
+    _ = temp.replace(path)
+
+
+__all__ = ["DIR_MODE", "FILE_MODE", "NormalizeResult", "normalize_permissions"]
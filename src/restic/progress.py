@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import json
+import os
+import sys
+from contextlib import suppress
+from dataclasses import dataclass
+from subprocess import PIPE, CalledProcessError, Popen, TimeoutExpired
+from threading import Thread
+from typing import TYPE_CHECKING, Any, Literal, assert_never, cast
+
+from restic.logging import LOGGER
+from restic.tracing import trace_subprocess
+from restic.utilities import format_size
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Iterator, Mapping
+    from typing import IO
+
+
+type Message = dict[str, Any] | list[Any] | str
+type ProgressCallback = Callable[[Progress], None]
+
+
+@dataclass(kw_only=True, slots=True)
+class Progress:
+    message_type: Literal["status", "summary"]
+    seconds_elapsed: float = 0.0
+    seconds_remaining: float | None = None
+    percent_done: float = 0.0
+    files_done: int = 0
+    total_files: int = 0
+    bytes_done: int = 0
+    total_bytes: int = 0
+
+    @property
+    def bytes_per_second(self) -> float:
+        return _per_second(self.bytes_done, self.seconds_elapsed)
+
+    @property
+    def files_per_second(self) -> float:
+        return _per_second(self.files_done, self.seconds_elapsed)
+
+
+def combine_progress(progresses: Iterable[Progress], /) -> Progress:
+    progresses = list(progresses)
+    remaining = [p.seconds_remaining for p in progresses]
+    return Progress(
+        message_type="summary"
+        if all(p.message_type == "summary" for p in progresses)
+        else "status",
+        seconds_elapsed=max((p.seconds_elapsed for p in progresses), default=0.0),
+        seconds_remaining=None
+        if any(r is None for r in remaining)
+        else max(remaining, default=0.0),
+        percent_done=_ratio(
+            sum(p.bytes_done for p in progresses),
+            sum(p.total_bytes for p in progresses),
+        ),
+        files_done=sum(p.files_done for p in progresses),
+        total_files=sum(p.total_files for p in progresses),
+        bytes_done=sum(p.bytes_done for p in progresses),
+        total_bytes=sum(p.total_bytes for p in progresses),
+    )
+
+
+def decode_message(line: str, /) -> Message:
+    try:
+        value = json.loads(line)
+    except json.JSONDecodeError:
+        return line
+    return value if isinstance(value, dict | list) else line
+
+
+def log_progress(progress: Progress, /, *, label: str | None = None) -> None:
+    from whenever import TimeDelta
+
+    eta = (
+        "unknown"
+        if progress.seconds_remaining is None
+        else TimeDelta(seconds=round(progress.seconds_remaining))
+    )
+    LOGGER.info(
+        "%s%s: %.1f%% done; %d/%d files, %s/%s; %.1f files/s, %s/s; ETA %s",
+        "" if label is None else f"[{label}] ",
+        progress.message_type.capitalize(),
+        100 * progress.percent_done,
+        progress.files_done,
+        progress.total_files,
+        format_size(progress.bytes_done),
+        format_size(progress.total_bytes),
+        progress.files_per_second,
+        format_size(round(progress.bytes_per_second)),
+        eta,
+    )
+
+
+def parse_progress(message: Message, /) -> Progress | None:
+    match message:
+        case {"message_type": "status"}:
+            return Progress(
+                message_type="status",
+                seconds_elapsed=message.get("seconds_elapsed", 0),
+                seconds_remaining=message.get("seconds_remaining"),
+                percent_done=message.get("percent_done", 0.0),
+                files_done=message.get("files_done", message.get("files_restored", 0)),
+                total_files=message.get("total_files", 0),
+                bytes_done=message.get("bytes_done", message.get("bytes_restored", 0)),
+                total_bytes=message.get("total_bytes", 0),
+            )
+        case {"message_type": "summary"}:
+            files = message.get(
+                "total_files_processed", message.get("files_restored", 0)
+            )
+            bytes_ = message.get(
+                "total_bytes_processed", message.get("bytes_restored", 0)
+            )
+            return Progress(
+                message_type="summary",
+                seconds_elapsed=message.get(
+                    "total_duration", message.get("seconds_elapsed", 0)
+                ),
+                seconds_remaining=0,
+                percent_done=1.0,
+                files_done=files,
+                total_files=message.get("total_files", files),
+                bytes_done=bytes_,
+                total_bytes=message.get("total_bytes", bytes_),
+            )
+        case dict() | list() | str():
+            return None
+        case never:
+            assert_never(never)
+
+
+def stream_json(
+    cmd: str, /, *args: str, env: Mapping[str, str] | None = None
+) -> Iterator[Message]:
+    env_use = None if env is None else {**os.environ, **env}
+    with (
+        trace_subprocess([cmd, *args]),
+        Popen(
+            [cmd, *args], stdout=PIPE, stderr=PIPE, text=True, bufsize=1, env=env_use
+        ) as process,
+    ):
+        stderr: list[str] = []
+        thread = Thread(target=_drain, args=(process.stderr, stderr), daemon=True)
+        thread.start()
+        try:
+            for line in cast("IO[str]", process.stdout):
+                if (stripped := line.strip()) != "":
+                    yield decode_message(stripped)
+            return_code = process.wait()
+        except BaseException:
+            _terminate(process)
+            raise
+        finally:
+            thread.join()
+        if return_code != 0:
+            raise CalledProcessError(
+                return_code, [cmd, *args], output=None, stderr="".join(stderr)
+            )
+
+
+def _drain(stream: IO[str] | None, lines: list[str], /) -> None:
+    if stream is None:
+        return
+    for line in stream:
+        lines.append(line)
+        _ = sys.stderr.write(line)
+
+
+def _per_second(n: float, seconds: float, /) -> float:
+    return n / seconds if seconds > 0 else 0.0
+
+
+def _ratio(n: int, total: int, /) -> float:
+    return n / total if total > 0 else 0.0
+
+
+def _terminate(process: Popen[str], /) -> None:
+    process.terminate()
+    try:
+        _ = process.wait(timeout=10)
+    except TimeoutExpired:
+        with suppress(ProcessLookupError):
+            process.kill()
+
+
+__all__ = [
+    "Message",
+    "Progress",
+    "ProgressCallback",
+    "combine_progress",
+    "decode_message",
+    "log_progress",
+    "parse_progress",
+    "stream_json",
+]
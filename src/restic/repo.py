@@ -1,12 +1,12 @@
 from __future__ import annotations
 
 from contextlib import contextmanager, suppress
-from dataclasses import dataclass
+from dataclasses import dataclass, field, fields, replace
 from pathlib import Path
-from re import search
-from typing import TYPE_CHECKING, Self, assert_never, override
+from re import fullmatch, search
+from typing import TYPE_CHECKING, Literal, Self, assert_never, override
 
-from typed_settings import Secret, load_settings
+from typed_settings import Secret
 from utilities.os import temp_environ
 from utilities.re import (
     ExtractGroupError,
@@ -15,15 +15,57 @@ from utilities.re import (
     extract_groups,
 )
 
-from restic.settings import LOADERS, SETTINGS, Settings
+from restic.settings import SETTINGS, get_settings, resolve_settings
+from restic.utilities import expand_limit
 
 if TYPE_CHECKING:
     from collections.abc import Iterator
 
+    from utilities.types import PathLike
+
     from restic.types import SecretLike
 
 
 type Repo = Backblaze | Local | SFTP
+type Backend = Literal["b2", "local", "sftp"]
+
+
+@dataclass(frozen=True, kw_only=True, slots=True)
+class RepoOptions:
+    connections: int | None = None
+    pack_size: int | None = None
+    limit_download: int | None = None
+    limit_upload: int | None = None
+
+    @classmethod
+    def parse(cls, query: str, /) -> Self:
+        names = {f.name for f in fields(cls)}
+        values: dict[str, int] = {}
+        for pair in query.split("&"):
+            key, _, value = pair.partition("=")
+            key = key.replace("-", "_")
+            if key not in names:
+                msg = f"Invalid repository option {key!r}; expected one of {sorted(names)}"
+                raise RepoOptionsError(msg)
+            try:
+                values[key] = int(value)
+            except ValueError:
+                msg = f"Repository option {key!r} must be an integer; got {value!r}"
+                raise RepoOptionsError(msg) from None
+        return cls(**values)
+
+    def merge(self, other: RepoOptions, /) -> RepoOptions:
+        return replace(
+            self,
+            **{
+                f.name: value
+                for f in fields(other)
+                if (value := getattr(other, f.name)) is not None
+            },
+        )
+
+
+class RepoOptionsError(Exception): ...
 
 
 @dataclass(order=True, slots=True)
@@ -32,6 +74,9 @@ class Backblaze:
     application_key: Secret[str]
     bucket: str
     path: Path
+    options: RepoOptions = field(
+        default_factory=RepoOptions, compare=False, kw_only=True
+    )
 
     @override
     def __eq__(self, other: object, /) -> bool:
@@ -61,10 +106,10 @@ class Backblaze:
         text: str,
         /,
         *,
-        key_id: SecretLike | None = SETTINGS.backblaze_key_id,
-        application_key: SecretLike | None = SETTINGS.backblaze_application_key,
+        key_id: SecretLike | None = None,
+        application_key: SecretLike | None = None,
     ) -> Self:
-        settings = load_settings(Settings, LOADERS)
+        settings = get_settings()
         match key_id, settings.backblaze_key_id:
             case Secret() as key_id_use, _:
                 ...
@@ -89,8 +134,9 @@ class Backblaze:
                 raise ValueError(msg)
             case never:
                 assert_never(never)
+        text, options = _split_options(text)
         bucket, path = extract_groups(r"^b2:([^@:]+):([^@+]+)$", text)
-        return cls(key_id_use, application_key_use, bucket, Path(path))
+        return cls(key_id_use, application_key_use, bucket, Path(path), options=options)
 
     @property
     def repository(self) -> str:
@@ -100,11 +146,15 @@ class Backblaze:
 @dataclass(order=True, unsafe_hash=True, slots=True)
 class Local:
     path: Path
+    options: RepoOptions = field(
+        default_factory=RepoOptions, compare=False, kw_only=True
+    )
 
     @classmethod
     def parse(cls, text: str, /) -> Self:
+        text, options = _split_options(text)
         path = extract_group(r"^local:([^@:]+)$", text)
-        return cls(Path(path))
+        return cls(Path(path), options=options)
 
     @property
     def repository(self) -> str:
@@ -116,13 +166,17 @@ class SFTP:
     user: str
     hostname: str
     path: Path
+    options: RepoOptions = field(
+        default_factory=RepoOptions, compare=False, kw_only=True
+    )
 
     @classmethod
     def parse(cls, text: str, /) -> Self:
+        text, options = _split_options(text)
         user, hostname, path = extract_groups(
             r"^sftp:([^@:]+)@([^@:]+):([^@:]+)$", text
         )
-        return cls(user, hostname, Path(path))
+        return cls(user, hostname, Path(path), options=options)
 
     @property
     def repository(self) -> str:
@@ -141,37 +195,141 @@ def parse_repo(text: str, /) -> Repo:
     try:
         return Local.parse(text)
     except ExtractGroupError:
-        return Local(Path(text))
+        text, options = _split_options(text)
+        return Local(Path(text), options=options)
 
 
 class BackblazeMissingCredentialsError(Exception): ...
 
 
-@contextmanager
-def yield_repo_env(
-    repo: Repo, /, *, env_var: str = "RESTIC_REPOSITORY"
-) -> Iterator[None]:
+def expand_repo_options(
+    repo: Repo,
+    /,
+    *,
+    src: Repo | None = None,
+    connections: int | None = None,
+    limit_download: int | None = None,
+    limit_upload: int | None = None,
+) -> list[str]:
+    overrides = RepoOptions(
+        connections=connections,
+        limit_download=limit_download,
+        limit_upload=limit_upload,
+    )
+    options = get_repo_options(repo).merge(overrides)
+    by_backend: dict[Backend, int | None] = {}
+    limit_download_use = options.limit_download
+    if src is not None:
+        src_options = get_repo_options(src).merge(overrides)
+        by_backend[get_backend_name(src)] = src_options.connections
+        limit_download_use = src_options.limit_download
+    by_backend[get_backend_name(repo)] = options.connections
+    return [
+        *(
+            arg
+            for backend, n in by_backend.items()
+            if n is not None
+            for arg in ["--option", f"{backend}.connections={n}"]
+        ),
+        *([] if options.pack_size is None else ["--pack-size", str(options.pack_size)]),
+        *expand_limit("download", value=limit_download_use),
+        *expand_limit("upload", value=options.limit_upload),
+    ]
+
+
+def get_backend_name(repo: Repo, /) -> Backend:
+    match repo:
+        case Backblaze():
+            return "b2"
+        case Local():
+            return "local"
+        case SFTP():
+            return "sftp"
+        case never:
+            assert_never(never)
+
+
+def get_repo_options(repo: Repo, /) -> RepoOptions:
+    settings = get_settings()
+    match repo:
+        case Backblaze():
+            defaults = RepoOptions(
+                connections=settings.backblaze_connections,
+                pack_size=settings.backblaze_pack_size,
+            )
+        case Local():
+            defaults = RepoOptions(
+                connections=settings.local_connections,
+                pack_size=settings.local_pack_size,
+            )
+        case SFTP():
+            defaults = RepoOptions(
+                connections=settings.sftp_connections, pack_size=settings.sftp_pack_size
+            )
+        case never:
+            assert_never(never)
+    return defaults.merge(repo.options)
+
+
+@resolve_settings
+def get_repo_env(
+    repo: Repo,
+    /,
+    *,
+    env_var: str = "RESTIC_REPOSITORY",
+    restic_cache_dir: PathLike | None = SETTINGS.restic_cache_dir,
+) -> dict[str, str]:
+    cache = (
+        {} if restic_cache_dir is None else {"RESTIC_CACHE_DIR": str(restic_cache_dir)}
+    )
     match repo:
         case Backblaze():
-            with temp_environ(
-                {env_var: repo.repository},
-                B2_ACCOUNT_ID=repo.key_id.get_secret_value(),
-                B2_ACCOUNT_KEY=repo.application_key.get_secret_value(),
-            ):
-                yield
+            return {
+                env_var: repo.repository,
+                "B2_ACCOUNT_ID": repo.key_id.get_secret_value(),
+                "B2_ACCOUNT_KEY": repo.application_key.get_secret_value(),
+                **cache,
+            }
         case Local() | SFTP():
-            with temp_environ({env_var: repo.repository}):
-                yield
+            return {env_var: repo.repository, **cache}
         case never:
             assert_never(never)
 
 
+def _split_options(text: str, /) -> tuple[str, RepoOptions]:
+    if (match := fullmatch(r"(.+)\?(\w[\w-]*=\w*(?:&\w[\w-]*=\w*)*)", text)) is None:
+        return text, RepoOptions()
+    return match.group(1), RepoOptions.parse(match.group(2))
+
+
+@contextmanager
+@resolve_settings
+def yield_repo_env(
+    repo: Repo,
+    /,
+    *,
+    env_var: str = "RESTIC_REPOSITORY",
+    restic_cache_dir: PathLike | None = SETTINGS.restic_cache_dir,
+) -> Iterator[None]:
+    with temp_environ(
+        get_repo_env(repo, env_var=env_var, restic_cache_dir=restic_cache_dir)
+    ):
+        yield
+
+
 __all__ = [
     "SFTP",
     "Backblaze",
     "BackblazeMissingCredentialsError",
+    "Backend",
     "Local",
     "Repo",
+    "RepoOptions",
+    "RepoOptionsError",
+    "expand_repo_options",
+    "get_backend_name",
+    "get_repo_env",
+    "get_repo_options",
     "parse_repo",
     "yield_repo_env",
 ]
@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from re import MULTILINE, findall, search
+from typing import TYPE_CHECKING, Any
+
+from restic.tracing import span
+from restic.utilities import parse_size
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    from restic.progress import Message
+
+
+@dataclass(kw_only=True, slots=True)
+class ForgetResult:
+    kept: int = 0
+    removed_ids: list[str] = field(default_factory=list)
+    timings: dict[str, float] = field(default_factory=dict)
+
+    @property
+    def removed(self) -> int:
+        return len(self.removed_ids)
+
+    def add_messages(self, messages: list[Message], /) -> None:
+        for message in messages:
+            if isinstance(message, list):
+                for group in message:
+                    self.kept += len(group.get("keep") or [])
+                    self.removed_ids.extend(s["id"] for s in group.get("remove") or [])
+
+
+@dataclass(kw_only=True, slots=True)
+class BackupResult:
+    snapshot_ids: list[str] = field(default_factory=list)
+    files_new: int = 0
+    files_changed: int = 0
+    files_unmodified: int = 0
+    dirs_new: int = 0
+    dirs_changed: int = 0
+    dirs_unmodified: int = 0
+    data_added: int = 0
+    data_added_packed: int = 0
+    total_files_processed: int = 0
+    total_bytes_processed: int = 0
+    skipped: bool = False
+    forget: ForgetResult | None = None
+    timings: dict[str, float] = field(default_factory=dict)
+
+    def add_messages(self, messages: list[Message], /) -> None:
+        for summary in _summaries(messages):
+            if (snapshot_id := summary.get("snapshot_id")) is not None:
+                self.snapshot_ids.append(snapshot_id)
+            self.files_new += summary.get("files_new", 0)
+            self.files_changed += summary.get("files_changed", 0)
+            self.files_unmodified += summary.get("files_unmodified", 0)
+            self.dirs_new += summary.get("dirs_new", 0)
+            self.dirs_changed += summary.get("dirs_changed", 0)
+            self.dirs_unmodified += summary.get("dirs_unmodified", 0)
+            self.data_added += summary.get("data_added", 0)
+            self.data_added_packed += summary.get("data_added_packed", 0)
+            self.total_files_processed += summary.get("total_files_processed", 0)
+            self.total_bytes_processed += summary.get("total_bytes_processed", 0)
+
+
+@dataclass(kw_only=True, slots=True)
+class CopyResult:
+    snapshot_ids: list[str] = field(default_factory=list)
+    error: str | None = None
+    timings: dict[str, float] = field(default_factory=dict)
+
+    def add_messages(self, messages: list[Message], /) -> None:
+        for message in messages:
+            if isinstance(message, str):
+                self.snapshot_ids.extend(
+                    findall(r"^snapshot ([0-9a-f]+) saved$", message, flags=MULTILINE)
+                )
+
+
+@dataclass(kw_only=True, slots=True)
+class PruneResult:
+    to_repack: int = 0
+    removes: int = 0
+    to_delete: int = 0
+    reclaimable: int = 0
+    remaining: int = 0
+    unused_after: int = 0
+    packs_to_repack: int = 0
+    packs_to_delete: int = 0
+    pruned: bool = False
+    timings: dict[str, float] = field(default_factory=dict)
+
+    @property
+    def unused(self) -> int:
+        return self.reclaimable + self.unused_after
+
+    @property
+    def unused_pct(self) -> float:
+        total = self.reclaimable + self.remaining
+        return 100 * self.unused / total if total > 0 else 0.0
+
+    def add_messages(self, messages: list[Message], /) -> None:
+        text = "\n".join(m for m in messages if isinstance(m, str))
+        self.to_repack += _search_size(r"^to repack:\s+\d+ blobs / (.+)$", text)
+        self.removes += _search_size(r"^this removes:\s+\d+ blobs / (.+)$", text)
+        self.to_delete += _search_size(r"^to delete:\s+\d+ blobs / (.+)$", text)
+        self.reclaimable += _search_size(r"^total prune:\s+\d+ blobs / (.+)$", text)
+        self.remaining += _search_size(r"^remaining:\s+\d+ blobs / (.+)$", text)
+        self.unused_after += _search_size(r"^unused size after prune: (.+?) \(", text)
+        self.packs_to_repack += _search_int(r"^to repack:\s+(\d+) packs$", text)
+        self.packs_to_delete += _search_int(r"^to delete:\s+(\d+) packs$", text)
+
+    def exceeds(
+        self, *, min_reclaim: int | None = None, min_unused_pct: float | None = None
+    ) -> bool:
+        if (self.reclaimable == 0) and (self.packs_to_repack == 0):
+            return False
+        if (min_reclaim is None) and (min_unused_pct is None):
+            return True
+        return ((min_reclaim is not None) and (self.reclaimable >= min_reclaim)) or (
+            (min_unused_pct is not None) and (self.unused_pct >= min_unused_pct)
+        )
+
+
+@dataclass(kw_only=True, slots=True)
+class RestoreResult:
+    total_files: int = 0
+    files_restored: int = 0
+    files_skipped: int = 0
+    total_bytes: int = 0
+    bytes_restored: int = 0
+    bytes_skipped: int = 0
+    files_verified: int = 0
+    verify_failures: list[str] = field(default_factory=list)
+    timings: dict[str, float] = field(default_factory=dict)
+
+    def add_messages(self, messages: list[Message], /) -> None:
+        for summary in _summaries(messages):
+            self.total_files += summary.get("total_files", 0)
+            self.files_restored += summary.get("files_restored", 0)
+            self.files_skipped += summary.get("files_skipped", 0)
+            self.total_bytes += summary.get("total_bytes", 0)
+            self.bytes_restored += summary.get("bytes_restored", 0)
+            self.bytes_skipped += summary.get("bytes_skipped", 0)
+
+
+@contextmanager
+def time_phase(
+    timings: dict[str, float], phase: str, /, **attrs: Any
+) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        with span(phase, **attrs):
+            yield
+    finally:
+        timings[phase] = timings.get(phase, 0.0) + (time.perf_counter() - start)
+
+
+def _search_int(pattern: str, text: str, /) -> int:
+    match = search(pattern, text, flags=MULTILINE)
+    return 0 if match is None else int(match.group(1))
+
+
+def _search_size(pattern: str, text: str, /) -> int:
+    match = search(pattern, text, flags=MULTILINE)
+    return 0 if match is None else parse_size(match.group(1))
+
+
+def _summaries(messages: list[Message], /) -> Iterator[dict[str, Any]]:
+    for message in messages:
+        if isinstance(message, dict) and (message.get("message_type") == "summary"):
+            yield message
+
+
+__all__ = [
+    "BackupResult",
+    "CopyResult",
+    "ForgetResult",
+    "PruneResult",
+    "RestoreResult",
+    "time_phase",
+]
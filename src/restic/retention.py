@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import datetime as dt
+from collections import defaultdict
+from dataclasses import dataclass, field
+from re import findall, fullmatch
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable
+
+    from restic.index import Snapshot
+
+
+type _Bucker = Callable[[dt.datetime, int], int]
+
+
+@dataclass(kw_only=True, slots=True)
+class RetentionPlan:
+    keep: list[Snapshot] = field(default_factory=list)
+    remove: list[Snapshot] = field(default_factory=list)
+    reasons: dict[str, list[str]] = field(default_factory=dict)
+
+
+def plan_retention(
+    snapshots: Iterable[Snapshot],
+    /,
+    *,
+    keep_last: int | None = None,
+    keep_hourly: int | None = None,
+    keep_daily: int | None = None,
+    keep_weekly: int | None = None,
+    keep_monthly: int | None = None,
+    keep_yearly: int | None = None,
+    keep_within: str | None = None,
+    keep_within_hourly: str | None = None,
+    keep_within_daily: str | None = None,
+    keep_within_weekly: str | None = None,
+    keep_within_monthly: str | None = None,
+    keep_within_yearly: str | None = None,
+    tag: list[str] | None = None,
+) -> RetentionPlan:
+    buckets: list[tuple[int, _Bucker, str]] = [
+        (n, bucker, reason)
+        for n, bucker, reason in [
+            (keep_last, _last, "last snapshot"),
+            (keep_hourly, _hourly, "hourly snapshot"),
+            (keep_daily, _daily, "daily snapshot"),
+            (keep_weekly, _weekly, "weekly snapshot"),
+            (keep_monthly, _monthly, "monthly snapshot"),
+            (keep_yearly, _yearly, "yearly snapshot"),
+        ]
+        if (n is not None) and (n != 0)
+    ]
+    within = None if keep_within is None else _parse_duration(keep_within)
+    buckets_within: list[tuple[tuple[int, int, int, int], _Bucker, str]] = [
+        (_parse_duration(duration), bucker, f"{reason} within {duration}")
+        for duration, bucker, reason in [
+            (keep_within_hourly, _hourly, "hourly"),
+            (keep_within_daily, _daily, "daily"),
+            (keep_within_weekly, _weekly, "weekly"),
+            (keep_within_monthly, _monthly, "monthly"),
+            (keep_within_yearly, _yearly, "yearly"),
+        ]
+        if duration is not None
+    ]
+    plan = RetentionPlan()
+    selected = [s for s in snapshots if _has_tags(s, tag)]
+    if (len(buckets) == 0) and (within is None) and (len(buckets_within) == 0):
+        plan.keep.extend(sorted(selected, reverse=True))
+        plan.reasons.update((s.id, ["policy is empty"]) for s in selected)
+        return plan
+    groups: defaultdict[tuple[str, tuple[str, ...]], list[Snapshot]] = defaultdict(list)
+    for snapshot in selected:
+        groups[snapshot.hostname, tuple(sorted(snapshot.paths))].append(snapshot)
+    for group in groups.values():
+        ordered = sorted(group, reverse=True)
+        latest = ordered[0].time
+        counts = [n for n, _, _ in buckets]
+        lasts = [-1] * len(buckets)
+        lasts_within = [-1] * len(buckets_within)
+        for nr, snapshot in enumerate(ordered):
+            oldest = nr == len(ordered) - 1
+            reasons: list[str] = []
+            if (within is not None) and (snapshot.time > _sub(latest, within)):
+                reasons.append(f"within {keep_within}")
+            for i, (_, bucker, reason) in enumerate(buckets):
+                if counts[i] != 0:
+                    value = bucker(snapshot.time, nr)
+                    if (value != lasts[i]) or oldest:
+                        lasts[i] = value
+                        counts[i] = counts[i] - 1 if counts[i] > 0 else counts[i]
+                        reasons.append(reason)
+            for i, (duration, bucker, reason) in enumerate(buckets_within):
+                if snapshot.time > _sub(latest, duration):
+                    value = bucker(snapshot.time, nr)
+                    if (value != lasts_within[i]) or oldest:
+                        lasts_within[i] = value
+                        reasons.append(reason)
+            if len(reasons) >= 1:
+                plan.keep.append(snapshot)
+                plan.reasons[snapshot.id] = reasons
+            else:
+                plan.remove.append(snapshot)
+    return plan
+
+
+def _has_tags(snapshot: Snapshot, tag: list[str] | None, /) -> bool:
+    if tag is None:
+        return True
+    return any(
+        all(t in snapshot.tags for t in group.split(",") if t != "") for group in tag
+    )
+
+
+def _parse_duration(text: str, /) -> tuple[int, int, int, int]:
+    if fullmatch(r"(\d+[ymdh])+", text) is None:
+        msg = f"Invalid duration {text!r}; expected e.g. '1y2m3d4h'"
+        raise ValueError(msg)
+    parts = dict.fromkeys("ymdh", 0)
+    for value, unit in findall(r"(\d+)([ymdh])", text):
+        parts[unit] += int(value)
+    return parts["y"], parts["m"], parts["d"], parts["h"]
+
+
+def _sub(time: dt.datetime, duration: tuple[int, int, int, int], /) -> dt.datetime:
+    years, months, days, hours = duration
+    month_index = time.year * 12 + (time.month - 1) - (years * 12 + months)
+    year, month = divmod(month_index, 12)
+    first = time.replace(year=year, month=month + 1, day=1)
+    return first + dt.timedelta(days=time.day - 1 - days, hours=-hours)
+
+
+def _last(_time: dt.datetime, nr: int, /) -> int:
+    return nr
+
+
+def _hourly(time: dt.datetime, _nr: int, /) -> int:
+    return time.year * 1000000 + time.month * 10000 + time.day * 100 + time.hour
+
+
+def _daily(time: dt.datetime, _nr: int, /) -> int:
+    return time.year * 10000 + time.month * 100 + time.day
+
+
+def _weekly(time: dt.datetime, _nr: int, /) -> int:
+    year, week, _ = time.isocalendar()
+    return year * 100 + week
+
+
+def _monthly(time: dt.datetime, _nr: int, /) -> int:
+    return time.year * 100 + time.month
+
+
+def _yearly(time: dt.datetime, _nr: int, /) -> int:
+    return time.year
+
+
+__all__ = ["RetentionPlan", "plan_retention"]
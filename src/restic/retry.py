@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import datetime as dt
+import json
+import os
+import random
+import socket
+import time
+from dataclasses import dataclass
+from re import IGNORECASE, MULTILINE, search
+from subprocess import CalledProcessError, check_call, check_output
+from typing import TYPE_CHECKING, Any, Literal, Self
+
+from restic.logging import LOGGER
+from restic.progress import stream_json
+from restic.repo import expand_repo_options, get_repo_env
+from restic.settings import SETTINGS, resolve_settings
+from restic.tracing import span, trace_subprocess
+from restic.utilities import yield_password_env
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from restic.repo import Repo
+    from restic.types import PasswordLike
+
+
+type FailureKind = Literal["fatal", "locked", "missing", "transient"]
+
+
+_MISSING_EXIT_CODE = 10
+_LOCKED_EXIT_CODE = 11
+_PARTIAL_EXIT_CODE = 3  # snapshot created, some files unreadable
+_MISSING_PATTERNS = ["Is there a repository at the following location?"]
+_LOCKED_PATTERNS = [
+    r"repository is already locked",
+    r"unable to create lock",
+    r"failed to lock",
+]
+_TRANSIENT_PATTERNS = [
+    r"\b(status|code|HTTP(/[\d.]+)?( response)?)[ :=(]*(429|5\d\d)\b",
+    r"service unavailable",
+    r"too many requests",
+    r"connection (reset|refused|lost|closed)",
+    r"broken pipe",
+    r"unexpected EOF",
+    r"i/o timeout",
+    r"\btimed out\b",
+    r"\b(request|dial|handshake) timeout\b",
+    r"context deadline exceeded",
+    r"temporary failure",
+    r"no route to host",
+    r"network is unreachable",
+    r"TLS handshake",
+]
+
+
+@dataclass(kw_only=True, slots=True)
+class Lock:
+    id: str
+    time: dt.datetime
+    exclusive: bool = False
+    hostname: str = ""
+    username: str = ""
+    pid: int = 0
+
+    @classmethod
+    def parse(cls, id_: str, data: dict[str, Any], /) -> Self:
+        return cls(
+            id=id_,
+            time=dt.datetime.fromisoformat(data["time"]),
+            exclusive=data.get("exclusive", False),
+            hostname=data.get("hostname", ""),
+            username=data.get("username", ""),
+            pid=data.get("pid", 0),
+        )
+
+    @resolve_settings
+    def is_stale(
+        self,
+        *,
+        now: dt.datetime | None = None,
+        max_age: int = SETTINGS.stale_lock_age,
+        hostname: str | None = None,
+    ) -> bool:
+        now_use = dt.datetime.now(tz=dt.UTC) if now is None else now
+        if (now_use - self.time).total_seconds() >= max_age:
+            return True
+        hostname_use = socket.gethostname() if hostname is None else hostname
+        return (self.hostname == hostname_use) and not _is_alive(self.pid)
+
+
+@resolve_settings
+def call_with_retry[T](
+    func: Callable[[], T],
+    /,
+    *,
+    repo: Repo,
+    password: PasswordLike = SETTINGS.password,
+    retries: int = SETTINGS.retries,
+    delay: float = SETTINGS.retry_delay,
+    max_delay: float = SETTINGS.retry_max_delay,
+    jitter: float = SETTINGS.retry_jitter,
+    stale_lock_age: int = SETTINGS.stale_lock_age,
+) -> T:
+    attempt = 0
+    while True:
+        try:
+            return func()
+        except CalledProcessError as error:
+            kind = classify_failure(error)
+            if (kind in {"fatal", "missing"}) or (attempt >= retries):
+                raise
+            if kind == "locked":
+                _ = unlock_stale(repo, password=password, max_age=stale_lock_age)
+            wait = get_backoff(attempt, delay=delay, max_delay=max_delay, jitter=jitter)
+            attempt += 1
+            LOGGER.warning(
+                "Attempt %d/%d on '%s' failed (%s); retrying in %.1fs...",
+                attempt,
+                retries + 1,
+                repo,
+                kind,
+                wait,
+            )
+            with span("retry_wait", attempt=attempt, kind=kind, repo=repo.repository):
+                time.sleep(wait)
+
+
+def classify_failure(error: CalledProcessError, /) -> FailureKind:
+    if error.returncode == _PARTIAL_EXIT_CODE:
+        return "fatal"
+    stderr = error.stderr if isinstance(error.stderr, str) else ""
+    if (error.returncode == _MISSING_EXIT_CODE) or _matches(_MISSING_PATTERNS, stderr):
+        return "missing"
+    if (error.returncode == _LOCKED_EXIT_CODE) or _matches(_LOCKED_PATTERNS, stderr):
+        return "locked"
+    if _matches(_TRANSIENT_PATTERNS, stderr):
+        return "transient"
+    return "fatal"
+
+
+@resolve_settings
+def get_backoff(
+    attempt: int,
+    /,
+    *,
+    delay: float = SETTINGS.retry_delay,
+    max_delay: float = SETTINGS.retry_max_delay,
+    jitter: float = SETTINGS.retry_jitter,
+) -> float:
+    base = min(delay * 2**attempt, max_delay)
+    return base * (1 - jitter * random.random())
+
+
+@resolve_settings
+def get_locks(
+    repo: Repo, /, *, password: PasswordLike = SETTINGS.password
+) -> list[Lock]:
+    with yield_password_env(password=password) as password_env:
+        env = {**os.environ, **get_repo_env(repo), **password_env}
+        options = expand_repo_options(repo)
+        ids = [
+            m
+            for m in stream_json(
+                "restic", "list", "locks", "--no-lock", *options, env=env
+            )
+            if isinstance(m, str)
+        ]
+        locks: list[Lock] = []
+        for id_ in ids:
+            args = ["restic", "cat", "lock", "--no-lock", *options, id_]
+            try:
+                with trace_subprocess(args, repo=repo.repository):
+                    output = check_output(args, env=env, text=True)
+            except CalledProcessError:
+                continue  # released in the meantime
+            locks.append(Lock.parse(id_, json.loads(output)))
+    return locks
+
+
+@resolve_settings
+def unlock_stale(
+    repo: Repo,
+    /,
+    *,
+    password: PasswordLike = SETTINGS.password,
+    max_age: int = SETTINGS.stale_lock_age,
+) -> list[Lock]:
+    locks = get_locks(repo, password=password)
+    stale = [lock for lock in locks if lock.is_stale(max_age=max_age)]
+    for lock in locks:
+        LOGGER.info(
+            "Lock %s on '%s' held by %s@%s (pid %d) since %s; %s",
+            lock.id[:8],
+            repo,
+            lock.username,
+            lock.hostname,
+            lock.pid,
+            lock.time,
+            "stale" if lock in stale else "live",
+        )
+    if len(stale) == 0:
+        return []
+    with yield_password_env(password=password) as password_env:
+        args = ["restic", "unlock", *expand_repo_options(repo)]
+        with trace_subprocess(args, repo=repo.repository):
+            _ = check_call(
+                args, env={**os.environ, **get_repo_env(repo), **password_env}
+            )
+    LOGGER.info("Removed %d stale lock(s) from '%s'", len(stale), repo)
+    return stale
+
+
+def _is_alive(pid: int, /) -> bool:
+    if pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _matches(patterns: list[str], text: str, /) -> bool:
+    return any(search(p, text, flags=IGNORECASE | MULTILINE) for p in patterns)
+
+
+__all__ = [
+    "FailureKind",
+    "Lock",
+    "call_with_retry",
+    "classify_failure",
+    "get_backoff",
+    "get_locks",
+    "unlock_stale",
+]
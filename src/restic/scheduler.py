@@ -0,0 +1,361 @@
+from __future__ import annotations
+
+import datetime as dt
+import fcntl
+import json
+import random
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from re import sub
+from signal import SIGINT, SIGTERM, signal
+from threading import Event, Lock
+from typing import TYPE_CHECKING, Any, Self
+
+from restic.logging import LOGGER
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable
+
+    from utilities.types import PathLike
+
+
+_CRON_FIELDS = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+_CRON_MAX_DAYS = 5 * 366
+_STATE_VERSION = 1
+
+
+@dataclass(frozen=True, kw_only=True, slots=True)
+class Schedule:
+    interval: int | None = None
+    minutes: frozenset[int] = frozenset()
+    hours: frozenset[int] = frozenset()
+    days: frozenset[int] = frozenset()
+    months: frozenset[int] = frozenset()
+    weekdays: frozenset[int] = frozenset()
+    any_day: bool = True
+    any_weekday: bool = True
+
+    @classmethod
+    def parse(cls, text: str, /) -> Self:
+        if text.strip().isdigit():
+            interval = int(text)
+            if interval <= 0:
+                msg = f"Schedule interval must be positive; got {interval}"
+                raise ValueError(msg)
+            return cls(interval=interval)
+        parts = text.split()
+        if len(parts) != len(_CRON_FIELDS):
+            msg = (
+                f"Invalid schedule {text!r}; expected seconds or 'min hour dom mon dow'"
+            )
+            raise ValueError(msg)
+        minutes, hours, days, months, weekdays = (
+            _parse_cron_field(p, lo, hi)
+            for p, (lo, hi) in zip(parts, _CRON_FIELDS, strict=True)
+        )
+        return cls(
+            minutes=minutes,
+            hours=hours,
+            days=days,
+            months=months,
+            weekdays=frozenset(w % 7 for w in weekdays),
+            any_day=parts[2] == "*",
+            any_weekday=parts[4] == "*",
+        )
+
+    def next_after(self, time: dt.datetime, /) -> dt.datetime:
+        if self.interval is not None:
+            return time + dt.timedelta(seconds=self.interval)
+        local = _is_local(time)
+        start = time.replace(second=0, microsecond=0) + dt.timedelta(minutes=1)
+        for i in range(_CRON_MAX_DAYS):
+            day = (start + dt.timedelta(days=i)).date()
+            if not self._matches_day(day):
+                continue
+            for hour in sorted(self.hours):
+                for minute in sorted(self.minutes):
+                    naive = dt.datetime.combine(day, dt.time(hour, minute))
+                    candidate = (
+                        naive.astimezone()
+                        if local
+                        else naive.replace(tzinfo=time.tzinfo)
+                    )
+                    if candidate >= start:
+                        return candidate
+        msg = f"Schedule {self} never fires"
+        raise ValueError(msg)
+
+    def _matches_day(self, day: dt.date, /) -> bool:
+        if day.month not in self.months:
+            return False
+        in_days = day.day in self.days
+        in_weekdays = day.isoweekday() % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return in_days and in_weekdays
+        return in_days or in_weekdays
+
+
+@dataclass(kw_only=True, slots=True)
+class Job:
+    name: str
+    schedule: Schedule
+    func: Callable[[], object]
+    jitter: int = 0
+    catch_up: bool = True
+
+
+@dataclass(kw_only=True, slots=True)
+class JobState:
+    last_run: dt.datetime | None = None
+    last_duration: float | None = None
+    last_error: str | None = None
+    runs: int = 0
+    failures: int = 0
+
+
+class Scheduler:
+    def __init__(
+        self,
+        jobs: Iterable[Job],
+        /,
+        *,
+        state_dir: PathLike,
+        max_workers: int | None = None,
+        now: dt.datetime | None = None,
+    ) -> None:
+        super().__init__()
+        self.jobs = list(jobs)
+        self.state_file = Path(state_dir, "state.json")
+        self.lock_dir = Path(state_dir, "locks")
+        self.max_workers = max_workers
+        self._state = _read_state(self.state_file)
+        self._running: set[str] = set()
+        self._mutex = Lock()
+        now_use = _now() if now is None else now
+        self.due = {job.name: self._first_due(job, now_use) for job in self.jobs}
+
+    def state(self, name: str, /) -> JobState:
+        return self._state.setdefault(name, JobState())
+
+    def run_forever(self, *, stop: Event | None = None) -> None:
+        stop_use = Event() if stop is None else stop
+        LOGGER.info("Scheduling %d job(s)...", len(self.jobs))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while not stop_use.is_set():
+                for job in self.pending():
+                    if self._claim(job):
+                        _ = pool.submit(self._run_claimed, job)
+                _ = stop_use.wait(timeout=self._seconds_until_due())
+        LOGGER.info("Stopped scheduling")
+
+    def pending(self, *, now: dt.datetime | None = None) -> list[Job]:
+        now_use = _now() if now is None else now
+        with self._mutex:
+            return [
+                j
+                for j in self.jobs
+                if (self.due[j.name] <= now_use) and (j.name not in self._running)
+            ]
+
+    def run_job(self, job: Job, /) -> bool:
+        if not self._claim(job):
+            LOGGER.info("Skipping '%s'; already running", job.name)
+            return False
+        return self._run_claimed(job)
+
+    def _claim(self, job: Job, /) -> bool:
+        with self._mutex:
+            if job.name in self._running:
+                return False
+            self._running.add(job.name)
+            return True
+
+    def _first_due(self, job: Job, now: dt.datetime, /) -> dt.datetime:
+        last_run = self.state(job.name).last_run
+        if last_run is None:
+            return now
+        due = job.schedule.next_after(last_run)
+        if due > now:
+            return _jitter(due, job.jitter)
+        if job.catch_up:
+            LOGGER.info("Catching up on '%s'; missed run due at %s", job.name, due)
+            return now
+        return _jitter(job.schedule.next_after(now), job.jitter)
+
+    def _run_claimed(self, job: Job, /) -> bool:
+        try:
+            return self._run_locked(job)
+        finally:
+            with self._mutex:
+                self._running.discard(job.name)
+
+    def _run_locked(self, job: Job, /) -> bool:
+        self.lock_dir.mkdir(parents=True, exist_ok=True)
+        path = self.lock_dir.joinpath(f"{_slugify(job.name)}.lock")
+        with path.open("a") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                LOGGER.warning("Skipping '%s'; locked by another process", job.name)
+                self._reschedule(job, _now())
+                return False
+            try:
+                return self._run_unlocked(job)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _run_unlocked(self, job: Job, /) -> bool:
+        start = _now()
+        LOGGER.info("Running '%s'...", job.name)
+        state = self.state(job.name)
+        try:
+            _ = job.func()
+        except Exception as error:  # noqa: BLE001
+            LOGGER.exception("Job '%s' failed", job.name)
+            state.last_error = repr(error)
+            state.failures += 1
+            ok = False
+        else:
+            state.last_error = None
+            ok = True
+        state.last_run = start
+        state.last_duration = (_now() - start).total_seconds()
+        state.runs += 1
+        self._reschedule(job, start)
+        with self._mutex:
+            _write_state(self.state_file, self._state)
+        LOGGER.info(
+            "Finished '%s' in %.1fs; next run at %s",
+            job.name,
+            state.last_duration,
+            self.due[job.name],
+        )
+        return ok
+
+    def _reschedule(self, job: Job, last_run: dt.datetime, /) -> None:
+        due = job.schedule.next_after(last_run)
+        now = _now()
+        if due <= now:
+            due = job.schedule.next_after(now)
+        with self._mutex:
+            self.due[job.name] = _jitter(due, job.jitter)
+
+    def _seconds_until_due(self) -> float:
+        with self._mutex:
+            due = [self.due[j.name] for j in self.jobs if j.name not in self._running]
+        if len(due) == 0:
+            return 1.0
+        return min(max((min(due) - _now()).total_seconds(), 0.0), 60.0)
+
+
+def run_or_schedule(
+    name: str,
+    func: Callable[[], object],
+    /,
+    *,
+    schedule: str | None = None,
+    jitter: int = 0,
+    catch_up: bool = True,
+    state_dir: PathLike,
+) -> None:
+    if schedule is None:
+        _ = func()
+        return
+    job = Job(
+        name=name,
+        schedule=Schedule.parse(schedule),
+        func=func,
+        jitter=jitter,
+        catch_up=catch_up,
+    )
+    scheduler = Scheduler([job], state_dir=state_dir)
+    stop = Event()
+    for signum in [SIGINT, SIGTERM]:
+        _ = signal(signum, lambda *_: stop.set())
+    scheduler.run_forever(stop=stop)
+
+
+def _is_local(time: dt.datetime, /) -> bool:
+    # `_now()` and the persisted state carry the local UTC offset of one instant;
+    # resolve such times against the system time zone so DST changes apply
+    return isinstance(time.tzinfo, dt.timezone) and (
+        time.utcoffset() == time.astimezone().utcoffset()
+    )
+
+
+def _jitter(time: dt.datetime, jitter: int, /) -> dt.datetime:
+    if jitter <= 0:
+        return time
+    return time + dt.timedelta(seconds=random.uniform(0, jitter))
+
+
+def _now() -> dt.datetime:
+    return dt.datetime.now().astimezone()
+
+
+def _parse_cron_field(text: str, lo: int, hi: int, /) -> frozenset[int]:
+    values: set[int] = set()
+    for part in text.split(","):
+        range_, _, step_text = part.partition("/")
+        step = int(step_text) if step_text != "" else 1
+        if range_ == "*":
+            start, stop = lo, hi
+        elif "-" in range_:
+            start, stop = map(int, range_.split("-", 1))
+        else:
+            start = int(range_)
+            stop = hi if step_text != "" else start
+        if not (lo <= start <= stop <= hi) or (step <= 0):
+            msg = f"Invalid cron field {text!r}; expected values in {lo}-{hi}"
+            raise ValueError(msg)
+        values.update(range(start, stop + 1, step))
+    return frozenset(values)
+
+
+def _read_state(path: Path, /) -> dict[str, JobState]:
+    try:
+        data = json.loads(path.read_text())
+    except FileNotFoundError:
+        return {}
+    except json.JSONDecodeError:
+        LOGGER.warning("Ignoring corrupt scheduler state '%s'", path)
+        return {}
+    if data.get("version") != _STATE_VERSION:
+        return {}
+    return {name: _parse_state(s) for name, s in data["jobs"].items()}
+
+
+def _parse_state(data: dict[str, Any], /) -> JobState:
+    last_run = data.get("last_run")
+    return JobState(
+        last_run=None if last_run is None else dt.datetime.fromisoformat(last_run),
+        last_duration=data.get("last_duration"),
+        last_error=data.get("last_error"),
+        runs=data.get("runs", 0),
+        failures=data.get("failures", 0),
+    )
+
+
+def _slugify(text: str, /) -> str:
+    return sub(r"[^\w.-]+", "_", text)
+
+
+def _write_state(path: Path, states: dict[str, JobState], /) -> None:
+    jobs = {
+        name: {
+            "last_run": None if s.last_run is None else s.last_run.isoformat(),
+            "last_duration": s.last_duration,
+            "last_error": s.last_error,
+            "runs": s.runs,
+            "failures": s.failures,
+        }
+        for name, s in states.items()
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp = path.with_name(f"{path.name}.tmp")
+    _ = temp.write_text(json.dumps({"version": _STATE_VERSION, "jobs": jobs}))
+    _ = temp.replace(path)
+
+
+__all__ = ["Job", "JobState", "Schedule", "Scheduler", "run_or_schedule"]
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import os
+from contextlib import ExitStack
+from pathlib import Path
+from re import MULTILINE, search
+from subprocess import CalledProcessError
+from subprocess import run as run_subprocess
+from typing import TYPE_CHECKING, Any, Concatenate, Self, cast
+
+from restic import lib
+from restic.logging import LOGGER
+from restic.repo import expand_repo_options, get_repo_env
+from restic.settings import SETTINGS, resolve_settings
+from restic.tracing import trace_subprocess
+from restic.utilities import yield_password_env
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from types import TracebackType
+
+    from utilities.types import PathLike
+
+    from restic.repo import Repo
+    from restic.types import PasswordLike
+
+
+_MISSING_EXIT_CODE = 10
+_MISSING_PATTERN = "Is there a repository at the following location?"
+
+
+def _bind[**P, T](
+    func: Callable[Concatenate[Repo, P], T],
+    get_defaults: Callable[[RepoSession], dict[str, Any]],
+    /,
+) -> Callable[Concatenate[RepoSession, P], T]:
+    def method(self: RepoSession, /, *args: P.args, **kwargs: P.kwargs) -> T:
+        return cast("Callable[..., T]", func)(
+            self.repo, *args, **{**get_defaults(self), **kwargs}
+        )
+
+    return method
+
+
+def _bind_second[U, **P, T](
+    func: Callable[Concatenate[U, Repo, P], T],
+    get_defaults: Callable[[RepoSession], dict[str, Any]],
+    /,
+) -> Callable[Concatenate[RepoSession, U, P], T]:
+    def method(self: RepoSession, first: U, /, *args: P.args, **kwargs: P.kwargs) -> T:
+        return cast("Callable[..., T]", func)(
+            first, self.repo, *args, **{**get_defaults(self), **kwargs}
+        )
+
+    return method
+
+
+class RepoSession:
+    @resolve_settings
+    def __init__(
+        self,
+        repo: Repo,
+        /,
+        *,
+        password: PasswordLike = SETTINGS.password,
+        cache_dir: PathLike = SETTINGS.cache_dir,
+        init: bool = True,
+    ) -> None:
+        super().__init__()
+        self.repo = repo
+        self.password = password
+        self.cache_dir = cache_dir
+        self.init = init
+        self.env: dict[str, str] = {}
+        self._password_file: Path | None = None
+        self._exists: bool | None = None
+        self._stack = ExitStack()
+
+    def __enter__(self) -> Self:
+        password_env = self._stack.enter_context(
+            yield_password_env(password=self.password)
+        )
+        self._password_file = Path(password_env["RESTIC_PASSWORD_FILE"])
+        self.env = {**get_repo_env(self.repo), **password_env}
+        if self.init and not self.exists:
+            self.initialize()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self._stack.close()
+        self._password_file = None
+        self.env = {}
+
+    @property
+    def exists(self) -> bool:
+        if self._exists is None:
+            self._exists = self._probe()
+        return self._exists
+
+    @property
+    def password_file(self) -> Path:
+        if self._password_file is None:
+            msg = f"Session for '{self.repo}' is not open"
+            raise RuntimeError(msg)
+        return self._password_file
+
+    def initialize(self) -> None:
+        lib.init(self.repo, password=self.password_file, env=self.env)
+        self._exists = True
+
+    backup = _bind_second(
+        lib.backup,
+        lambda s: {
+            "password": s.password_file,
+            "env": s.env,
+            "cache_dir": s.cache_dir,
+            "auto_init": False,
+        },
+    )
+    copy = _bind(
+        lib.copy, lambda s: {"src_password": s.password_file, "cache_dir": s.cache_dir}
+    )
+    forget = _bind(
+        lib.forget,
+        lambda s: {"password": s.password_file, "env": s.env, "cache_dir": s.cache_dir},
+    )
+    prune = _bind(lib.prune, lambda s: {"password": s.password_file, "env": s.env})
+    restore = _bind(lib.restore, lambda s: {"password": s.password_file, "env": s.env})
+    snapshots = _bind(
+        lib.snapshots, lambda s: {"password": s.password_file, "env": s.env}
+    )
+
+    def _probe(self) -> bool:
+        args = ["restic", "cat", "config", "--no-lock", *expand_repo_options(self.repo)]
+        with trace_subprocess(args, repo=self.repo.repository) as attrs:
+            result = run_subprocess(
+                args,
+                capture_output=True,
+                text=True,
+                env={**os.environ, **self.env},
+                check=False,
+            )
+            attrs["exit_code"] = result.returncode
+        if result.returncode == 0:
+            return True
+        if (result.returncode == _MISSING_EXIT_CODE) or search(
+            _MISSING_PATTERN, result.stderr, flags=MULTILINE
+        ):
+            LOGGER.info("Repository '%s' does not exist", self.repo)
+            return False
+        raise CalledProcessError(
+            result.returncode, args, output=result.stdout, stderr=result.stderr
+        )
+
+
+__all__ = ["RepoSession"]
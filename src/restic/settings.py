@@ -1,9 +1,14 @@
 from __future__ import annotations
 
-from os import getenv
-from typing import Any
+from dataclasses import dataclass
+from functools import lru_cache, wraps
+from inspect import Parameter, iscoroutinefunction, markcoroutinefunction, signature
+from os import environ, getenv
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Literal, cast
 
-from attrs import fields_dict
+from attrs import Factory, fields_dict
+from attrs.validators import gt
 from typed_settings import (
     EnvLoader,
     FileLoader,
@@ -19,38 +24,190 @@ from utilities.os import CPU_COUNT
 
 from restic.logging import LOGGER
 
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from typed_settings.loaders import Loader
+
+CACHE_DIR = Path(getenv("XDG_CACHE_HOME", Path.home().joinpath(".cache")), "py-restic")
 CONFIG_FILE = getenv("RESTIC_CONFIG_FILE", "config.toml")
 SECRETS_FILE = getenv("RESTIC_SECRETS_FILE", "secrets.toml")
-LOADERS = [
-    FileLoader({"*.toml": TomlFormat(None)}, [find(CONFIG_FILE), find(SECRETS_FILE)]),
-    EnvLoader(""),
-]
 
 
 @settings(kw_only=True)
 class Settings:
     # global
+    cache_dir: str = option(
+        default=str(CACHE_DIR), help="Directory for local caches and indexes"
+    )
     dry_run: bool = option(default=False, help="Just print what would have been done")
     password: Secret[str] = secret(
         default=Secret("password"), help="Repository password or password file"
     )
+    progress: bool = option(
+        default=False,
+        help="Report live progress (files/s, bytes/s, ETA) from restic's JSON output",
+    )
+    progress_interval: int = option(
+        default=10, help="Report progress every `n` seconds", validator=gt(0)
+    )
+    schedule: str | None = option(
+        default=None,
+        help="Stay resident and run on this schedule; seconds (e.g. '3600') or cron (e.g. '0 3 * * *')",
+    )
+    jitter: int = option(
+        default=0, help="Delay each scheduled run by up to `n` random seconds"
+    )
+    catch_up: bool = option(
+        default=True, help="Run once immediately if a scheduled run was missed"
+    )
+    index_max_age: int | None = option(
+        default=None,
+        help="Trust the local snapshot index for `n` seconds before re-listing the repository",
+    )
+    # cache
+    restic_cache_dir: str | None = option(
+        default=str(CACHE_DIR.joinpath("restic")),
+        help="Directory for restic's metadata cache, shared by all repositories",
+    )
+    max_cache_size: str | None = option(
+        default=None,
+        help="Evict the least recently used repository caches above this total size (e.g. '20G')",
+    )
+    # retry
+    retries: int = option(
+        default=3,
+        help="Retry a failed restic command up to `n` times on transient errors or stale locks",
+    )
+    retry_delay: float = option(
+        default=5.0, help="Wait `n` seconds before the first retry, doubling each time"
+    )
+    retry_max_delay: float = option(
+        default=300.0, help="Wait at most `n` seconds between retries"
+    )
+    retry_jitter: float = option(
+        default=0.5, help="Shorten each retry delay by up to this random fraction"
+    )
+    stale_lock_age: int = option(
+        default=1800,
+        help="Treat repository locks older than `n` seconds, or held by dead local processes, as stale",
+    )
+    # metrics
+    metrics: str | None = option(
+        default=None,
+        help="Write Prometheus metrics to this textfile-collector path (e.g. '/var/lib/node_exporter/restic.prom') after each operation",
+    )
+    metrics_port: int | None = option(
+        default=None, help="Serve metrics over HTTP on this port while running"
+    )
+    metrics_addr: str = option(
+        default="127.0.0.1", help="Bind the metrics HTTP endpoint to this address"
+    )
+    # tracing
+    trace: str | None = option(
+        default=None,
+        help="Write a Chrome/Perfetto trace of each operation's phases and subprocesses to this path",
+    )
+    # run
+    run_workers: int | None = option(
+        default=None,
+        help="Run at most `n` inventory jobs at once (overrides the inventory)",
+    )
+    run_report: str | None = option(
+        default=None, help="Write a JSON summary of the inventory run to this path"
+    )
     # backblaze
     backblaze_key_id: Secret[str] | None = secret(default=None, help="Backblaze key ID")
     backblaze_application_key: Secret[str] | None = secret(
         default=None, help="Backblaze application key"
     )
+    # backends
+    backblaze_connections: int | None = option(
+        default=None,
+        help="Use `n` backend connections for Backblaze repositories (default: restic's)",
+    )
+    backblaze_pack_size: int | None = option(
+        default=None,
+        help="Target pack size in MiB for Backblaze repositories (default: restic's); changing it makes prune repack existing packs, so prefer a per-repo '?pack-size=n' on new repositories",
+    )
+    sftp_connections: int | None = option(
+        default=None,
+        help="Use `n` backend connections for SFTP repositories (default: restic's)",
+    )
+    sftp_pack_size: int | None = option(
+        default=None,
+        help="Target pack size in MiB for SFTP repositories (default: restic's)",
+    )
+    local_connections: int | None = option(
+        default=None,
+        help="Use `n` backend connections for local repositories (default: restic's)",
+    )
+    local_pack_size: int | None = option(
+        default=None,
+        help="Target pack size in MiB for local repositories (default: restic's)",
+    )
+    # benchmark
+    benchmark_datasets: list[str] | None = option(
+        default=None, help="Only run these datasets (deep, duplicate, huge, tiny)"
+    )
+    benchmark_read_concurrency: list[int] | None = option(
+        default=None, help="Sweep these `read_concurrency` values"
+    )
+    benchmark_repeats: int = option(default=1, help="Repeat each benchmark `n` times")
+    benchmark_scale: float = option(
+        default=1.0, help="Scale the size of the synthetic datasets"
+    )
+    benchmark_output: str = option(
+        default="benchmark.json", help="Write the JSON report to this path"
+    )
+    benchmark_threshold: float = option(
+        default=0.1,
+        help="Flag a regression when an operation is more than this fraction slower",
+    )
     # backup
     chmod: bool = option(default=False, help="Change permissions of the directory/file")
     chown: str | None = option(
         default=None, help="Change ownership of the directory/file"
     )
+    chmod_manifest: str | None = option(
+        default=None,
+        help="Manifest used to skip unchanged directories when changing permissions/ownership",
+    )
     exclude_backup: list[str] | None = option(default=None, help="Exclude a pattern")
     exclude_i_backup: list[str] | None = option(
         default=None, help="Exclude a pattern but ignores the casing of filenames"
     )
+    groups: int | None = option(
+        default=None, help="Split the paths into `n` snapshots instead of one"
+    )
     read_concurrency: int = option(
         default=max(round(CPU_COUNT / 2), 2), help="Read `n` files concurrency"
     )
+    auto_read_concurrency: bool = option(
+        default=False,
+        help="Calibrate `read_concurrency` per device and cache the result",
+    )
+    recalibrate: bool = option(
+        default=False, help="Re-run the `read_concurrency` calibration"
+    )
+    watch: bool = option(
+        default=False,
+        help="Back up once, then stay resident, watch the paths with inotify and back up again once changes settle",
+    )
+    watch_debounce: int = option(
+        default=30, help="Wait for `n` seconds without changes before backing up"
+    )
+    watch_min_interval: int = option(
+        default=300, help="Back up at most once every `n` seconds while watching"
+    )
+    watch_max_interval: int = option(
+        default=3600,
+        help="Back up after at most `n` seconds of continuous changes while watching",
+    )
+    skip_unchanged: bool = option(
+        default=False,
+        help="Skip the backup if the paths are unchanged since the last successful backup",
+    )
     tag_backup: list[str] | None = option(
         default=None, help="Add tags for the snapshot in the format `tag[,tag,...]`"
     )
@@ -59,9 +216,27 @@ class Settings:
     )
     sleep: int | None = option(default=None, help="Sleep after a successful backup")
     # copy
+    connections: int | None = option(
+        default=None, help="Use at most `n` backend connections per repository"
+    )
+    limit_download: int | None = option(
+        default=None,
+        help="Limit downloads to `n` KiB/s in total, shared between concurrent copies",
+    )
+    limit_upload: int | None = option(
+        default=None,
+        help="Limit uploads to `n` KiB/s in total, shared between concurrent copies",
+    )
     tag_copy: list[str] | None = option(
         default=None, help="Only consider snapshots including `tag[,tag,...]`"
     )
+    incremental_copy: bool = option(
+        default=True,
+        help="Only pass snapshots missing from the destination (by original ID) to 'copy'",
+    )
+    copy_batch_size: int = option(
+        default=100, help="Copy at most `n` snapshots per 'copy' run"
+    )
     # forget
     keep_last: int | None = option(default=None, help="Keep the last n snapshots")
     keep_hourly: int | None = option(
@@ -104,8 +279,8 @@ class Settings:
         help="Keep yearly snapshots that are newer than duration relative to the latest snapshot",
     )
     prune: bool = option(
-        default=True,
-        help="Automatically run the 'prune' command if snapshots have been removed",
+        default=False,
+        help="Prune inline after 'forget' removes snapshots (prefer a scheduled 'prune')",
     )
     repack_cacheable_only: bool = option(
         default=False, help="Only repack packs which are cacheable"
@@ -116,9 +291,49 @@ class Settings:
     repack_uncompressed: bool = option(
         default=True, help="Repack all uncompressed data"
     )
+    skip_noop_forget: bool = option(
+        default=True,
+        help="Evaluate the keep policy locally and skip 'forget' if no snapshot would be removed",
+    )
     tag_forget: list[str] | None = option(
         default=None, help="Only consider snapshots including tag[,tag,...]"
     )
+    # prune
+    max_unused: str | None = option(
+        default=None,
+        help="Tolerate this much unused space after pruning, e.g. '5%', '10G' or 'unlimited'",
+    )
+    max_repack_size: str | None = option(
+        default=None,
+        help="Repack at most this much data per run, e.g. '50G', spreading large repacks over several runs",
+    )
+    min_reclaim: str | None = option(
+        default=None,
+        help="Only prune when at least this much space would be reclaimed, e.g. '10 GiB'",
+    )
+    min_unused_pct: float | None = option(
+        default=None,
+        help="Only prune when at least this percentage of the repository is unused",
+    )
+    # query
+    host_query: str | None = option(
+        default=None, help="Only consider snapshots for this host"
+    )
+    path_query: str | None = option(
+        default=None, help="Only consider snapshots including this (absolute) path"
+    )
+    tag_query: list[str] | None = option(
+        default=None, help="Only consider snapshots including tag[,tag,...]"
+    )
+    since_query: str | None = option(
+        default=None, help="Only consider snapshots taken at or after this time"
+    )
+    until_query: str | None = option(
+        default=None, help="Only consider snapshots taken before this time"
+    )
+    latest_query: int | None = option(
+        default=None, help="Only show the latest `n` matching snapshots"
+    )
     # restore
     delete: bool = option(
         default=False,
@@ -132,6 +347,24 @@ class Settings:
     include_i_restore: list[str] | None = option(
         default=None, help="Include a pattern but ignores the casing of filenames"
     )
+    restore_shards: int | None = option(
+        default=None,
+        help="Split the restore into `n` size-balanced shards restored concurrently",
+    )
+    restore_workers: int | None = option(
+        default=None, help="Restore at most `n` shards at once"
+    )
+    verify_restore: Literal["none", "sample", "full"] = option(
+        default="full",
+        help="Verify restored files: not at all, a sampled fraction, or in full",
+    )
+    verify_fraction: float = option(
+        default=0.01,
+        help="Fraction of files to verify in 'sample' mode; each batch of up to 1000 sampled files costs one extra `restic restore` and its size in temporary disk space next to the target",
+    )
+    verify_workers: int | None = option(
+        default=None, help="Verify at most `n` sampled files at once"
+    )
     tag_restore: list[str] | None = option(
         default=None,
         help='Only consider snapshots including tag[,tag,...], when snapshot ID "latest" is given',
@@ -139,215 +372,715 @@ class Settings:
     snapshot: str = option(default="latest", help="Snapshot ID to restore")
 
 
-LOGGER.info("Loading settings from '%s' and '%s'...", CONFIG_FILE, SECRETS_FILE)
-SETTINGS = load_settings(Settings, LOADERS)
+@dataclass(frozen=True, slots=True)
+class _FromSettings:
+    name: str
 
+    def __bool__(self) -> bool:
+        msg = f"Setting {self.name!r} was used unresolved; decorate its function with 'resolve_settings'"
+        raise RuntimeError(msg)
 
-def _get_help(member_descriptor: Any, /) -> None:
-    return fields_dict(Settings)[member_descriptor.__name__].metadata["typed-settings"][
-        "help"
+
+class _SettingsDefaults:
+    def __getattr__(self, name: str, /) -> Any:
+        if name not in _FIELDS:
+            raise AttributeError(name)
+        return _FromSettings(name)
+
+
+def get_loaders() -> list[Loader]:
+    return [
+        FileLoader(
+            {"*.toml": TomlFormat(None)}, [find(CONFIG_FILE), find(SECRETS_FILE)]
+        ),
+        EnvLoader(""),
     ]
 
 
+def get_settings() -> Settings:
+    env = frozenset((k, v) for k, v in environ.items() if k in _ENV_VARS)
+    return _load_settings(Path.cwd(), env)
+
+
+def resolve_settings[**P, T](func: Callable[P, T], /) -> Callable[P, T]:
+    lazy: dict[str, str] = {}
+    for name, param in signature(func).parameters.items():
+        if isinstance(param.default, _FromSettings):
+            if param.kind is not Parameter.KEYWORD_ONLY:
+                msg = f"Settings default of {func.__qualname__}({name}) must be keyword-only"
+                raise TypeError(msg)
+            lazy[name] = param.default.name
+
+    @wraps(func)
+    def wrapped(*args: P.args, **kwargs: P.kwargs) -> T:
+        if len(missing := [k for k in lazy if k not in kwargs]) >= 1:
+            settings = get_settings()
+            for key in missing:
+                kwargs[key] = getattr(settings, lazy[key])
+        return func(*args, **kwargs)
+
+    return markcoroutinefunction(wrapped) if iscoroutinefunction(func) else wrapped
+
+
+@lru_cache(maxsize=8)
+def _load_settings(cwd: Path, env: frozenset[tuple[str, str]], /) -> Settings:
+    _ = (cwd, env)  # only the cache key; the loaders read both
+    LOGGER.info("Loading settings from '%s' and '%s'...", CONFIG_FILE, SECRETS_FILE)
+    return load_settings(Settings, get_loaders())
+
+
+_FIELDS = fields_dict(Settings)
+_ENV_VARS = {name.upper() for name in _FIELDS}
+
+
+SETTINGS = cast("Settings", _SettingsDefaults())
+
+
+def _get_default(member_descriptor: Any, /) -> Any:
+    name: str = member_descriptor.__name__
+    if isinstance(default := _FIELDS[name].default, Secret):
+        # typed_settings cannot defer secret defaults; the command's own loaders
+        # still read the configured value
+        return default
+    return Factory(lambda: getattr(get_settings(), name))
+
+
+def _get_help(member_descriptor: Any, /) -> None:
+    return _FIELDS[member_descriptor.__name__].metadata["typed-settings"]["help"]
+
+
 @settings(kw_only=True)
 class InitSettings:
     password: Secret[str] = secret(
-        default=SETTINGS.password, help=_get_help(Settings.password)
+        default=_get_default(Settings.password), help=_get_help(Settings.password)
     )
 
 
 @settings(kw_only=True)
 class BackupSettings:
-    chmod: bool = option(default=SETTINGS.chmod, help=_get_help(Settings.chmod))
-    chown: str | None = option(default=SETTINGS.chown, help=_get_help(Settings.chown))
+    chmod: bool = option(
+        default=_get_default(Settings.chmod), help=_get_help(Settings.chmod)
+    )
+    chown: str | None = option(
+        default=_get_default(Settings.chown), help=_get_help(Settings.chown)
+    )
+    chmod_manifest: str | None = option(
+        default=_get_default(Settings.chmod_manifest),
+        help=_get_help(Settings.chmod_manifest),
+    )
     password: Secret[str] = secret(
-        default=SETTINGS.password, help=_get_help(Settings.password)
+        default=_get_default(Settings.password), help=_get_help(Settings.password)
+    )
+    dry_run: bool = option(
+        default=_get_default(Settings.dry_run), help=_get_help(Settings.dry_run)
     )
-    dry_run: bool = option(default=SETTINGS.dry_run, help=_get_help(Settings.dry_run))
     exclude: list[str] | None = option(
-        default=SETTINGS.exclude_backup, help=_get_help(Settings.exclude_backup)
+        default=_get_default(Settings.exclude_backup),
+        help=_get_help(Settings.exclude_backup),
     )
     exclude_i: list[str] | None = option(
-        default=SETTINGS.exclude_i_backup, help=_get_help(Settings.exclude_i_backup)
+        default=_get_default(Settings.exclude_i_backup),
+        help=_get_help(Settings.exclude_i_backup),
+    )
+    groups: int | None = option(
+        default=_get_default(Settings.groups), help=_get_help(Settings.groups)
+    )
+    progress: bool = option(
+        default=_get_default(Settings.progress), help=_get_help(Settings.progress)
+    )
+    progress_interval: int = option(
+        default=_get_default(Settings.progress_interval),
+        help=_get_help(Settings.progress_interval),
+        validator=gt(0),
     )
     read_concurrency: int = option(
-        default=SETTINGS.read_concurrency, help=_get_help(Settings.read_concurrency)
+        default=_get_default(Settings.read_concurrency),
+        help=_get_help(Settings.read_concurrency),
+    )
+    auto_read_concurrency: bool = option(
+        default=_get_default(Settings.auto_read_concurrency),
+        help=_get_help(Settings.auto_read_concurrency),
+    )
+    recalibrate: bool = option(
+        default=_get_default(Settings.recalibrate), help=_get_help(Settings.recalibrate)
+    )
+    skip_unchanged: bool = option(
+        default=_get_default(Settings.skip_unchanged),
+        help=_get_help(Settings.skip_unchanged),
+    )
+    watch: bool = option(
+        default=_get_default(Settings.watch), help=_get_help(Settings.watch)
+    )
+    watch_debounce: int = option(
+        default=_get_default(Settings.watch_debounce),
+        help=_get_help(Settings.watch_debounce),
+    )
+    watch_min_interval: int = option(
+        default=_get_default(Settings.watch_min_interval),
+        help=_get_help(Settings.watch_min_interval),
+    )
+    watch_max_interval: int = option(
+        default=_get_default(Settings.watch_max_interval),
+        help=_get_help(Settings.watch_max_interval),
     )
     tag_backup: list[str] | None = option(
-        default=SETTINGS.tag_backup, help=_get_help(Settings.tag_backup)
+        default=_get_default(Settings.tag_backup), help=_get_help(Settings.tag_backup)
     )
     run_forget: bool = option(
-        default=SETTINGS.run_forget, help=_get_help(Settings.run_forget)
+        default=_get_default(Settings.run_forget), help=_get_help(Settings.run_forget)
     )
     keep_last: int | None = option(
-        default=SETTINGS.keep_last, help=_get_help(Settings.keep_last)
+        default=_get_default(Settings.keep_last), help=_get_help(Settings.keep_last)
     )
     keep_hourly: int | None = option(
-        default=SETTINGS.keep_hourly, help=_get_help(Settings.keep_hourly)
+        default=_get_default(Settings.keep_hourly), help=_get_help(Settings.keep_hourly)
     )
     keep_daily: int | None = option(
-        default=SETTINGS.keep_daily, help=_get_help(Settings.keep_daily)
+        default=_get_default(Settings.keep_daily), help=_get_help(Settings.keep_daily)
     )
     keep_weekly: int | None = option(
-        default=SETTINGS.keep_weekly, help=_get_help(Settings.keep_weekly)
+        default=_get_default(Settings.keep_weekly), help=_get_help(Settings.keep_weekly)
     )
     keep_monthly: int | None = option(
-        default=SETTINGS.keep_monthly, help=_get_help(Settings.keep_monthly)
+        default=_get_default(Settings.keep_monthly),
+        help=_get_help(Settings.keep_monthly),
     )
     keep_yearly: int | None = option(
-        default=SETTINGS.keep_yearly, help=_get_help(Settings.keep_yearly)
+        default=_get_default(Settings.keep_yearly), help=_get_help(Settings.keep_yearly)
     )
     keep_within: str | None = option(
-        default=SETTINGS.keep_within, help=_get_help(Settings.keep_within)
+        default=_get_default(Settings.keep_within), help=_get_help(Settings.keep_within)
     )
     keep_within_hourly: str | None = option(
-        default=SETTINGS.keep_within_hourly, help=_get_help(Settings.keep_within_hourly)
+        default=_get_default(Settings.keep_within_hourly),
+        help=_get_help(Settings.keep_within_hourly),
     )
     keep_within_daily: str | None = option(
-        default=SETTINGS.keep_within_daily, help=_get_help(Settings.keep_within_daily)
+        default=_get_default(Settings.keep_within_daily),
+        help=_get_help(Settings.keep_within_daily),
     )
     keep_within_weekly: str | None = option(
-        default=SETTINGS.keep_within_weekly, help=_get_help(Settings.keep_within_weekly)
+        default=_get_default(Settings.keep_within_weekly),
+        help=_get_help(Settings.keep_within_weekly),
     )
     keep_within_monthly: str | None = option(
-        default=SETTINGS.keep_within_monthly,
+        default=_get_default(Settings.keep_within_monthly),
         help=_get_help(Settings.keep_within_monthly),
     )
     keep_within_yearly: str | None = option(
-        default=SETTINGS.keep_within_yearly, help=_get_help(Settings.keep_within_yearly)
+        default=_get_default(Settings.keep_within_yearly),
+        help=_get_help(Settings.keep_within_yearly),
+    )
+    prune: bool = option(
+        default=_get_default(Settings.prune), help=_get_help(Settings.prune)
+    )
+    max_unused: str | None = option(
+        default=_get_default(Settings.max_unused), help=_get_help(Settings.max_unused)
+    )
+    max_repack_size: str | None = option(
+        default=_get_default(Settings.max_repack_size),
+        help=_get_help(Settings.max_repack_size),
     )
-    prune: bool = option(default=SETTINGS.prune, help=_get_help(Settings.prune))
     repack_cacheable_only: bool = option(
-        default=SETTINGS.repack_cacheable_only,
+        default=_get_default(Settings.repack_cacheable_only),
         help=_get_help(Settings.repack_cacheable_only),
     )
     repack_small: bool = option(
-        default=SETTINGS.repack_small, help=_get_help(Settings.repack_small)
+        default=_get_default(Settings.repack_small),
+        help=_get_help(Settings.repack_small),
     )
     repack_uncompressed: bool = option(
-        default=SETTINGS.repack_uncompressed,
+        default=_get_default(Settings.repack_uncompressed),
         help=_get_help(Settings.repack_uncompressed),
     )
+    skip_noop_forget: bool = option(
+        default=_get_default(Settings.skip_noop_forget),
+        help=_get_help(Settings.skip_noop_forget),
+    )
     tag_forget: list[str] | None = option(
-        default=SETTINGS.tag_forget, help=_get_help(Settings.tag_forget)
+        default=_get_default(Settings.tag_forget), help=_get_help(Settings.tag_forget)
+    )
+    cache_dir: str = option(
+        default=_get_default(Settings.cache_dir), help=_get_help(Settings.cache_dir)
+    )
+    restic_cache_dir: str | None = option(
+        default=_get_default(Settings.restic_cache_dir),
+        help=_get_help(Settings.restic_cache_dir),
+    )
+    max_cache_size: str | None = option(
+        default=_get_default(Settings.max_cache_size),
+        help=_get_help(Settings.max_cache_size),
+    )
+    metrics: str | None = option(
+        default=_get_default(Settings.metrics), help=_get_help(Settings.metrics)
+    )
+    trace: str | None = option(
+        default=_get_default(Settings.trace), help=_get_help(Settings.trace)
+    )
+    metrics_port: int | None = option(
+        default=_get_default(Settings.metrics_port),
+        help=_get_help(Settings.metrics_port),
+    )
+    metrics_addr: str = option(
+        default=_get_default(Settings.metrics_addr),
+        help=_get_help(Settings.metrics_addr),
+    )
+    retries: int = option(
+        default=_get_default(Settings.retries), help=_get_help(Settings.retries)
+    )
+    sleep: int | None = option(
+        default=_get_default(Settings.sleep), help=_get_help(Settings.sleep)
+    )
+    schedule: str | None = option(
+        default=_get_default(Settings.schedule), help=_get_help(Settings.schedule)
+    )
+    jitter: int = option(
+        default=_get_default(Settings.jitter), help=_get_help(Settings.jitter)
+    )
+    catch_up: bool = option(
+        default=_get_default(Settings.catch_up), help=_get_help(Settings.catch_up)
+    )
+
+
+@settings(kw_only=True)
+class BenchmarkSettings:
+    datasets: list[str] | None = option(
+        default=_get_default(Settings.benchmark_datasets),
+        help=_get_help(Settings.benchmark_datasets),
+    )
+    read_concurrency: list[int] | None = option(
+        default=_get_default(Settings.benchmark_read_concurrency),
+        help=_get_help(Settings.benchmark_read_concurrency),
+    )
+    repeats: int = option(
+        default=_get_default(Settings.benchmark_repeats),
+        help=_get_help(Settings.benchmark_repeats),
+    )
+    scale: float = option(
+        default=_get_default(Settings.benchmark_scale),
+        help=_get_help(Settings.benchmark_scale),
+    )
+    output: str = option(
+        default=_get_default(Settings.benchmark_output),
+        help=_get_help(Settings.benchmark_output),
+    )
+
+
+@settings(kw_only=True)
+class CacheSettings:
+    restic_cache_dir: str | None = option(
+        default=_get_default(Settings.restic_cache_dir),
+        help=_get_help(Settings.restic_cache_dir),
+    )
+    max_cache_size: str | None = option(
+        default=_get_default(Settings.max_cache_size),
+        help=_get_help(Settings.max_cache_size),
+    )
+
+
+@settings(kw_only=True)
+class CompareSettings:
+    threshold: float = option(
+        default=_get_default(Settings.benchmark_threshold),
+        help=_get_help(Settings.benchmark_threshold),
     )
-    sleep: int | None = option(default=SETTINGS.sleep, help=_get_help(Settings.sleep))
 
 
 @settings(kw_only=True)
 class CopySettings:
-    src_password: Secret[str] = secret(
-        default=SETTINGS.password, help=_get_help(Settings.password)
+    src_password: Secret[str] | None = secret(
+        default=None, help=f"{_get_help(Settings.password)} (defaults to PASSWORD)"
+    )
+    dest_password: Secret[str] | None = secret(
+        default=None, help=f"{_get_help(Settings.password)} (defaults to PASSWORD)"
     )
-    dest_password: Secret[str] = secret(
-        default=SETTINGS.password, help=_get_help(Settings.password)
+    connections: int | None = option(
+        default=_get_default(Settings.connections), help=_get_help(Settings.connections)
+    )
+    limit_download: int | None = option(
+        default=_get_default(Settings.limit_download),
+        help=_get_help(Settings.limit_download),
+    )
+    limit_upload: int | None = option(
+        default=_get_default(Settings.limit_upload),
+        help=_get_help(Settings.limit_upload),
+    )
+    progress: bool = option(
+        default=_get_default(Settings.progress), help=_get_help(Settings.progress)
+    )
+    progress_interval: int = option(
+        default=_get_default(Settings.progress_interval),
+        help=_get_help(Settings.progress_interval),
+        validator=gt(0),
     )
     tag: list[str] | None = option(
-        default=SETTINGS.tag_copy, help=_get_help(Settings.tag_copy)
+        default=_get_default(Settings.tag_copy), help=_get_help(Settings.tag_copy)
+    )
+    incremental: bool = option(
+        default=_get_default(Settings.incremental_copy),
+        help=_get_help(Settings.incremental_copy),
+    )
+    batch_size: int = option(
+        default=_get_default(Settings.copy_batch_size),
+        help=_get_help(Settings.copy_batch_size),
+    )
+    cache_dir: str = option(
+        default=_get_default(Settings.cache_dir), help=_get_help(Settings.cache_dir)
+    )
+    index_max_age: int | None = option(
+        default=_get_default(Settings.index_max_age),
+        help=_get_help(Settings.index_max_age),
+    )
+    metrics: str | None = option(
+        default=_get_default(Settings.metrics), help=_get_help(Settings.metrics)
+    )
+    trace: str | None = option(
+        default=_get_default(Settings.trace), help=_get_help(Settings.trace)
+    )
+    metrics_port: int | None = option(
+        default=_get_default(Settings.metrics_port),
+        help=_get_help(Settings.metrics_port),
+    )
+    metrics_addr: str = option(
+        default=_get_default(Settings.metrics_addr),
+        help=_get_help(Settings.metrics_addr),
+    )
+    retries: int = option(
+        default=_get_default(Settings.retries), help=_get_help(Settings.retries)
+    )
+    sleep: int | None = option(
+        default=_get_default(Settings.sleep), help=_get_help(Settings.sleep)
+    )
+    schedule: str | None = option(
+        default=_get_default(Settings.schedule), help=_get_help(Settings.schedule)
+    )
+    jitter: int = option(
+        default=_get_default(Settings.jitter), help=_get_help(Settings.jitter)
+    )
+    catch_up: bool = option(
+        default=_get_default(Settings.catch_up), help=_get_help(Settings.catch_up)
     )
-    sleep: int | None = option(default=SETTINGS.sleep, help=_get_help(Settings.sleep))
 
 
 @settings(kw_only=True)
 class ForgetSettings:
     password: Secret[str] = secret(
-        default=SETTINGS.password, help=_get_help(Settings.password)
+        default=_get_default(Settings.password), help=_get_help(Settings.password)
+    )
+    dry_run: bool = option(
+        default=_get_default(Settings.dry_run), help=_get_help(Settings.dry_run)
     )
-    dry_run: bool = option(default=SETTINGS.dry_run, help=_get_help(Settings.dry_run))
     keep_last: int | None = option(
-        default=SETTINGS.keep_last, help=_get_help(Settings.keep_last)
+        default=_get_default(Settings.keep_last), help=_get_help(Settings.keep_last)
     )
     keep_hourly: int | None = option(
-        default=SETTINGS.keep_hourly, help=_get_help(Settings.keep_hourly)
+        default=_get_default(Settings.keep_hourly), help=_get_help(Settings.keep_hourly)
     )
     keep_daily: int | None = option(
-        default=SETTINGS.keep_daily, help=_get_help(Settings.keep_daily)
+        default=_get_default(Settings.keep_daily), help=_get_help(Settings.keep_daily)
     )
     keep_weekly: int | None = option(
-        default=SETTINGS.keep_weekly, help=_get_help(Settings.keep_weekly)
+        default=_get_default(Settings.keep_weekly), help=_get_help(Settings.keep_weekly)
     )
     keep_monthly: int | None = option(
-        default=SETTINGS.keep_monthly, help=_get_help(Settings.keep_monthly)
+        default=_get_default(Settings.keep_monthly),
+        help=_get_help(Settings.keep_monthly),
     )
     keep_yearly: int | None = option(
-        default=SETTINGS.keep_yearly, help=_get_help(Settings.keep_yearly)
+        default=_get_default(Settings.keep_yearly), help=_get_help(Settings.keep_yearly)
     )
     keep_within: str | None = option(
-        default=SETTINGS.keep_within, help=_get_help(Settings.keep_within)
+        default=_get_default(Settings.keep_within), help=_get_help(Settings.keep_within)
     )
     keep_within_hourly: str | None = option(
-        default=SETTINGS.keep_within_hourly, help=_get_help(Settings.keep_within_hourly)
+        default=_get_default(Settings.keep_within_hourly),
+        help=_get_help(Settings.keep_within_hourly),
     )
     keep_within_daily: str | None = option(
-        default=SETTINGS.keep_within_daily, help=_get_help(Settings.keep_within_daily)
+        default=_get_default(Settings.keep_within_daily),
+        help=_get_help(Settings.keep_within_daily),
     )
     keep_within_weekly: str | None = option(
-        default=SETTINGS.keep_within_weekly, help=_get_help(Settings.keep_within_weekly)
+        default=_get_default(Settings.keep_within_weekly),
+        help=_get_help(Settings.keep_within_weekly),
     )
     keep_within_monthly: str | None = option(
-        default=SETTINGS.keep_within_monthly,
+        default=_get_default(Settings.keep_within_monthly),
         help=_get_help(Settings.keep_within_monthly),
     )
     keep_within_yearly: str | None = option(
-        default=SETTINGS.keep_within_yearly, help=_get_help(Settings.keep_within_yearly)
+        default=_get_default(Settings.keep_within_yearly),
+        help=_get_help(Settings.keep_within_yearly),
+    )
+    prune: bool = option(
+        default=_get_default(Settings.prune), help=_get_help(Settings.prune)
+    )
+    max_unused: str | None = option(
+        default=_get_default(Settings.max_unused), help=_get_help(Settings.max_unused)
+    )
+    max_repack_size: str | None = option(
+        default=_get_default(Settings.max_repack_size),
+        help=_get_help(Settings.max_repack_size),
+    )
+    repack_cacheable_only: bool = option(
+        default=_get_default(Settings.repack_cacheable_only),
+        help=_get_help(Settings.repack_cacheable_only),
+    )
+    repack_small: bool = option(
+        default=_get_default(Settings.repack_small),
+        help=_get_help(Settings.repack_small),
+    )
+    repack_uncompressed: bool = option(
+        default=_get_default(Settings.repack_uncompressed),
+        help=_get_help(Settings.repack_uncompressed),
+    )
+    skip_noop: bool = option(
+        default=_get_default(Settings.skip_noop_forget),
+        help=_get_help(Settings.skip_noop_forget),
+    )
+    tag: list[str] | None = option(
+        default=_get_default(Settings.tag_forget), help=_get_help(Settings.tag_forget)
+    )
+    cache_dir: str = option(
+        default=_get_default(Settings.cache_dir), help=_get_help(Settings.cache_dir)
+    )
+    index_max_age: int | None = option(
+        default=_get_default(Settings.index_max_age),
+        help=_get_help(Settings.index_max_age),
+    )
+    metrics: str | None = option(
+        default=_get_default(Settings.metrics), help=_get_help(Settings.metrics)
+    )
+    trace: str | None = option(
+        default=_get_default(Settings.trace), help=_get_help(Settings.trace)
+    )
+    retries: int = option(
+        default=_get_default(Settings.retries), help=_get_help(Settings.retries)
+    )
+
+
+@settings(kw_only=True)
+class PruneSettings:
+    password: Secret[str] = secret(
+        default=_get_default(Settings.password), help=_get_help(Settings.password)
+    )
+    dry_run: bool = option(
+        default=_get_default(Settings.dry_run), help=_get_help(Settings.dry_run)
+    )
+    max_unused: str | None = option(
+        default=_get_default(Settings.max_unused), help=_get_help(Settings.max_unused)
+    )
+    max_repack_size: str | None = option(
+        default=_get_default(Settings.max_repack_size),
+        help=_get_help(Settings.max_repack_size),
+    )
+    min_reclaim: str | None = option(
+        default=_get_default(Settings.min_reclaim), help=_get_help(Settings.min_reclaim)
+    )
+    min_unused_pct: float | None = option(
+        default=_get_default(Settings.min_unused_pct),
+        help=_get_help(Settings.min_unused_pct),
     )
-    prune: bool = option(default=SETTINGS.prune, help=_get_help(Settings.prune))
     repack_cacheable_only: bool = option(
-        default=SETTINGS.repack_cacheable_only,
+        default=_get_default(Settings.repack_cacheable_only),
         help=_get_help(Settings.repack_cacheable_only),
     )
     repack_small: bool = option(
-        default=SETTINGS.repack_small, help=_get_help(Settings.repack_small)
+        default=_get_default(Settings.repack_small),
+        help=_get_help(Settings.repack_small),
     )
     repack_uncompressed: bool = option(
-        default=SETTINGS.repack_uncompressed,
+        default=_get_default(Settings.repack_uncompressed),
         help=_get_help(Settings.repack_uncompressed),
     )
+    cache_dir: str = option(
+        default=_get_default(Settings.cache_dir), help=_get_help(Settings.cache_dir)
+    )
+    metrics: str | None = option(
+        default=_get_default(Settings.metrics), help=_get_help(Settings.metrics)
+    )
+    trace: str | None = option(
+        default=_get_default(Settings.trace), help=_get_help(Settings.trace)
+    )
+    metrics_port: int | None = option(
+        default=_get_default(Settings.metrics_port),
+        help=_get_help(Settings.metrics_port),
+    )
+    metrics_addr: str = option(
+        default=_get_default(Settings.metrics_addr),
+        help=_get_help(Settings.metrics_addr),
+    )
+    retries: int = option(
+        default=_get_default(Settings.retries), help=_get_help(Settings.retries)
+    )
+    sleep: int | None = option(
+        default=_get_default(Settings.sleep), help=_get_help(Settings.sleep)
+    )
+    schedule: str | None = option(
+        default=_get_default(Settings.schedule), help=_get_help(Settings.schedule)
+    )
+    jitter: int = option(
+        default=_get_default(Settings.jitter), help=_get_help(Settings.jitter)
+    )
+    catch_up: bool = option(
+        default=_get_default(Settings.catch_up), help=_get_help(Settings.catch_up)
+    )
+
+
+@settings(kw_only=True)
+class QuerySettings:
+    password: Secret[str] = secret(
+        default=_get_default(Settings.password), help=_get_help(Settings.password)
+    )
+    cache_dir: str = option(
+        default=_get_default(Settings.cache_dir), help=_get_help(Settings.cache_dir)
+    )
+    index_max_age: int | None = option(
+        default=_get_default(Settings.index_max_age),
+        help=_get_help(Settings.index_max_age),
+    )
+    host: str | None = option(
+        default=_get_default(Settings.host_query), help=_get_help(Settings.host_query)
+    )
+    path: str | None = option(
+        default=_get_default(Settings.path_query), help=_get_help(Settings.path_query)
+    )
     tag: list[str] | None = option(
-        default=SETTINGS.tag_forget, help=_get_help(Settings.tag_forget)
+        default=_get_default(Settings.tag_query), help=_get_help(Settings.tag_query)
+    )
+    since: str | None = option(
+        default=_get_default(Settings.since_query), help=_get_help(Settings.since_query)
+    )
+    until: str | None = option(
+        default=_get_default(Settings.until_query), help=_get_help(Settings.until_query)
+    )
+    latest: int | None = option(
+        default=_get_default(Settings.latest_query),
+        help=_get_help(Settings.latest_query),
     )
 
 
 @settings(kw_only=True)
 class RestoreSettings:
     password: Secret[str] = secret(
-        default=SETTINGS.password, help=_get_help(Settings.password)
+        default=_get_default(Settings.password), help=_get_help(Settings.password)
+    )
+    delete: bool = option(
+        default=_get_default(Settings.delete), help=_get_help(Settings.delete)
+    )
+    dry_run: bool = option(
+        default=_get_default(Settings.dry_run), help=_get_help(Settings.dry_run)
     )
-    delete: bool = option(default=SETTINGS.delete, help=_get_help(Settings.delete))
-    dry_run: bool = option(default=SETTINGS.dry_run, help=_get_help(Settings.dry_run))
     exclude: list[str] | None = option(
-        default=SETTINGS.exclude_restore, help=_get_help(Settings.exclude_restore)
+        default=_get_default(Settings.exclude_restore),
+        help=_get_help(Settings.exclude_restore),
     )
     exclude_i: list[str] | None = option(
-        default=SETTINGS.exclude_i_restore, help=_get_help(Settings.exclude_i_restore)
+        default=_get_default(Settings.exclude_i_restore),
+        help=_get_help(Settings.exclude_i_restore),
     )
     include: list[str] | None = option(
-        default=SETTINGS.include_restore, help=_get_help(Settings.include_restore)
+        default=_get_default(Settings.include_restore),
+        help=_get_help(Settings.include_restore),
     )
     include_i: list[str] | None = option(
-        default=SETTINGS.include_i_restore, help=_get_help(Settings.include_i_restore)
+        default=_get_default(Settings.include_i_restore),
+        help=_get_help(Settings.include_i_restore),
+    )
+    progress: bool = option(
+        default=_get_default(Settings.progress), help=_get_help(Settings.progress)
+    )
+    progress_interval: int = option(
+        default=_get_default(Settings.progress_interval),
+        help=_get_help(Settings.progress_interval),
+        validator=gt(0),
+    )
+    shards: int | None = option(
+        default=_get_default(Settings.restore_shards),
+        help=_get_help(Settings.restore_shards),
+    )
+    workers: int | None = option(
+        default=_get_default(Settings.restore_workers),
+        help=_get_help(Settings.restore_workers),
+    )
+    verify: Literal["none", "sample", "full"] | None = option(
+        default=None,
+        help=f"{_get_help(Settings.verify_restore)} (defaults to VERIFY_RESTORE)",
+    )
+    verify_fraction: float = option(
+        default=_get_default(Settings.verify_fraction),
+        help=_get_help(Settings.verify_fraction),
+    )
+    verify_workers: int | None = option(
+        default=_get_default(Settings.verify_workers),
+        help=_get_help(Settings.verify_workers),
     )
     tag: list[str] | None = option(
-        default=SETTINGS.tag_restore, help=_get_help(Settings.tag_restore)
+        default=_get_default(Settings.tag_restore), help=_get_help(Settings.tag_restore)
+    )
+    snapshot: str = option(
+        default=_get_default(Settings.snapshot), help=_get_help(Settings.snapshot)
+    )
+    metrics: str | None = option(
+        default=_get_default(Settings.metrics), help=_get_help(Settings.metrics)
+    )
+    trace: str | None = option(
+        default=_get_default(Settings.trace), help=_get_help(Settings.trace)
+    )
+
+
+@settings(kw_only=True)
+class RunSettings:
+    workers: int | None = option(
+        default=_get_default(Settings.run_workers), help=_get_help(Settings.run_workers)
+    )
+    report: str | None = option(
+        default=_get_default(Settings.run_report), help=_get_help(Settings.run_report)
+    )
+    trace: str | None = option(
+        default=_get_default(Settings.trace), help=_get_help(Settings.trace)
     )
-    snapshot: str = option(default=SETTINGS.snapshot, help=_get_help(Settings.snapshot))
 
 
 @settings(kw_only=True)
 class SnapshotsSettings:
     password: Secret[str] = secret(
-        default=SETTINGS.password, help=_get_help(Settings.password)
+        default=_get_default(Settings.password), help=_get_help(Settings.password)
+    )
+
+
+@settings(kw_only=True)
+class WarmSettings:
+    password: Secret[str] = secret(
+        default=_get_default(Settings.password), help=_get_help(Settings.password)
+    )
+    restic_cache_dir: str | None = option(
+        default=_get_default(Settings.restic_cache_dir),
+        help=_get_help(Settings.restic_cache_dir),
+    )
+    max_cache_size: str | None = option(
+        default=_get_default(Settings.max_cache_size),
+        help=_get_help(Settings.max_cache_size),
     )
 
 
 __all__ = [
-    "LOADERS",
     "SETTINGS",
     "BackupSettings",
+    "BenchmarkSettings",
+    "CacheSettings",
+    "CompareSettings",
     "CopySettings",
     "ForgetSettings",
     "InitSettings",
+    "PruneSettings",
+    "QuerySettings",
     "RestoreSettings",
+    "RunSettings",
     "Settings",
     "SnapshotsSettings",
+    "WarmSettings",
+    "get_loaders",
+    "get_settings",
+    "resolve_settings",
 ]
@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+from heapq import heapify, heappop, heappush
+from posixpath import join
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+
+def get_unit_sizes(
+    nodes: Iterable[dict[str, Any]], roots: Iterable[str], /
+) -> dict[str, int]:
+    roots_use = sorted((r.rstrip("/") or "/" for r in roots), key=len, reverse=True)
+    sizes: dict[str, int] = {}
+    for node in nodes:
+        path: str = node["path"]
+        for root in roots_use:
+            if path == root:
+                if node.get("type") != "dir":
+                    sizes[path] = sizes.get(path, 0) + node.get("size", 0)
+                break
+            prefix = root if root.endswith("/") else f"{root}/"
+            if path.startswith(prefix):
+                unit = join(root, path[len(prefix) :].split("/", 1)[0])
+                sizes[unit] = sizes.get(unit, 0) + node.get("size", 0)
+                break
+    return sizes
+
+
+def plan_shards(sizes: dict[str, int], /, *, n: int) -> list[list[str]]:
+    if n <= 0:
+        msg = f"Number of shards must be positive; got {n}"
+        raise ValueError(msg)
+    n_use = min(n, len(sizes))
+    heap = [(0, i) for i in range(n_use)]
+    heapify(heap)
+    shards: list[list[str]] = [[] for _ in range(n_use)]
+    for unit, size in sorted(sizes.items(), key=lambda x: (-x[1], x[0])):
+        total, i = heappop(heap)
+        shards[i].append(unit)
+        heappush(heap, (total + size, i))
+    return [sorted(s) for s in shards]
+
+
+__all__ = ["get_unit_sizes", "plan_shards"]
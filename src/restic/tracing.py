@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import wraps
+from pathlib import Path
+from subprocess import CalledProcessError
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator, Sequence
+
+    from utilities.types import PathLike
+
+
+type Sink = Callable[[Span], None]
+
+
+_MAX_ARGV = 8
+_MAX_ARGV_CHARS = 200
+_MAX_EVENTS = 100_000
+_SINKS: list[Sink] = []
+_LOCAL = threading.local()
+
+
+@dataclass(kw_only=True, slots=True)
+class Span:
+    name: str
+    category: str = "phase"
+    start: int = 0
+    duration: int = 0
+    depth: int = 0
+    pid: int = 0
+    tid: int = 0
+    attrs: dict[str, Any] = field(default_factory=dict)
+
+
+class ChromeTraceSink:
+    def __init__(self, path: PathLike, /, *, max_events: int = _MAX_EVENTS) -> None:
+        super().__init__()
+        self.path = Path(path)
+        self._events: deque[dict[str, Any]] = deque(maxlen=max_events)
+        self._lock = threading.Lock()
+
+    def __call__(self, span: Span, /) -> None:
+        event = {
+            "name": span.name,
+            "cat": span.category,
+            "ph": "X",
+            "ts": span.start,
+            "dur": span.duration,
+            "pid": span.pid,
+            "tid": span.tid,
+            "args": {k: _jsonable(v) for k, v in span.attrs.items()},
+        }
+        with self._lock:
+            self._events.append(event)
+            if span.depth == 0:
+                self._flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp = self.path.with_name(f"{self.path.name}.tmp")
+        data = {"traceEvents": list(self._events), "displayTimeUnit": "ms"}
+        _ = temp.write_text(json.dumps(data))
+        _ = temp.replace(self.path)
+
+
+def add_sink(sink: Sink, /) -> None:
+    _SINKS.append(sink)
+
+
+def remove_sink(sink: Sink, /) -> None:
+    _SINKS.remove(sink)
+
+
+@contextmanager
+def span(
+    name: str, /, *, category: str = "phase", **attrs: Any
+) -> Iterator[dict[str, Any]]:
+    if len(_SINKS) == 0:
+        yield attrs
+        return
+    depth: int = getattr(_LOCAL, "depth", 0)
+    _LOCAL.depth = depth + 1
+    start = time.time_ns() // 1000
+    perf_start = time.perf_counter_ns()
+    try:
+        yield attrs
+    except BaseException as error:
+        _ = attrs.setdefault("error", repr(error))
+        raise
+    finally:
+        _LOCAL.depth = depth
+        span_ = Span(
+            name=name,
+            category=category,
+            start=start,
+            duration=(time.perf_counter_ns() - perf_start) // 1000,
+            depth=depth,
+            pid=os.getpid(),
+            tid=threading.get_ident(),
+            attrs=attrs,
+        )
+        for sink in _SINKS:
+            sink(span_)
+
+
+def summarize_argv(argv: Sequence[Any], /) -> str:
+    parts = [str(a) for a in argv[:_MAX_ARGV]]
+    if len(argv) > _MAX_ARGV:
+        parts.append(f"... (+{len(argv) - _MAX_ARGV})")
+    summary = " ".join(parts)
+    return (
+        summary
+        if len(summary) <= _MAX_ARGV_CHARS
+        else f"{summary[: _MAX_ARGV_CHARS - 3]}..."
+    )
+
+
+@contextmanager
+def trace_subprocess(argv: Sequence[Any], /, **attrs: Any) -> Iterator[dict[str, Any]]:
+    with span(
+        str(argv[0]) if len(argv) >= 1 else "subprocess",
+        category="subprocess",
+        argv=summarize_argv(argv),
+        **attrs,
+    ) as attrs_:
+        try:
+            yield attrs_
+        except CalledProcessError as error:
+            attrs_["exit_code"] = error.returncode
+            raise
+        _ = attrs_.setdefault("exit_code", 0)
+
+
+def traced[**P, T](
+    name: str, /, *, category: str = "operation"
+) -> Callable[[Callable[P, T]], Callable[P, T]]:
+    def decorator(func: Callable[P, T], /) -> Callable[P, T]:
+        @wraps(func)
+        def wrapped(*args: P.args, **kwargs: P.kwargs) -> T:
+            with span(name, category=category, args=[_describe(a) for a in args]):
+                return func(*args, **kwargs)
+
+        return wrapped
+
+    return decorator
+
+
+def _describe(value: Any, /) -> Any:
+    if (repository := getattr(value, "repository", None)) is not None:
+        return repository
+    if isinstance(value, list | tuple):
+        return [_describe(v) for v in value]
+    return str(value)
+
+
+def _jsonable(value: Any, /) -> Any:
+    match value:
+        case bool() | int() | float() | str() | None:
+            return value
+        case list() | tuple():
+            return [_jsonable(v) for v in value]
+        case _:
+            return str(value)
+
+
+__all__ = [
+    "ChromeTraceSink",
+    "Sink",
+    "Span",
+    "add_sink",
+    "remove_sink",
+    "span",
+    "summarize_argv",
+    "trace_subprocess",
+    "traced",
+]
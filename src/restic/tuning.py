@@ -0,0 +1,261 @@
+from __future__ import annotations
+
+import datetime as dt
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from itertools import islice
+from pathlib import Path
+from random import Random
+from typing import TYPE_CHECKING, Any, Literal, Self
+
+from restic.logging import LOGGER
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+    from utilities.types import PathLike
+
+
+type DeviceKind = Literal["hdd", "ssd", "network", "unknown"]
+
+
+CANDIDATES = (1, 2, 4, 8, 16, 32)
+_DEFAULTS: dict[DeviceKind, int] = {"hdd": 2, "ssd": 8, "network": 8, "unknown": 4}
+_MIB = 1024 * 1024
+_NETWORK_FS = {
+    "9p",
+    "afs",
+    "ceph",
+    "cifs",
+    "fuse.sshfs",
+    "glusterfs",
+    "nfs",
+    "nfs4",
+    "smb3",
+    "smbfs",
+}
+_MAX_FILES = 10_000
+_READ_CAP = 8 * _MIB
+_TOLERANCE = 0.95
+_VERSION = 1
+
+
+@dataclass(frozen=True, kw_only=True, slots=True)
+class Device:
+    id: str
+    kind: DeviceKind
+    name: str | None = None
+
+
+@dataclass(kw_only=True, slots=True)
+class Calibration:
+    device: str
+    kind: DeviceKind
+    path: str
+    read_concurrency: int
+    throughput: dict[int, float] = field(default_factory=dict)
+    calibrated_at: str = ""
+    complete: bool = True
+
+    @classmethod
+    def parse(cls, data: dict[str, Any], /) -> Self:
+        return cls(
+            device=data["device"],
+            kind=data["kind"],
+            path=data["path"],
+            read_concurrency=data["read_concurrency"],
+            throughput={int(k): v for k, v in data.get("throughput", {}).items()},
+            calibrated_at=data.get("calibrated_at", ""),
+        )
+
+
+def calibrate(
+    path: PathLike,
+    /,
+    *,
+    candidates: Iterable[int] = CANDIDATES,
+    probe_bytes: int = 64 * _MIB,
+    seed: int = 0,
+) -> Calibration:
+    device = get_device(path)
+    candidates = list(candidates)
+    files = list(islice(_yield_files(Path(path)), _MAX_FILES))
+    Random(seed).shuffle(files)
+    remaining = iter(files)
+    throughput: dict[int, float] = {}
+    for n in candidates:
+        batch = _take(remaining, probe_bytes)
+        if len(batch) == 0:
+            break
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=n) as pool:
+            read = sum(pool.map(_read_file, batch))
+        throughput[n] = read / max(time.perf_counter() - start, 1e-9)
+    complete = len(throughput) == len(candidates)
+    if not complete:
+        best = _DEFAULTS[device.kind]
+        LOGGER.info(
+            "Too few files under '%s' to measure %d candidate(s); using the %s default",
+            path,
+            len(candidates),
+            device.kind,
+        )
+    else:
+        target = _TOLERANCE * max(throughput.values())
+        best = min(n for n, t in throughput.items() if t >= target)
+    LOGGER.info(
+        "Calibrated '%s' (%s device %s); read_concurrency=%d",
+        path,
+        device.kind,
+        device.name or device.id,
+        best,
+    )
+    return Calibration(
+        device=device.id,
+        kind=device.kind,
+        path=str(path),
+        read_concurrency=best,
+        throughput=throughput,
+        calibrated_at=dt.datetime.now(dt.UTC).isoformat(),
+        complete=complete,
+    )
+
+
+def get_device(path: PathLike, /) -> Device:
+    st_dev = Path(path).stat().st_dev
+    id_ = f"{os.major(st_dev)}:{os.minor(st_dev)}"
+    if _get_fs_type(path) in _NETWORK_FS:
+        return Device(id=id_, kind="network")
+    sys_path = Path("/sys/dev/block", id_)
+    if not sys_path.exists():
+        return Device(id=id_, kind="unknown")
+    block = sys_path.resolve()
+    if block.joinpath("partition").exists():
+        block = block.parent
+    try:
+        rotational = block.joinpath("queue", "rotational").read_text().strip()
+    except FileNotFoundError:
+        return Device(id=id_, kind="unknown", name=block.name)
+    return Device(id=id_, kind="hdd" if rotational == "1" else "ssd", name=block.name)
+
+
+def resolve_read_concurrency(
+    paths: Iterable[PathLike], /, *, cache_dir: PathLike, recalibrate: bool = False
+) -> int:
+    cache = Path(cache_dir, "tuning.json")
+    calibrations = _read_cache(cache)
+    chosen: dict[str, int] = {}
+    for path in paths:
+        device = get_device(path).id
+        if device in chosen:
+            continue
+        if recalibrate or (device not in calibrations):
+            calibration = calibrate(path)
+            if calibration.complete:
+                calibrations[device] = calibration
+                _write_cache(cache, calibrations)
+        else:
+            calibration = calibrations[device]
+        chosen[device] = calibration.read_concurrency
+    return min(chosen.values())
+
+
+def _get_fs_type(path: PathLike, /) -> str | None:
+    try:
+        lines = Path("/proc/mounts").read_text().splitlines()
+    except FileNotFoundError:
+        return None
+    resolved = Path(path).resolve()
+    best: tuple[int, str] | None = None
+    for line in lines:
+        _, mount, fs_type, *_ = line.split()
+        mount_path = Path(mount.replace("\\040", " "))
+        if resolved.is_relative_to(mount_path) and (
+            (best is None) or (len(mount_path.parts) >= best[0])
+        ):
+            best = len(mount_path.parts), fs_type
+    return None if best is None else best[1]
+
+
+def _read_cache(path: Path, /) -> dict[str, Calibration]:
+    try:
+        data = json.loads(path.read_text())
+    except FileNotFoundError:
+        return {}
+    except json.JSONDecodeError:
+        LOGGER.warning("Ignoring corrupt tuning cache '%s'", path)
+        return {}
+    if data.get("version") != _VERSION:
+        return {}
+    return {k: Calibration.parse(v) for k, v in data["devices"].items()}
+
+
+def _read_file(path: Path, /) -> int:
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return 0
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        read = 0
+        while (read < _READ_CAP) and (chunk := os.read(fd, _MIB)):
+            read += len(chunk)
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        return read
+    finally:
+        os.close(fd)
+
+
+def _take(files: Iterator[tuple[Path, int]], budget: int, /) -> list[Path]:
+    batch: list[Path] = []
+    total = 0
+    for path, size in files:
+        batch.append(path)
+        total += min(size, _READ_CAP)
+        if total >= budget:
+            break
+    return batch
+
+
+def _write_cache(path: Path, calibrations: dict[str, Calibration], /) -> None:
+    data = {
+        "version": _VERSION,
+        "devices": {k: asdict(v) for k, v in calibrations.items()},
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp = path.with_name(f"{path.name}.tmp")
+    _ = temp.write_text(json.dumps(data))
+    _ = temp.replace(path)
+
+
+def _yield_files(root: Path, /) -> Iterator[tuple[Path, int]]:
+    if root.is_file():
+        yield root, root.stat().st_size
+        return
+    stack = [root]
+    while len(stack) >= 1:
+        try:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(Path(entry.path))
+                    elif entry.is_file(follow_symlinks=False):
+                        size = entry.stat(follow_symlinks=False).st_size
+                        if size > 0:
+                            yield Path(entry.path), size
+        except PermissionError:
+            continue
+
+
+__all__ = [
+    "CANDIDATES",
+    "Calibration",
+    "Device",
+    "DeviceKind",
+    "calibrate",
+    "get_device",
+    "resolve_read_concurrency",
+]
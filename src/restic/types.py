@@ -1,9 +1,12 @@
 from __future__ import annotations
 
+from typing import Literal
+
 from typed_settings import Secret
 from utilities.types import PathLike
 
 type PasswordLike = Secret[str] | PathLike
 type SecretLike = Secret[str] | str
+type VerifyMode = Literal["none", "sample", "full"]
 
-__all__ = ["PasswordLike", "SecretLike"]
+__all__ = ["PasswordLike", "SecretLike", "VerifyMode"]
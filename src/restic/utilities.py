@@ -1,16 +1,18 @@
 from __future__ import annotations
 
+import datetime as dt
+from collections.abc import Sequence
 from contextlib import contextmanager
 from itertools import chain
 from pathlib import Path
-from typing import TYPE_CHECKING, Literal, assert_never
+from re import IGNORECASE, fullmatch
+from typing import TYPE_CHECKING, assert_never
 
 from typed_settings import Secret
 from utilities.os import temp_environ
-from utilities.subprocess import run
 from utilities.tempfile import TemporaryFile
 
-from restic.settings import SETTINGS
+from restic.settings import SETTINGS, resolve_settings
 
 if TYPE_CHECKING:
     from collections.abc import Iterator
@@ -20,6 +22,13 @@ if TYPE_CHECKING:
     from restic.types import PasswordLike
 
 
+_SIZE_UNITS = ["B", "KiB", "MiB", "GiB", "TiB", "PiB"]
+
+
+def describe_paths(paths: Sequence[PathLike], /) -> str:
+    return ", ".join(f"'{p}'" for p in paths)
+
+
 def expand_bool(flag: str, /, *, bool_: bool = False) -> list[str]:
     return [f"--{flag}"] if bool_ else []
 
@@ -52,18 +61,92 @@ def expand_keep_within(freq: str, /, *, duration: str | None = None) -> list[str
     return [] if duration is None else [f"--keep-{freq}", duration]
 
 
+def expand_limit(direction: str, /, *, value: int | None = None) -> list[str]:
+    return [] if value is None else [f"--limit-{direction}", str(value)]
+
+
+def expand_max(kind: str, /, *, value: str | None = None) -> list[str]:
+    return [] if value is None else [f"--max-{kind}", value]
+
+
 def expand_tag(*, tag: list[str] | None = None) -> list[str]:
     return _expand_list("tag", arg=tag)
 
 
-def run_chmod(path: PathLike, type_: Literal["f", "d"], mode: str, /) -> None:
-    run("sudo", "find", str(path), "-type", type_, "-exec", "chmod", mode, "{}", "+")
+def format_size(n: int, /) -> str:
+    size = float(n)
+    for unit in _SIZE_UNITS[:-1]:
+        if abs(size) < 1024:
+            return f"{n} B" if unit == "B" else f"{size:.3f} {unit}"
+        size /= 1024
+    return f"{size:.3f} {_SIZE_UNITS[-1]}"
+
+
+def group_paths(
+    paths: list[PathLike], /, *, n: int | None = None
+) -> list[list[PathLike]]:
+    if n is None:
+        return [paths]
+    if n <= 0:
+        msg = f"Number of groups must be positive; got {n}"
+        raise ValueError(msg)
+    n_use = min(n, len(paths))
+    size, rem = divmod(len(paths), n_use)
+    groups: list[list[PathLike]] = []
+    start = 0
+    for i in range(n_use):
+        end = start + size + (1 if i < rem else 0)
+        groups.append(paths[start:end])
+        start = end
+    return groups
+
+
+def parse_datetime(text: str, /) -> dt.datetime:
+    return dt.datetime.fromisoformat(text).astimezone()
+
+
+def parse_size(text: str, /) -> int:
+    match = fullmatch(
+        r"\s*(\d+(?:\.\d+)?)\s*([KMGTP]?)(?:i?B)?\s*", text, flags=IGNORECASE
+    )
+    if match is None:
+        msg = f"Invalid size {text!r}; expected e.g. '512 MiB' or '10G'"
+        raise ValueError(msg)
+    value, prefix = match.groups()
+    power = 0 if prefix == "" else "KMGTP".index(prefix.upper()) + 1
+    return round(float(value) * 1024**power)
+
+
+def to_paths(path: PathLike | Sequence[PathLike], /) -> list[PathLike]:
+    match path:
+        case Path() | str():
+            return [path]
+        case Sequence():
+            if len(path) == 0:
+                msg = "At least one path is required"
+                raise ValueError(msg)
+            return list(path)
+        case never:
+            assert_never(never)
 
 
 @contextmanager
+@resolve_settings
 def yield_password(
     *, password: PasswordLike = SETTINGS.password, env_var: str = "RESTIC_PASSWORD_FILE"
 ) -> Iterator[None]:
+    with (
+        yield_password_env(password=password, env_var=env_var) as env,
+        temp_environ(env),
+    ):
+        yield
+
+
+@contextmanager
+@resolve_settings
+def yield_password_env(
+    *, password: PasswordLike = SETTINGS.password, env_var: str = "RESTIC_PASSWORD_FILE"
+) -> Iterator[dict[str, str]]:
     match password:
         case Secret():
             value = password.get_secret_value()
@@ -74,19 +157,17 @@ def yield_password(
     match value:
         case Path():
             if value.is_file():
-                with temp_environ({env_var: str(value)}):
-                    yield
+                yield {env_var: str(value)}
             else:
                 msg = f"Password file not found: '{value!s}'"
                 raise FileNotFoundError(msg)
         case str():
             if Path(value).is_file():
-                with temp_environ({env_var: value}):
-                    yield
+                yield {env_var: value}
             else:
-                with TemporaryFile() as temp, temp_environ({env_var: str(temp)}):
+                with TemporaryFile() as temp:
                     _ = temp.write_text(value)
-                    yield
+                    yield {env_var: str(temp)}
         case never:
             assert_never(never)
 
@@ -98,6 +179,7 @@ def _expand_list(flag: str, /, *, arg: list[str] | None = None) -> list[str]:
 
 
 __all__ = [
+    "describe_paths",
     "expand_bool",
     "expand_dry_run",
     "expand_exclude",
@@ -106,7 +188,14 @@ __all__ = [
     "expand_include_i",
     "expand_keep",
     "expand_keep_within",
+    "expand_limit",
+    "expand_max",
     "expand_tag",
-    "run_chmod",
+    "format_size",
+    "group_paths",
+    "parse_datetime",
+    "parse_size",
+    "to_paths",
     "yield_password",
+    "yield_password_env",
 ]
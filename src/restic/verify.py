@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha256
+from mmap import ACCESS_READ, mmap
+from pathlib import Path
+from re import sub
+from subprocess import PIPE, CalledProcessError, Popen
+from tempfile import TemporaryDirectory
+from typing import TYPE_CHECKING, Any, cast
+
+from restic.logging import LOGGER
+from restic.progress import stream_json
+from restic.tracing import trace_subprocess
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping, Sequence
+    from typing import IO
+
+    from utilities.types import PathLike
+
+
+_BATCH_SIZE = 1000
+_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path: PathLike, /) -> str:
+    digest = sha256()
+    with Path(path).open("rb") as fh:
+        if Path(path).stat().st_size > 0:
+            with mmap(fh.fileno(), 0, access=ACCESS_READ) as mapped:
+                digest.update(mapped)
+    return digest.hexdigest()
+
+
+def hash_snapshot_file(
+    snapshot: str,
+    path: str,
+    /,
+    *,
+    env: Mapping[str, str] | None = None,
+    options: Sequence[str] = (),
+) -> str:
+    digest = sha256()
+    args = ["restic", "dump", "--no-lock", *options, snapshot, path]
+    env_use = None if env is None else {**os.environ, **env}
+    with (
+        trace_subprocess(args, path=path),
+        Popen(args, stdout=PIPE, env=env_use) as process,
+    ):
+        stdout = cast("IO[bytes]", process.stdout)
+        while chunk := stdout.read(_CHUNK_SIZE):
+            digest.update(chunk)
+        return_code = process.wait()
+        if return_code != 0:
+            raise CalledProcessError(return_code, args)
+    return digest.hexdigest()
+
+
+def sample_files(
+    nodes: list[dict[str, Any]], /, *, fraction: float, seed: int | None = None
+) -> list[dict[str, Any]]:
+    if not (0.0 <= fraction <= 1.0):
+        msg = f"Verification fraction must be between 0 and 1; got {fraction}"
+        raise ValueError(msg)
+    files = [n for n in nodes if n.get("type") == "file"]
+    k = min(max(round(fraction * len(files)), 1 if fraction > 0 else 0), len(files))
+    return random.Random(seed).sample(files, k)
+
+
+def verify_files(
+    snapshot: str,
+    nodes: list[dict[str, Any]],
+    target: PathLike,
+    /,
+    *,
+    env: Mapping[str, str] | None = None,
+    options: Sequence[str] = (),
+    workers: int | None = None,
+    batch_size: int = _BATCH_SIZE,
+) -> list[str]:
+    batched = [n for n in nodes if _is_batchable(n["path"])]
+    single = [n for n in nodes if not _is_batchable(n["path"])]
+    failures: list[str] = []
+    for i in range(0, len(batched), batch_size):
+        failures.extend(
+            _verify_batch(
+                snapshot,
+                batched[i : i + batch_size],
+                target,
+                env=env,
+                options=options,
+                workers=workers,
+            )
+        )
+    failures.extend(
+        _verify_single(
+            snapshot, single, target, env=env, options=options, workers=workers
+        )
+    )
+    for path in failures:
+        LOGGER.error("Verification failed for '%s'", path)
+    return sorted(failures)
+
+
+def _compare(node: dict[str, Any], restored: Path, expected: Path, /) -> bool:
+    try:
+        if restored.stat().st_size != node.get("size", 0):
+            return False
+        return hash_file(restored) == hash_file(expected)
+    except FileNotFoundError:
+        return False
+
+
+def _escape(path: str, /) -> str:
+    return sub(r"([\\*?\[])", r"\\\1", path)
+
+
+def _is_batchable(path: str, /) -> bool:
+    # restic expands $VARs and strips whitespace in pattern files
+    return ("$" not in path) and ("\n" not in path) and (path == path.strip())
+
+
+def _verify_batch(
+    snapshot: str,
+    nodes: list[dict[str, Any]],
+    target: PathLike,
+    /,
+    *,
+    env: Mapping[str, str] | None = None,
+    options: Sequence[str] = (),
+    workers: int | None = None,
+) -> list[str]:
+    paths = [n["path"] for n in nodes]
+    with TemporaryDirectory(
+        prefix=".restic-verify-", dir=Path(target).resolve().parent
+    ) as temp:
+        include = Path(temp, "include.txt")
+        _ = include.write_text("".join(f"{_escape(p)}\n" for p in paths))
+        expected = Path(temp, "files")
+        try:
+            for _ in stream_json(
+                "restic",
+                "--json",
+                "restore",
+                "--no-lock",
+                *options,
+                "--include-file",
+                str(include),
+                "--target",
+                str(expected),
+                snapshot,
+                env=env,
+            ):
+                ...
+        except CalledProcessError as error:
+            LOGGER.error(
+                "Failed to restore %d sampled file(s) for verification: %s",
+                len(paths),
+                error,
+            )
+            return paths
+
+        def verify_one(node: dict[str, Any], /) -> str | None:
+            path: str = node["path"]
+            relative = path.lstrip("/")
+            ok = _compare(node, Path(target, relative), Path(expected, relative))
+            return None if ok else path
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return [p for p in pool.map(verify_one, nodes) if p is not None]
+
+
+def _verify_single(
+    snapshot: str,
+    nodes: list[dict[str, Any]],
+    target: PathLike,
+    /,
+    *,
+    env: Mapping[str, str] | None = None,
+    options: Sequence[str] = (),
+    workers: int | None = None,
+) -> list[str]:
+    def verify_one(node: dict[str, Any], /) -> str | None:
+        path: str = node["path"]
+        restored = Path(target, path.lstrip("/"))
+        try:
+            if restored.stat().st_size != node.get("size", 0):
+                return path
+            local = hash_file(restored)
+            digest = hash_snapshot_file(snapshot, path, env=env, options=options)
+        except FileNotFoundError:
+            return path
+        except CalledProcessError as error:
+            LOGGER.error("Failed to dump '%s' for verification: %s", path, error)
+            return path
+        return None if digest == local else path
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return [p for p in pool.map(verify_one, nodes) if p is not None]
+
+
+__all__ = ["hash_file", "hash_snapshot_file", "sample_files", "verify_files"]
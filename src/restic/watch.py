@@ -0,0 +1,286 @@
+from __future__ import annotations
+
+import ctypes
+import os
+import struct
+import time
+from ctypes.util import find_library
+from dataclasses import dataclass, field
+from errno import EACCES, ENOENT, ENOSPC
+from fnmatch import fnmatchcase
+from pathlib import Path
+from select import select
+from signal import SIGINT, SIGTERM, signal
+from threading import Event
+from typing import TYPE_CHECKING, Self
+
+from restic.logging import LOGGER
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable
+    from types import TracebackType
+
+    from utilities.types import PathLike
+
+
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_DONT_FOLLOW = 0x02000000
+_IN_EXCL_UNLINK = 0x04000000
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_FILE_MASK = (
+    _IN_MODIFY
+    | _IN_ATTRIB
+    | _IN_CLOSE_WRITE
+    | _IN_DELETE_SELF
+    | _IN_MOVE_SELF
+    | _IN_DONT_FOLLOW
+)
+_DIR_MASK = (
+    _FILE_MASK
+    | _IN_MOVED_FROM
+    | _IN_MOVED_TO
+    | _IN_CREATE
+    | _IN_DELETE
+    | _IN_ONLYDIR
+    | _IN_EXCL_UNLINK
+)
+_EVENT = struct.Struct("iIII")
+_MAX_WAIT = 1.0
+_READ_SIZE = 64 * 1024
+
+
+@dataclass(kw_only=True, slots=True)
+class Debouncer:
+    debounce: float
+    min_interval: float
+    max_interval: float
+    dirty: set[str] = field(default_factory=set)
+    first_change: float | None = None
+    last_change: float | None = None
+    last_run: float | None = None
+
+    def record(self, paths: Iterable[str], /, *, now: float) -> None:
+        paths = list(paths)
+        if len(paths) == 0:
+            return
+        self.dirty.update(paths)
+        if self.first_change is None:
+            self.first_change = now
+        self.last_change = now
+
+    def due(self, *, now: float) -> bool:
+        wait = self.wait_time(now=now)
+        return (wait is not None) and (wait <= 0)
+
+    def wait_time(self, *, now: float) -> float | None:
+        if (self.first_change is None) or (self.last_change is None):
+            return None
+        at = min(
+            self.last_change + self.debounce, self.first_change + self.max_interval
+        )
+        if self.last_run is not None:
+            at = max(at, self.last_run + self.min_interval)
+        return at - now
+
+    def take(self, *, now: float) -> list[str]:
+        dirty = collapse_subtrees(self.dirty)
+        self.dirty.clear()
+        self.first_change = self.last_change = None
+        self.last_run = now
+        return dirty
+
+
+class Inotify:
+    def __init__(
+        self, *, exclude: list[str] | None = None, exclude_i: list[str] | None = None
+    ) -> None:
+        super().__init__()
+        self.exclude = exclude
+        self.exclude_i = exclude_i
+        self.roots: list[str] = []
+        self._libc = ctypes.CDLL(find_library("c") or "libc.so.6", use_errno=True)
+        fd = self._libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self.fd: int = fd
+        self._paths: dict[int, str] = {}
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        os.close(self.fd)
+
+    @property
+    def watches(self) -> int:
+        return len(self._paths)
+
+    def add_root(self, path: PathLike, /) -> None:
+        root = str(Path(path).absolute())
+        self.roots.append(root)
+        self.add_tree(root)
+
+    def add_tree(self, path: str, /) -> None:
+        if self._is_excluded(path):
+            return
+        if not Path(path).is_dir():
+            self._add_watch(path, _FILE_MASK)
+            return
+        stack = [path]
+        while len(stack) >= 1:
+            dir_ = stack.pop()
+            self._add_watch(dir_, _DIR_MASK)
+            try:
+                with os.scandir(dir_) as it:
+                    stack.extend(
+                        e.path
+                        for e in it
+                        if e.is_dir(follow_symlinks=False)
+                        and not self._is_excluded(e.path)
+                    )
+            except FileNotFoundError, PermissionError:
+                continue
+
+    def read(self, *, timeout: float) -> list[str]:
+        ready, _, _ = select([self.fd], [], [], timeout)
+        if len(ready) == 0:
+            return []
+        try:
+            data = os.read(self.fd, _READ_SIZE)
+        except BlockingIOError:
+            return []
+        changed: list[str] = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            start = offset + _EVENT.size
+            name = os.fsdecode(data[start : start + length].rstrip(b"\0"))
+            offset = start + length
+            if mask & _IN_Q_OVERFLOW:
+                LOGGER.warning("inotify queue overflowed; treating all paths as dirty")
+                changed.extend(self.roots)
+                continue
+            if mask & _IN_IGNORED:
+                _ = self._paths.pop(wd, None)
+                continue
+            if (base := self._paths.get(wd)) is None:
+                continue
+            path = str(Path(base, name))
+            if self._is_excluded(path):
+                continue
+            if (mask & _IN_ISDIR) and (mask & (_IN_CREATE | _IN_MOVED_TO)):
+                self.add_tree(path)
+            changed.append(base)
+        return changed
+
+    def _add_watch(self, path: str, mask: int, /) -> None:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd >= 0:
+            self._paths[wd] = path
+            return
+        errno = ctypes.get_errno()
+        if errno == ENOSPC:
+            LOGGER.warning(
+                "Not watching '%s'; raise 'fs.inotify.max_user_watches'", path
+            )
+        elif errno not in {EACCES, ENOENT}:
+            raise OSError(errno, os.strerror(errno), path)
+
+    def _is_excluded(self, path: str, /) -> bool:
+        return is_excluded(path, self.exclude or []) or is_excluded(
+            path, self.exclude_i or [], case_insensitive=True
+        )
+
+
+def collapse_subtrees(paths: Iterable[str], /) -> list[str]:
+    collapsed: list[str] = []
+    for path in sorted(set(paths)):
+        if not any(Path(path).is_relative_to(c) for c in collapsed):
+            collapsed.append(path)
+    return collapsed
+
+
+def is_excluded(
+    path: str, patterns: Iterable[str], /, *, case_insensitive: bool = False
+) -> bool:
+    parts = [p.lower() if case_insensitive else p for p in Path(path).parts[1:]]
+    for pattern in patterns:
+        anchored = pattern.startswith("/")
+        pattern_parts = [
+            p.lower() if case_insensitive else p for p in pattern.strip("/").split("/")
+        ]
+        starts = [0] if anchored else range(len(parts) - len(pattern_parts) + 1)
+        for i in starts:
+            window = parts[i : i + len(pattern_parts)]
+            if (len(window) == len(pattern_parts)) and all(
+                fnmatchcase(w, p) for w, p in zip(window, pattern_parts, strict=True)
+            ):
+                return True
+    return False
+
+
+def watch(
+    paths: Iterable[PathLike],
+    func: Callable[[], object],
+    /,
+    *,
+    exclude: list[str] | None = None,
+    exclude_i: list[str] | None = None,
+    debounce: float = 30,
+    min_interval: float = 300,
+    max_interval: float = 3600,
+    stop: Event | None = None,
+) -> None:
+    if stop is None:
+        stop = Event()
+        for signum in [SIGINT, SIGTERM]:
+            _ = signal(signum, lambda *_: stop.set())
+    debouncer = Debouncer(
+        debounce=debounce, min_interval=min_interval, max_interval=max_interval
+    )
+    with Inotify(exclude=exclude, exclude_i=exclude_i) as inotify:
+        for path in paths:
+            inotify.add_root(path)
+        LOGGER.info("Watching %d path(s) for changes...", inotify.watches)
+        _run(func)
+        debouncer.last_run = time.monotonic()
+        while not stop.is_set():
+            wait = debouncer.wait_time(now=time.monotonic())
+            timeout = _MAX_WAIT if wait is None else min(max(wait, 0.0), _MAX_WAIT)
+            changed = inotify.read(timeout=timeout)
+            now = time.monotonic()
+            debouncer.record(changed, now=now)
+            if debouncer.due(now=now):
+                dirty = debouncer.take(now=now)
+                LOGGER.info("Changes settled in %s", ", ".join(map(repr, dirty)))
+                _run(func)
+    LOGGER.info("Stopped watching")
+
+
+def _run(func: Callable[[], object], /) -> None:
+    try:
+        _ = func()
+    except Exception:  # noqa: BLE001
+        LOGGER.exception("Run failed")
+
+
+__all__ = ["Debouncer", "Inotify", "collapse_subtrees", "is_excluded", "watch"]
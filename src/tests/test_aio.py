@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import asyncio
+import sys
+import time
+from subprocess import CalledProcessError
+from typing import TYPE_CHECKING
+
+from pytest import raises
+
+from restic.aio import astream_json
+
+if TYPE_CHECKING:
+    from restic.progress import Message
+
+
+async def _collect(cmd: str, /, *args: str, **kwargs: str) -> list[Message]:
+    return [m async for m in astream_json(cmd, *args, env=kwargs)]
+
+
+class TestAStreamJSON:
+    def test_main(self) -> None:
+        code = "import os; print('{\"a\": 1}'); print(); print(os.environ['FOO'])"
+        result = asyncio.run(_collect(sys.executable, "-c", code, FOO="foo"))
+        assert result == [{"a": 1}, "foo"]
+
+    def test_error(self) -> None:
+        code = "import sys; sys.stderr.write('bad'); sys.exit(3)"
+        with raises(CalledProcessError) as exc_info:
+            _ = asyncio.run(_collect(sys.executable, "-c", code))
+        assert exc_info.value.returncode == 3
+        assert exc_info.value.stderr == "bad"
+
+    def test_timeout(self) -> None:
+        async def main() -> None:
+            async with asyncio.timeout(0.5):
+                _ = await _collect(sys.executable, "-c", "import time; time.sleep(30)")
+
+        start = time.perf_counter()
+        with raises(TimeoutError):
+            asyncio.run(main())
+        assert time.perf_counter() - start < 10
+
+    def test_concurrent(self) -> None:
+        code = "import time; time.sleep(0.5); print('[1]')"
+
+        async def main() -> list[list[Message]]:
+            return await asyncio.gather(*[
+                _collect(sys.executable, "-c", code) for _ in range(10)
+            ])
+
+        start = time.perf_counter()
+        assert asyncio.run(main()) == [[[1]]] * 10
+        assert time.perf_counter() - start < 5
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import sys
+from subprocess import check_output
+from typing import TYPE_CHECKING
+
+from pytest import mark, param, raises
+
+from restic.benchmark import (
+    BenchmarkResult,
+    compare_reports,
+    make_dataset,
+    measure_startup,
+)
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+_STARTUP_BUDGET = 1.0  # seconds
+_STARTUP_RATIO = 3.0  # relative to importing the CLI's own dependencies
+
+
+class TestCompareReports:
+    def test_main(self) -> None:
+        old = [
+            BenchmarkResult(dataset="tiny", operation="backup", seconds=[1.0, 2.0]),
+            BenchmarkResult(dataset="tiny", operation="restore", seconds=[1.0]),
+            BenchmarkResult(dataset="huge", operation="backup", seconds=[1.0]),
+        ]
+        new = [
+            BenchmarkResult(dataset="tiny", operation="backup", seconds=[1.05]),
+            BenchmarkResult(dataset="tiny", operation="restore", seconds=[1.5]),
+            BenchmarkResult(dataset="deep", operation="backup", seconds=[1.0]),
+        ]
+        comparisons = compare_reports(old, new, threshold=0.1)
+        assert [(c.key, c.regressed) for c in comparisons] == [
+            ("tiny/backup[]", False),
+            ("tiny/restore[]", True),
+        ]
+        assert comparisons[1].ratio == 1.5
+
+    def test_params(self) -> None:
+        old = [
+            BenchmarkResult(
+                dataset="tiny",
+                operation="backup",
+                params={"read_concurrency": 2},
+                seconds=[1.0],
+            )
+        ]
+        new = [
+            BenchmarkResult(
+                dataset="tiny",
+                operation="backup",
+                params={"read_concurrency": 4},
+                seconds=[9.0],
+            )
+        ]
+        assert compare_reports(old, new) == []
+
+
+class TestMakeDataset:
+    @mark.parametrize(
+        "name", [param("deep"), param("duplicate"), param("huge"), param("tiny")]
+    )
+    def test_main(self, *, name: str, tmp_path: Path) -> None:
+        make_dataset(name, tmp_path, scale=0.01)
+        assert any(p.is_file() for p in tmp_path.rglob("*"))
+
+    def test_error(self, *, tmp_path: Path) -> None:
+        with raises(ValueError, match=r"Invalid dataset 'invalid'"):
+            make_dataset("invalid", tmp_path)
+
+
+class TestMeasureStartup:
+    def test_budget(self) -> None:
+        deps = min(measure_startup("click, typed_settings, utilities.os", repeats=3))
+        cli = min(measure_startup("restic.cli", repeats=3))
+        assert cli <= _STARTUP_BUDGET
+        assert cli <= _STARTUP_RATIO * deps
+
+    def test_deferred_imports(self) -> None:
+        code = "import sys, restic.cli; print(' '.join(sorted(sys.modules)))"
+        modules = set(check_output([sys.executable, "-c", code], text=True).split())
+        assert modules.isdisjoint({
+            "restic.benchmark",
+            "restic.index",
+            "restic.lib",
+            "restic.watch",
+        })
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import os
+from typing import TYPE_CHECKING
+
+from restic.cache import evict_cache, get_cache_stats, read_stats, track_cache
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def _make_repo_cache(root: Path, id_: str, size: int, last_used: float, /) -> None:
+    path = root.joinpath(id_, "index")
+    path.mkdir(parents=True)
+    _ = path.joinpath("file").write_bytes(b"x" * size)
+    for p in [path.joinpath("file"), path, root.joinpath(id_)]:
+        os.utime(p, (last_used, last_used))
+
+
+class TestEvictCache:
+    def test_main(self, *, tmp_path: Path) -> None:
+        _make_repo_cache(tmp_path, "old", 100, 1.0)
+        _make_repo_cache(tmp_path, "mid", 100, 2.0)
+        _make_repo_cache(tmp_path, "new", 100, 3.0)
+        evicted = evict_cache(tmp_path, max_size=150)
+        assert [r.id for r in evicted] == ["old", "mid"]
+        stats = get_cache_stats(tmp_path)
+        assert [r.id for r in stats.repos] == ["new"]
+        assert stats.size == 100
+        assert stats.evictions == 2
+        assert stats.bytes_evicted == 200
+
+    def test_recently_read_file(self, *, tmp_path: Path) -> None:
+        _make_repo_cache(tmp_path, "old", 100, 1.0)
+        _make_repo_cache(tmp_path, "new", 100, 2.0)
+        os.utime(tmp_path.joinpath("old", "index", "file"), (3.0, 1.0))
+        evicted = evict_cache(tmp_path, max_size=150)
+        assert [r.id for r in evicted] == ["new"]
+
+    def test_under_cap(self, *, tmp_path: Path) -> None:
+        _make_repo_cache(tmp_path, "repo", 100, 1.0)
+        assert evict_cache(tmp_path, max_size=100) == []
+        assert read_stats(tmp_path).evictions == 0
+
+
+class TestTrackCache:
+    def test_main(self, *, tmp_path: Path) -> None:
+        _make_repo_cache(tmp_path, "repo", 10, 1.0)
+        with track_cache(tmp_path):
+            _ = tmp_path.joinpath("repo", "index", "new").write_bytes(b"x" * 5)
+        stats = read_stats(tmp_path)
+        assert (stats.runs, stats.hits, stats.misses) == (1, 1, 1)
+        assert stats.bytes_fetched == 5
+        assert stats.hit_ratio == 0.5
+
+    def test_empty(self, *, tmp_path: Path) -> None:
+        assert get_cache_stats(tmp_path.joinpath("missing")).hit_ratio is None
@@ -10,9 +10,19 @@ class TestCLI:
         [
             param("init", ["local:/tmp"]),
             param("backup", ["path", "local:/tmp"]),
+            param("backup", ["path1", "path2", "local:/tmp"]),
+            param("benchmark", []),
+            param("cache", []),
+            param("compare", [__file__, __file__]),
             param("copy", ["local:/tmp", "local:/tmp2"]),
+            param("copy", ["local:/tmp", "local:/tmp2", "local:/tmp3"]),
             param("forget", ["local:/tmp"]),
+            param("plan", ["local:/tmp"]),
+            param("prune", ["local:/tmp"]),
+            param("query", ["local:/tmp"]),
             param("restore", ["local:/tmp", "target"]),
+            param("run", [__file__]),
+            param("warm", ["local:/tmp"]),
         ],
     )
     def test_main(self, *, cmd: str, args: list[str]) -> None:
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from restic.fingerprint import (
+    fingerprint_tree,
+    get_manifest_key,
+    read_fingerprint,
+    write_fingerprint,
+)
+from restic.repo import Local
+
+
+class TestFingerprintTree:
+    def test_unchanged(self, *, tmp_path: Path) -> None:
+        tmp_path.joinpath("dir").mkdir()
+        _ = tmp_path.joinpath("dir", "file").write_text("data")
+        assert fingerprint_tree([tmp_path]) == fingerprint_tree([tmp_path])
+
+    def test_modified(self, *, tmp_path: Path) -> None:
+        tmp_path.joinpath("dir").mkdir()
+        path = tmp_path.joinpath("dir", "file")
+        _ = path.write_text("data")
+        before = fingerprint_tree([tmp_path])
+        _ = path.write_text("other data")
+        assert fingerprint_tree([tmp_path]) != before
+
+    def test_added(self, *, tmp_path: Path) -> None:
+        before = fingerprint_tree([tmp_path])
+        tmp_path.joinpath("dir").mkdir()
+        assert fingerprint_tree([tmp_path]) != before
+
+    def test_file_root(self, *, tmp_path: Path) -> None:
+        path = tmp_path.joinpath("file")
+        _ = path.write_text("data")
+        before = fingerprint_tree([path])
+        _ = path.write_text("other data")
+        assert fingerprint_tree([path]) != before
+
+    def test_missing(self, *, tmp_path: Path) -> None:
+        path = tmp_path.joinpath("missing")
+        assert fingerprint_tree([path]) == fingerprint_tree([path])
+
+
+class TestManifest:
+    def test_main(self, *, tmp_path: Path) -> None:
+        path = tmp_path.joinpath("fingerprints.json")
+        key = get_manifest_key(Local(Path("/repo")), [tmp_path], tag=None)
+        assert read_fingerprint(path, key=key) is None
+        write_fingerprint(path, key=key, fingerprint="abc")
+        assert read_fingerprint(path, key=key) == "abc"
+        other = get_manifest_key(Local(Path("/repo")), [tmp_path], tag=["x"])
+        assert other != key
+        assert read_fingerprint(path, key=other) is None
+
+    def test_ignores_repo_options(self, *, tmp_path: Path) -> None:
+        first = Local.parse("local:/repo?connections=2")
+        second = Local.parse("local:/repo?connections=8")
+        assert get_manifest_key(first, [tmp_path]) == get_manifest_key(
+            second, [tmp_path]
+        )
+
+    def test_corrupt(self, *, tmp_path: Path) -> None:
+        path = tmp_path.joinpath("fingerprints.json")
+        _ = path.write_text("{")
+        assert read_fingerprint(path, key="key") is None
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+from datetime import UTC, datetime
+from typing import TYPE_CHECKING, Any
+
+from restic.index import Snapshot, SnapshotIndex, find_missing
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def _snapshot(
+    id_: str,
+    day: int,
+    /,
+    *,
+    hostname: str = "host",
+    paths: list[str] | None = None,
+    tags: list[str] | None = None,
+    original: str | None = None,
+) -> Snapshot:
+    data: dict[str, Any] = {
+        "id": id_,
+        "time": f"2024-01-{day:02}T12:00:00.123456789+00:00",
+        "hostname": hostname,
+        "paths": ["/data"] if paths is None else paths,
+        "tags": tags,
+        "original": original,
+    }
+    return Snapshot.parse(data)
+
+
+class TestFindMissing:
+    def test_main(self) -> None:
+        src = [_snapshot("a", 1), _snapshot("b", 2), _snapshot("c", 3, original="z")]
+        dest = [_snapshot("x", 1, original="a"), _snapshot("y", 3, original="z")]
+        assert [s.id for s in find_missing(src, dest)] == ["b"]
+
+    def test_empty(self) -> None:
+        src = [_snapshot("a", 1), _snapshot("b", 2)]
+        assert find_missing(src, []) == src
+
+
+class TestSnapshot:
+    def test_parse(self) -> None:
+        snapshot = _snapshot("a" * 64, 1, tags=["x"])
+        assert snapshot.time == datetime(2024, 1, 1, 12, 0, 0, 123456, tzinfo=UTC)
+        assert snapshot.short_id == "a" * 8
+        assert snapshot.tags == ["x"]
+        assert snapshot.original is None
+
+
+class TestSnapshotIndex:
+    def test_update(self, *, tmp_path: Path) -> None:
+        with SnapshotIndex(tmp_path.joinpath("index.sqlite")) as index:
+            assert index.ids() == set()
+            assert index.synced_at is None
+            index.update(add=[_snapshot("a", 1), _snapshot("b", 2)])
+            assert index.ids() == {"a", "b"}
+            index.update(remove=["a"])
+            assert index.ids() == {"b"}
+            index.update(add=[_snapshot("b", 2, paths=["/other"])])
+            assert [s.paths for s in index.query(path="/other")] == [["/other"]]
+            assert index.query(path="/data") == []
+            assert index.synced_at is not None
+
+    def test_query(self, *, tmp_path: Path) -> None:
+        with SnapshotIndex(tmp_path.joinpath("index.sqlite")) as index:
+            index.update(
+                add=[
+                    _snapshot("a", 1, tags=["x"]),
+                    _snapshot("b", 2, hostname="other", tags=["x", "y"]),
+                    _snapshot("c", 3, paths=["/other"], tags=["y"]),
+                ]
+            )
+
+            def ids(**kwargs: Any) -> list[str]:
+                return [s.id for s in index.query(**kwargs)]
+
+            assert ids() == ["a", "b", "c"]
+            assert ids(host="host") == ["a", "c"]
+            assert ids(path="/data") == ["a", "b"]
+            assert ids(tag=["x"]) == ["a", "b"]
+            assert ids(tag=["x,y"]) == ["b"]
+            assert ids(tag=["x,y", "y"]) == ["b", "c"]
+            assert ids(tag=[]) == ["a", "b", "c"]
+            assert ids(since=datetime(2024, 1, 2, tzinfo=UTC)) == ["b", "c"]
+            assert ids(until=datetime(2024, 1, 2, tzinfo=UTC)) == ["a"]
+            assert ids(latest=1) == ["c"]
@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import datetime as dt
+import json
+import sys
+import time
+from pathlib import Path
+from threading import Lock
+from typing import TYPE_CHECKING
+
+from pytest import raises
+
+from restic.inventory import get_backend, read_inventory, run_inventory
+from restic.repo import SFTP, Local
+
+if TYPE_CHECKING:
+    from pytest import MonkeyPatch
+
+    from restic.inventory import InventoryJob
+
+
+_FAKE_RESTIC = """\
+import json, os, time
+time.sleep(0.5)
+with open(os.environ["RESTIC_PASSWORD_FILE"]) as fh:
+    password = fh.read()
+with open(os.environ["FAKE_RESTIC_LOG"], "a") as fh:
+    fh.write(json.dumps([os.environ["RESTIC_REPOSITORY"], password]) + "\\n")
+"""
+_INVENTORY = """
+[defaults]
+keep_daily = 7
+
+[limits]
+workers = 4
+per_host = 1
+
+[limits.backends]
+local = 2
+
+[[jobs]]
+name = "late"
+command = "backup"
+paths = ["/data"]
+repo = "sftp:user@host:/repo"
+deadline = 2026-01-01T06:00:00Z
+
+[[jobs]]
+name = "early"
+command = "forget"
+repo = "sftp:user@host:/repo"
+deadline = 2026-01-01T05:00:00Z
+keep_daily = 14
+
+[[jobs]]
+name = "local-1"
+command = "prune"
+repo = "local:/repo1"
+
+[[jobs]]
+name = "local-2"
+command = "prune"
+repo = "local:/repo2"
+priority = 1
+
+[[jobs]]
+name = "local-3"
+command = "copy"
+repo = "local:/repo3"
+dests = ["local:/repo4"]
+"""
+
+
+class TestGetBackend:
+    def test_main(self) -> None:
+        assert get_backend(SFTP("user", "host", Path("/repo"))) == ("sftp", "sftp:host")
+        assert get_backend(Local(Path("/repo"))) == ("local", "local")
+
+
+class TestReadInventory:
+    def test_main(self, *, tmp_path: Path) -> None:
+        path = tmp_path.joinpath("inventory.toml")
+        _ = path.write_text(_INVENTORY)
+        inventory = read_inventory(path)
+        assert inventory.workers == 4
+        assert inventory.per_host == 1
+        assert inventory.per_backend == {"local": 2}
+        jobs = {j.name: j for j in inventory.jobs}
+        assert jobs["late"].paths == ["/data"]
+        assert jobs["late"].options == {"keep_daily": 7}
+        assert jobs["early"].options == {"keep_daily": 14}
+        assert jobs["early"].deadline == dt.datetime(2026, 1, 1, 5, tzinfo=dt.UTC)
+        assert jobs["local-3"].dests == [Local(Path("/repo4"))]
+
+    def test_unknown_option(self, *, tmp_path: Path) -> None:
+        path = tmp_path.joinpath("inventory.toml")
+        _ = path.write_text(
+            '[[jobs]]\nname = "x"\ncommand = "prune"\nrepo = "local:/r"\nfoo = 1\n'
+        )
+        with raises(ValueError, match=r"Job 'x' has unknown option\(s\) \['foo'\]"):
+            _ = read_inventory(path)
+
+    def test_copy_passwords(self, *, tmp_path: Path) -> None:
+        path = tmp_path.joinpath("inventory.toml")
+        _ = path.write_text(
+            '[[jobs]]\nname = "x"\ncommand = "copy"\nrepo = "local:/r1"\n'
+            'dests = ["local:/r2"]\nsrc_password = "src"\ndest_password = "dest"\n'
+        )
+        (job,) = read_inventory(path).jobs
+        assert job.src_password is not None
+        assert job.src_password.get_secret_value() == "src"
+        assert job.dest_password is not None
+        assert job.dest_password.get_secret_value() == "dest"
+        assert job.options == {}
+
+    def test_copy_passwords_on_other_command(self, *, tmp_path: Path) -> None:
+        path = tmp_path.joinpath("inventory.toml")
+        _ = path.write_text(
+            '[[jobs]]\nname = "x"\ncommand = "prune"\nrepo = "local:/r"\n'
+            'src_password = "src"\n'
+        )
+        with raises(ValueError, match=r"Job 'x' has copy-only option\(s\)"):
+            _ = read_inventory(path)
+
+    def test_invalid_command(self, *, tmp_path: Path) -> None:
+        path = tmp_path.joinpath("inventory.toml")
+        _ = path.write_text('[[jobs]]\nname = "x"\ncommand = "x"\nrepo = "local:/r"\n')
+        with raises(ValueError, match=r"Job 'x' has invalid command 'x'"):
+            _ = read_inventory(path)
+
+
+class TestRunInventory:
+    def test_main(self, *, tmp_path: Path) -> None:
+        path = tmp_path.joinpath("inventory.toml")
+        _ = path.write_text(_INVENTORY)
+        inventory = read_inventory(path)
+        lock = Lock()
+        active: dict[str, int] = {"sftp": 0, "local": 0}
+        peak: dict[str, int] = {"sftp": 0, "local": 0}
+        order: list[str] = []
+
+        def execute(job: InventoryJob, /) -> None:
+            backend, _ = get_backend(job.repo)
+            with lock:
+                order.append(job.name)
+                active[backend] += 1
+                peak[backend] = max(peak[backend], active[backend])
+            if job.name == "local-1":
+                msg = "boom"
+                raise RuntimeError(msg)
+            with lock:
+                active[backend] -= 1
+
+        reports = run_inventory(inventory, execute=execute)
+        assert [r.name for r in reports] == [
+            "early",
+            "late",
+            "local-2",
+            "local-1",
+            "local-3",
+        ]
+        assert order.index("early") < order.index("late")
+        assert peak["sftp"] == 1
+        assert peak["local"] <= 2
+        statuses = {r.name: r.status for r in reports}
+        assert statuses["local-1"] == "failed"
+        assert all(r.missed_deadline for r in reports if r.deadline is not None)
+
+    def test_backend_cap_counts_every_repo(self, *, tmp_path: Path) -> None:
+        path = tmp_path.joinpath("inventory.toml")
+        _ = path.write_text(
+            "[limits]\nworkers = 2\n\n[limits.backends]\nsftp = 2\n\n"
+            '[[jobs]]\nname = "copy"\ncommand = "copy"\nrepo = "sftp:u@h1:/r"\n'
+            'dests = ["sftp:u@h2:/r"]\npriority = 1\n\n'
+            '[[jobs]]\nname = "prune"\ncommand = "prune"\nrepo = "sftp:u@h3:/r"\n'
+        )
+        lock = Lock()
+        active = [0]
+        peak = [0]
+
+        def execute(job: InventoryJob, /) -> None:
+            with lock:
+                active[0] += len(job.repos)
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.2)
+            with lock:
+                active[0] -= len(job.repos)
+
+        reports = run_inventory(read_inventory(path), execute=execute)
+        assert all(r.status == "ok" for r in reports)
+        assert peak[0] == 2
+
+    def test_concurrent_jobs_use_their_own_env(
+        self, *, monkeypatch: MonkeyPatch, tmp_path: Path
+    ) -> None:
+        bin_ = tmp_path.joinpath("bin")
+        bin_.mkdir()
+        restic = bin_.joinpath("restic")
+        _ = restic.write_text(f"#!{sys.executable}\n{_FAKE_RESTIC}")
+        restic.chmod(0o755)
+        log = tmp_path.joinpath("log.jsonl")
+        monkeypatch.setenv("PATH", f"{bin_}:{Path(sys.executable).parent}")
+        monkeypatch.setenv("FAKE_RESTIC_LOG", str(log))
+        path = tmp_path.joinpath("inventory.toml")
+        _ = path.write_text(
+            "".join(
+                f'[[jobs]]\nname = "job{i}"\ncommand = "prune"\n'
+                f'repo = "local:{tmp_path}/repo{i}"\npassword = "password{i}"\n'
+                for i in [1, 2]
+            )
+        )
+        reports = run_inventory(read_inventory(path), workers=2)
+        assert all(r.status == "ok" for r in reports)
+        seen = {tuple(json.loads(line)) for line in log.read_text().splitlines()}
+        assert seen == {(f"local:{tmp_path}/repo{i}", f"password{i}") for i in [1, 2]}
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import json
+import sys
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from pytest import fixture
+
+from restic.lib import forget, sync_index
+from restic.repo import Local
+
+if TYPE_CHECKING:
+    from pytest import MonkeyPatch
+
+
+_FAKE_RESTIC = """\
+import json, os, sys
+args = [a for a in sys.argv[1:] if a != "--json"]
+with open(os.environ["FAKE_RESTIC_LOG"], "a") as fh:
+    fh.write(args[0] + "\\n")
+with open(os.environ["FAKE_RESTIC_SNAPSHOTS"]) as fh:
+    snapshots = json.load(fh)
+if args[0] == "list":
+    for snapshot in snapshots:
+        print(snapshot["id"])
+elif args[0] == "snapshots":
+    ids = [a for a in args[1:] if not a.startswith("-")]
+    print(json.dumps([s for s in snapshots if (len(ids) == 0) or (s["id"] in ids)]))
+"""
+
+
+@fixture
+def log(*, monkeypatch: MonkeyPatch, tmp_path: Path) -> Path:
+    bin_ = tmp_path.joinpath("bin")
+    bin_.mkdir()
+    restic = bin_.joinpath("restic")
+    _ = restic.write_text(f"#!{sys.executable}\n{_FAKE_RESTIC}")
+    restic.chmod(0o755)
+    log = tmp_path.joinpath("log")
+    monkeypatch.setenv("PATH", f"{bin_}:{Path(sys.executable).parent}")
+    monkeypatch.setenv("FAKE_RESTIC_LOG", str(log))
+    monkeypatch.setenv("FAKE_RESTIC_SNAPSHOTS", str(tmp_path.joinpath("snapshots")))
+    return log
+
+
+def _write_snapshots(path: Path, n: int, /) -> None:
+    snapshots = [
+        {"id": f"{i:064x}", "time": f"2026-01-0{i}T00:00:00+00:00", "paths": ["/data"]}
+        for i in range(1, n + 1)
+    ]
+    _ = path.write_text(json.dumps(snapshots))
+
+
+class TestForget:
+    def test_plan_sees_new_snapshots(
+        self, *, log: Path, monkeypatch: MonkeyPatch, tmp_path: Path
+    ) -> None:
+        monkeypatch.setenv("INDEX_MAX_AGE", "3600")
+        repo = Local(tmp_path.joinpath("repo"))
+        env = {"RESTIC_REPOSITORY": repo.repository}
+        cache = tmp_path.joinpath("cache")
+        _write_snapshots(tmp_path.joinpath("snapshots"), 1)
+        _ = sync_index(repo, env=env, cache_dir=cache, max_age=3600)
+        _write_snapshots(tmp_path.joinpath("snapshots"), 2)
+        _ = forget(repo, env=env, cache_dir=cache, keep_last=1, skip_noop=True)
+        assert log.read_text().splitlines() == [
+            "list",
+            "snapshots",
+            "list",
+            "snapshots",
+            "forget",
+        ]
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from urllib.request import Request, urlopen
+
+from restic.metrics import (
+    read_state,
+    record_backup,
+    record_forget,
+    record_prune,
+    serve_metrics,
+)
+from restic.repo import Local
+from restic.results import BackupResult, ForgetResult, PruneResult
+
+
+def _record_prunes(path: Path, n: int, /) -> None:
+    for _ in range(n):
+        record_prune(path, PruneResult(), repo=Local(Path("/repo")))
+
+
+def _backup_result() -> BackupResult:
+    return BackupResult(
+        files_new=2,
+        files_changed=1,
+        files_unmodified=7,
+        data_added=100,
+        data_added_packed=60,
+        total_bytes_processed=400,
+        timings={"backup": 1.5, "forget": 0.5},
+    )
+
+
+class TestRecordBackup:
+    def test_main(self, *, tmp_path: Path) -> None:
+        path = tmp_path.joinpath("restic.prom")
+        repo = Local(Path("/repo"))
+        for _ in range(2):
+            record_backup(path, _backup_result(), repo=repo, paths=["/data"], now=1.0)
+        text = path.read_text()
+        labels = 'path="/data",repo="local:/repo"'
+        op_labels = f'operation="backup",{labels}'
+        assert "# TYPE restic_operation_runs_total counter" in text
+        assert f"restic_operation_runs_total{{{op_labels}}} 2" in text
+        assert (
+            f"restic_operation_last_success_timestamp_seconds{{{op_labels}}} 1" in text
+        )
+        assert (
+            'restic_operation_duration_seconds{operation="backup",path="/data",phase="backup",repo="local:/repo"} 1.5'
+            in text
+        )
+        assert f"restic_backup_uploaded_bytes_total{{{labels}}} 120" in text
+        assert f"restic_backup_dedup_ratio{{{labels}}} 0.75" in text
+        assert f'restic_backup_files{{{labels},state="new"}} 2' in text
+        assert "# EOF" not in text
+
+    def test_stale_phases(self, *, tmp_path: Path) -> None:
+        path = tmp_path.joinpath("restic.prom")
+        repo = Local(Path("/repo"))
+        record_backup(path, _backup_result(), repo=repo, paths=["/data"])
+        record_backup(
+            path,
+            BackupResult(skipped=True, timings={"fingerprint": 0.1}),
+            repo=repo,
+            paths=["/data"],
+        )
+        text = path.read_text()
+        assert 'phase="forget"' not in text
+        assert 'phase="fingerprint"' in text
+
+
+class TestRecordForget:
+    def test_main(self, *, tmp_path: Path) -> None:
+        path = tmp_path.joinpath("restic.prom")
+        result = ForgetResult(kept=3, removed_ids=["a", "b"])
+        record_forget(path, result, repo=Local(Path("/repo")))
+        text = path.read_text()
+        assert 'restic_forget_snapshots_removed_total{repo="local:/repo"} 2' in text
+        assert len(read_state(path)) >= 1
+
+
+class TestRecordPrune:
+    def test_concurrent_processes(self, *, tmp_path: Path) -> None:
+        path = tmp_path.joinpath("restic.prom")
+        with ProcessPoolExecutor(max_workers=4) as pool:
+            _ = list(pool.map(_record_prunes, [path] * 4, [25] * 4))
+        text = path.read_text()
+        labels = 'operation="prune",repo="local:/repo"'
+        assert f"restic_operation_runs_total{{{labels}}} 100" in text
+
+
+class TestServeMetrics:
+    def test_main(self, *, tmp_path: Path) -> None:
+        path = tmp_path.joinpath("restic.prom")
+        record_forget(path, ForgetResult(kept=1), repo=Local(Path("/repo")))
+        server = serve_metrics(path, port=0, addr="127.0.0.1")
+        try:
+            url = f"http://127.0.0.1:{server.server_port}/metrics"
+            request = Request(url, headers={"Accept": "application/openmetrics-text"})
+            with urlopen(request) as response:
+                content_type = response.headers["Content-Type"]
+                body = response.read().decode()
+        finally:
+            server.shutdown()
+            server.server_close()
+        assert content_type.startswith("application/openmetrics-text")
+        assert "# TYPE restic_operation_runs counter" in body
+        assert body.endswith("# EOF\n")
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+from stat import S_IMODE
+from typing import TYPE_CHECKING
+
+from restic.permissions import DIR_MODE, FILE_MODE, normalize_permissions
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+class TestNormalizePermissions:
+    def test_main(self, *, tmp_path: Path) -> None:
+        tmp_path.chmod(DIR_MODE)
+        (dir_ := tmp_path.joinpath("dir")).mkdir(mode=0o700)
+        (file := dir_.joinpath("file")).touch(mode=0o600)
+        result = normalize_permissions(tmp_path)
+        assert result.examined == 3
+        assert result.changed == 2
+        assert S_IMODE(dir_.stat().st_mode) == DIR_MODE
+        assert S_IMODE(file.stat().st_mode) == FILE_MODE
+
+    def test_idempotent(self, *, tmp_path: Path) -> None:
+        tmp_path.joinpath("file").touch(mode=0o600)
+        _ = normalize_permissions(tmp_path)
+        result = normalize_permissions(tmp_path)
+        assert result.examined == 2
+        assert result.changed == 0
+
+    def test_manifest(self, *, tmp_path: Path) -> None:
+        (root := tmp_path.joinpath("root")).mkdir()
+        root.joinpath("file").touch(mode=0o600)
+        manifest = tmp_path.joinpath("manifest.json")
+        first = normalize_permissions(root, manifest=manifest)
+        assert first.skipped == 0
+        second = normalize_permissions(root, manifest=manifest)
+        assert second.skipped == 1
+        root.joinpath("new").touch(mode=0o600)
+        third = normalize_permissions(root, manifest=manifest)
+        assert third.skipped == 0
+        assert third.changed == 1
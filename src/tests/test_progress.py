@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+from subprocess import CalledProcessError
+
+from pytest import approx, raises
+
+from restic.progress import Progress, combine_progress, parse_progress, stream_json
+
+
+class TestCombineProgress:
+    def test_main(self) -> None:
+        combined = combine_progress([
+            Progress(
+                message_type="status",
+                seconds_elapsed=10,
+                seconds_remaining=5,
+                files_done=1,
+                total_files=2,
+                bytes_done=10,
+                total_bytes=40,
+            ),
+            Progress(
+                message_type="summary",
+                seconds_elapsed=4,
+                seconds_remaining=0,
+                files_done=3,
+                total_files=3,
+                bytes_done=60,
+                total_bytes=60,
+            ),
+        ])
+        assert combined.message_type == "status"
+        assert combined.seconds_elapsed == 10
+        assert combined.seconds_remaining == 5
+        assert combined.percent_done == approx(0.7)
+        assert combined.files_done == 4
+        assert combined.total_bytes == 100
+
+    def test_unknown_eta(self) -> None:
+        combined = combine_progress([
+            Progress(message_type="status"),
+            Progress(message_type="status", seconds_remaining=1),
+        ])
+        assert combined.seconds_remaining is None
+
+
+class TestParseProgress:
+    def test_backup_status(self) -> None:
+        progress = parse_progress({
+            "message_type": "status",
+            "seconds_elapsed": 10,
+            "seconds_remaining": 30,
+            "percent_done": 0.25,
+            "total_files": 400,
+            "files_done": 100,
+            "total_bytes": 4000,
+            "bytes_done": 1000,
+        })
+        expected = Progress(
+            message_type="status",
+            seconds_elapsed=10,
+            seconds_remaining=30,
+            percent_done=0.25,
+            files_done=100,
+            total_files=400,
+            bytes_done=1000,
+            total_bytes=4000,
+        )
+        assert progress == expected
+        assert progress is not None
+        assert progress.files_per_second == approx(10.0)
+        assert progress.bytes_per_second == approx(100.0)
+
+    def test_restore_summary(self) -> None:
+        progress = parse_progress({
+            "message_type": "summary",
+            "seconds_elapsed": 4,
+            "total_files": 8,
+            "files_restored": 8,
+            "total_bytes": 80,
+            "bytes_restored": 80,
+        })
+        assert progress is not None
+        assert progress.message_type == "summary"
+        assert progress.percent_done == 1.0
+        assert progress.files_per_second == approx(2.0)
+
+    def test_other(self) -> None:
+        assert parse_progress({"message_type": "verbose_status"}) is None
+        assert parse_progress("text") is None
+
+
+class TestStreamJSON:
+    def test_main(self) -> None:
+        result = list(stream_json("sh", "-c", """echo '{"a": 1}'; echo; echo text"""))
+        assert result == [{"a": 1}, "text"]
+
+    def test_error(self) -> None:
+        with raises(CalledProcessError) as exc_info:
+            _ = list(stream_json("sh", "-c", "echo message >&2; exit 3"))
+        assert exc_info.value.returncode == 3
+        assert exc_info.value.stderr == "message\n"
@@ -13,6 +13,10 @@ from restic.repo import (
     Backblaze,
     BackblazeMissingCredentialsError,
     Local,
+    RepoOptions,
+    RepoOptionsError,
+    expand_repo_options,
+    get_repo_env,
     parse_repo,
 )
 
@@ -35,6 +39,65 @@ class TestBackblaze:
         assert repo == backblaze
 
 
+class TestExpandRepoOptions:
+    def test_main(self) -> None:
+        repo = Local(Path("repo"), options=RepoOptions(limit_upload=100))
+        assert expand_repo_options(repo) == ["--limit-upload", "100"]
+
+    def test_restic_defaults(self) -> None:
+        repo = Backblaze(Secret("id"), Secret("key"), "bucket", Path("path"))
+        assert expand_repo_options(repo) == []
+
+    def test_uri_options(self) -> None:
+        repo = parse_repo("local:/repo?connections=4&pack-size=64")
+        assert expand_repo_options(repo) == [
+            "--option",
+            "local.connections=4",
+            "--pack-size",
+            "64",
+        ]
+
+    def test_copy(self) -> None:
+        src = SFTP("user", "host", Path("src"), options=RepoOptions(limit_download=50))
+        dest = Local(Path("dest"), options=RepoOptions(pack_size=64))
+        assert expand_repo_options(dest, src=src, connections=8) == [
+            "--option",
+            "sftp.connections=8",
+            "--option",
+            "local.connections=8",
+            "--pack-size",
+            "64",
+            "--limit-download",
+            "50",
+        ]
+
+
+class TestGetRepoEnv:
+    def test_backblaze(self) -> None:
+        repo = Backblaze(Secret("id"), Secret("key"), "bucket", Path("path"))
+        assert get_repo_env(
+            repo, env_var="RESTIC_FROM_REPOSITORY", restic_cache_dir=None
+        ) == {
+            "RESTIC_FROM_REPOSITORY": "b2:bucket:path",
+            "B2_ACCOUNT_ID": "id",
+            "B2_ACCOUNT_KEY": "key",
+        }
+
+    @given(path=paths(min_depth=1))
+    def test_local(self, *, path: Path) -> None:
+        repo = Local(path)
+        assert get_repo_env(repo, restic_cache_dir=None) == {
+            "RESTIC_REPOSITORY": repo.repository
+        }
+
+    def test_cache_dir(self) -> None:
+        repo = Local(Path("repo"))
+        assert get_repo_env(repo, restic_cache_dir=Path("cache")) == {
+            "RESTIC_REPOSITORY": repo.repository,
+            "RESTIC_CACHE_DIR": "cache",
+        }
+
+
 class TestLocal:
     @given(path=paths(min_depth=1))
     def test_main(self, *, path: Path) -> None:
@@ -112,3 +175,19 @@ class TestSFTP:
     def test_main(self, *, user: str, hostname: str, path: Path) -> None:
         repo = SFTP(user, hostname, path)
         assert SFTP.parse(repo.repository) == repo
+
+
+class TestRepoOptions:
+    def test_parse_repo(self) -> None:
+        repo = parse_repo("sftp:user@host:/repo?connections=4&pack-size=64")
+        assert repo == SFTP("user", "host", Path("/repo"))
+        assert repo.options == RepoOptions(connections=4, pack_size=64)
+
+    def test_merge(self) -> None:
+        options = RepoOptions(connections=4, pack_size=64)
+        merged = options.merge(RepoOptions(connections=8, limit_upload=100))
+        assert merged == RepoOptions(connections=8, pack_size=64, limit_upload=100)
+
+    def test_invalid(self) -> None:
+        with raises(RepoOptionsError, match=r"Invalid repository option 'foo'"):
+            _ = parse_repo("local:/repo?foo=1")
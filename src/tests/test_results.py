@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+from restic.results import (
+    BackupResult,
+    CopyResult,
+    ForgetResult,
+    PruneResult,
+    RestoreResult,
+    time_phase,
+)
+
+
+class TestBackupResult:
+    def test_main(self) -> None:
+        result = BackupResult()
+        summary = {
+            "message_type": "summary",
+            "files_new": 1,
+            "files_changed": 2,
+            "files_unmodified": 3,
+            "data_added": 100,
+            "total_files_processed": 6,
+            "snapshot_id": "abc",
+        }
+        result.add_messages(["text", summary, {**summary, "snapshot_id": "def"}])
+        assert result.snapshot_ids == ["abc", "def"]
+        assert result.files_new == 2
+        assert result.files_changed == 4
+        assert result.files_unmodified == 6
+        assert result.data_added == 200
+        assert result.total_files_processed == 12
+
+    def test_dry_run(self) -> None:
+        result = BackupResult()
+        result.add_messages([{"message_type": "summary", "files_new": 1}])
+        assert result.snapshot_ids == []
+        assert result.files_new == 1
+
+
+class TestCopyResult:
+    def test_main(self) -> None:
+        result = CopyResult()
+        result.add_messages([
+            "snapshot 410b18a2 of [/home/user/work] at 2020-06-09 by user@host",
+            "  copy started, this may take a while...",
+            "snapshot 7a746a07 saved",
+        ])
+        assert result.snapshot_ids == ["7a746a07"]
+
+
+class TestForgetResult:
+    def test_main(self) -> None:
+        result = ForgetResult()
+        result.add_messages([
+            [
+                {"keep": [{"id": "a"}, {"id": "b"}], "remove": [{"id": "c"}]},
+                {"keep": [{"id": "d"}], "remove": None},
+            ]
+        ])
+        assert result.kept == 3
+        assert result.removed_ids == ["c"]
+        assert result.removed == 1
+
+
+class TestPruneResult:
+    def test_main(self) -> None:
+        result = PruneResult()
+        result.add_messages([
+            "Would have made the following changes:",
+            "to repack:           69 blobs / 1.078 MiB",
+            "this removes:        67 blobs / 1.047 MiB",
+            "to delete:            7 blobs / 25.726 KiB",
+            "total prune:         74 blobs / 1.072 MiB",
+            "remaining:           16 blobs / 38.003 KiB",
+            "unused size after prune: 0 B (0.00% of remaining size)",
+            "to keep:                         1 packs",
+            "to repack:                       2 packs",
+            "to delete:                       3 packs",
+        ])
+        assert result.to_repack == 1130365
+        assert result.to_delete == 26343
+        assert result.reclaimable == 1124073
+        assert result.remaining == 38915
+        assert result.unused_after == 0
+        assert result.packs_to_repack == 2
+        assert result.packs_to_delete == 3
+        assert result.unused_pct > 95.0
+
+    def test_exceeds(self) -> None:
+        result = PruneResult(reclaimable=100, remaining=900)
+        assert result.exceeds()
+        assert result.exceeds(min_reclaim=100)
+        assert not result.exceeds(min_reclaim=101)
+        assert result.exceeds(min_unused_pct=10.0)
+        assert not result.exceeds(min_unused_pct=10.1)
+        assert result.exceeds(min_reclaim=101, min_unused_pct=5.0)
+
+    def test_exceeds_nothing(self) -> None:
+        assert not PruneResult().exceeds()
+
+
+class TestRestoreResult:
+    def test_main(self) -> None:
+        result = RestoreResult()
+        result.add_messages([
+            {
+                "message_type": "summary",
+                "total_files": 3,
+                "files_restored": 2,
+                "files_skipped": 1,
+                "bytes_restored": 10,
+            }
+        ])
+        assert result.total_files == 3
+        assert result.files_restored == 2
+        assert result.files_skipped == 1
+        assert result.bytes_restored == 10
+
+
+class TestTimePhase:
+    def test_main(self) -> None:
+        timings: dict[str, float] = {}
+        with time_phase(timings, "phase"):
+            ...
+        with time_phase(timings, "phase"):
+            ...
+        assert set(timings) == {"phase"}
+        assert timings["phase"] >= 0.0
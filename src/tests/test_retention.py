@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+from datetime import UTC, datetime, timedelta
+
+from pytest import raises
+
+from restic.constants import DEFAULT_KEEP_KWARGS
+from restic.index import Snapshot
+from restic.retention import plan_retention
+
+_START = datetime(2024, 1, 1, tzinfo=UTC)
+
+
+def _hourly(
+    n: int, /, *, hostname: str = "host", tags: list[str] | None = None
+) -> list[Snapshot]:
+    return [
+        Snapshot(
+            time=_START + timedelta(hours=i),
+            id=f"{hostname}-{i:04}",
+            hostname=hostname,
+            paths=["/data"],
+            tags=[] if tags is None else tags,
+        )
+        for i in range(n)
+    ]
+
+
+def _ids(snapshots: list[Snapshot], /) -> list[str]:
+    return sorted(s.id for s in snapshots)
+
+
+class TestPlanRetention:
+    def test_empty_policy(self) -> None:
+        plan = plan_retention(_hourly(5))
+        assert len(plan.keep) == 5
+        assert plan.remove == []
+        assert all(r == ["policy is empty"] for r in plan.reasons.values())
+
+    def test_keep_last(self) -> None:
+        plan = plan_retention(_hourly(5), keep_last=2)
+        assert _ids(plan.keep) == ["host-0003", "host-0004"]
+        assert len(plan.remove) == 3
+
+    def test_keep_daily(self) -> None:
+        plan = plan_retention(_hourly(72), keep_daily=2)
+        assert _ids(plan.keep) == ["host-0047", "host-0071"]
+
+    def test_keep_daily_oldest(self) -> None:
+        plan = plan_retention(_hourly(48), keep_daily=3)
+        assert _ids(plan.keep) == ["host-0000", "host-0023", "host-0047"]
+
+    def test_keep_within(self) -> None:
+        plan = plan_retention(_hourly(48), keep_within="1d")
+        assert len(plan.keep) == 24
+
+    def test_keep_within_daily(self) -> None:
+        plan = plan_retention(_hourly(96), keep_within_daily="2d")
+        assert _ids(plan.keep) == ["host-0071", "host-0095"]
+
+    def test_groups(self) -> None:
+        plan = plan_retention(_hourly(3) + _hourly(3, hostname="other"), keep_last=1)
+        assert _ids(plan.keep) == ["host-0002", "other-0002"]
+
+    def test_tag(self) -> None:
+        snapshots = _hourly(3, tags=["a"]) + _hourly(3, hostname="other")
+        plan = plan_retention(snapshots, keep_last=1, tag=["a"])
+        assert _ids(plan.keep) == ["host-0002"]
+        assert _ids(plan.remove) == ["host-0000", "host-0001"]
+
+    def test_default(self) -> None:
+        plan = plan_retention(_hourly(24 * 7 + 1), **DEFAULT_KEEP_KWARGS)
+        assert plan.remove == []
+
+    def test_error(self) -> None:
+        with raises(ValueError, match=r"Invalid duration 'x'"):
+            _ = plan_retention(_hourly(1), keep_within="x")
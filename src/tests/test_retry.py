@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import datetime as dt
+import os
+from pathlib import Path
+from subprocess import CalledProcessError
+
+from pytest import mark, param, raises
+
+from restic.repo import Local
+from restic.retry import Lock, call_with_retry, classify_failure, get_backoff
+
+_NOW = dt.datetime(2026, 1, 1, tzinfo=dt.UTC)
+
+
+class TestCallWithRetry:
+    def test_transient(self) -> None:
+        calls: list[int] = []
+
+        def func() -> int:
+            calls.append(len(calls))
+            if len(calls) <= 2:
+                raise CalledProcessError(1, "restic", stderr="503 Service Unavailable")
+            return len(calls)
+
+        result = call_with_retry(func, repo=Local(Path("repo")), retries=3, delay=0.0)
+        assert result == 3
+
+    def test_exhausted(self) -> None:
+        calls: list[int] = []
+
+        def func() -> None:
+            calls.append(len(calls))
+            raise CalledProcessError(1, "restic", stderr="connection reset by peer")
+
+        with raises(CalledProcessError):
+            call_with_retry(func, repo=Local(Path("repo")), retries=2, delay=0.0)
+        assert len(calls) == 3
+
+    def test_fatal(self) -> None:
+        calls: list[int] = []
+
+        def func() -> None:
+            calls.append(len(calls))
+            raise CalledProcessError(12, "restic", stderr="wrong password")
+
+        with raises(CalledProcessError):
+            call_with_retry(func, repo=Local(Path("repo")), retries=3, delay=0.0)
+        assert len(calls) == 1
+
+
+class TestClassifyFailure:
+    @mark.parametrize(
+        ("return_code", "stderr", "expected"),
+        [
+            param(10, "", "missing"),
+            param(1, "Is there a repository at the following location?", "missing"),
+            param(11, "", "locked"),
+            param(1, "unable to create lock in backend", "locked"),
+            param(1, "blob upload: 503 Service Unavailable", "transient"),
+            param(1, "ssh: connection lost", "transient"),
+            param(1, "read tcp: i/o timeout", "transient"),
+            param(12, "wrong password or no key found", "fatal"),
+            param(3, "", "fatal"),
+            param(3, "error: open /data/500/x.timeout: permission denied", "fatal"),
+            param(1, "error: open /data/500/x.timeout: permission denied", "fatal"),
+            param(1, "unexpected HTTP response (502): Bad Gateway", "transient"),
+            param(1, "b2_upload_file: status: 500, code: internal_error", "transient"),
+            param(1, "Load(<data/1234>) returned error code 429", "transient"),
+            param(1, "dial tcp: i/o timeout", "transient"),
+        ],
+    )
+    def test_main(self, *, return_code: int, stderr: str, expected: str) -> None:
+        error = CalledProcessError(return_code, "restic", stderr=stderr)
+        assert classify_failure(error) == expected
+
+    def test_no_stderr(self) -> None:
+        assert classify_failure(CalledProcessError(1, "restic")) == "fatal"
+
+
+class TestGetBackoff:
+    def test_main(self) -> None:
+        assert get_backoff(0, delay=5.0, max_delay=300.0, jitter=0.0) == 5.0
+        assert get_backoff(3, delay=5.0, max_delay=300.0, jitter=0.0) == 40.0
+        assert get_backoff(10, delay=5.0, max_delay=300.0, jitter=0.0) == 300.0
+
+    def test_jitter(self) -> None:
+        for _ in range(100):
+            assert 2.5 <= get_backoff(0, delay=5.0, jitter=0.5) <= 5.0
+
+
+class TestLock:
+    def test_parse(self) -> None:
+        lock = Lock.parse(
+            "abc",
+            {
+                "time": "2026-01-01T00:00:00.123456789Z",
+                "exclusive": True,
+                "hostname": "host",
+                "username": "user",
+                "pid": 123,
+            },
+        )
+        assert lock.time == dt.datetime(2026, 1, 1, 0, 0, 0, 123456, tzinfo=dt.UTC)
+        assert lock.exclusive
+        assert lock.pid == 123
+
+    def test_old(self) -> None:
+        lock = Lock(id="a", time=_NOW - dt.timedelta(hours=1), hostname="other")
+        assert lock.is_stale(now=_NOW, max_age=1800, hostname="host")
+
+    def test_live_remote(self) -> None:
+        lock = Lock(id="a", time=_NOW, hostname="other", pid=1)
+        assert not lock.is_stale(now=_NOW, max_age=1800, hostname="host")
+
+    def test_live_local(self) -> None:
+        lock = Lock(id="a", time=_NOW, hostname="host", pid=os.getpid())
+        assert not lock.is_stale(now=_NOW, max_age=1800, hostname="host")
+
+    def test_dead_local(self) -> None:
+        lock = Lock(id="a", time=_NOW, hostname="host", pid=0)
+        assert lock.is_stale(now=_NOW, max_age=1800, hostname="host")
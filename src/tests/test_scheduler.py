@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import datetime as dt
+import fcntl
+import time
+from typing import TYPE_CHECKING
+
+from pytest import fixture, mark, param, raises
+
+from restic.scheduler import Job, Schedule, Scheduler
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+    from pytest import MonkeyPatch
+
+
+_NOW = dt.datetime(2024, 1, 1, 12, 30, tzinfo=dt.UTC)  # a Monday
+
+
+class TestSchedule:
+    def test_interval(self) -> None:
+        schedule = Schedule.parse("3600")
+        assert schedule.next_after(_NOW) == _NOW + dt.timedelta(hours=1)
+
+    @mark.parametrize(
+        ("text", "expected"),
+        [
+            param("* * * * *", dt.datetime(2024, 1, 1, 12, 31, tzinfo=dt.UTC)),
+            param("0 3 * * *", dt.datetime(2024, 1, 2, 3, 0, tzinfo=dt.UTC)),
+            param("*/15 * * * *", dt.datetime(2024, 1, 1, 12, 45, tzinfo=dt.UTC)),
+            param("0 0 * * 0", dt.datetime(2024, 1, 7, 0, 0, tzinfo=dt.UTC)),
+            param("0 0 * * 7", dt.datetime(2024, 1, 7, 0, 0, tzinfo=dt.UTC)),
+            param("0 0 1 3 *", dt.datetime(2024, 3, 1, 0, 0, tzinfo=dt.UTC)),
+            param("0 0 29 2 *", dt.datetime(2024, 2, 29, 0, 0, tzinfo=dt.UTC)),
+            param("0 0 15 * 3", dt.datetime(2024, 1, 3, 0, 0, tzinfo=dt.UTC)),
+            param("30 9-17/4 * * 1-5", dt.datetime(2024, 1, 1, 13, 30, tzinfo=dt.UTC)),
+        ],
+    )
+    def test_cron(self, *, text: str, expected: dt.datetime) -> None:
+        assert Schedule.parse(text).next_after(_NOW) == expected
+
+    @fixture
+    def new_york(self, *, monkeypatch: MonkeyPatch) -> Iterator[None]:
+        monkeypatch.setenv("TZ", "America/New_York")
+        time.tzset()
+        yield
+        monkeypatch.undo()
+        time.tzset()
+
+    @mark.usefixtures("new_york")
+    @mark.parametrize(
+        ("now", "expected"),
+        [
+            param(
+                dt.datetime(2024, 3, 9, 17, tzinfo=dt.UTC),
+                dt.datetime(2024, 3, 10, 7, tzinfo=dt.UTC),
+            ),
+            param(
+                dt.datetime(2024, 11, 2, 16, tzinfo=dt.UTC),
+                dt.datetime(2024, 11, 3, 8, tzinfo=dt.UTC),
+            ),
+        ],
+    )
+    def test_cron_across_dst(self, *, now: dt.datetime, expected: dt.datetime) -> None:
+        due = Schedule.parse("0 3 * * *").next_after(now.astimezone())
+        assert due == expected
+        assert due.astimezone().hour == 3
+
+    @mark.parametrize(
+        "text", [param("0"), param("* * *"), param("60 * * * *"), param("5-1 * * * *")]
+    )
+    def test_error(self, *, text: str) -> None:
+        with raises(ValueError, match=r"(Invalid|positive)"):
+            _ = Schedule.parse(text)
+
+
+class TestScheduler:
+    def test_first_run(self, *, tmp_path: Path) -> None:
+        runs: list[int] = []
+        job = Job(
+            name="job", schedule=Schedule.parse("60"), func=lambda: runs.append(1)
+        )
+        scheduler = Scheduler([job], state_dir=tmp_path, now=_NOW)
+        assert scheduler.pending(now=_NOW) == [job]
+        assert scheduler.run_job(job)
+        assert runs == [1]
+        assert scheduler.pending() == []
+        assert scheduler.state("job").runs == 1
+
+    def test_state_persists(self, *, tmp_path: Path) -> None:
+        job = Job(name="job", schedule=Schedule.parse("3600"), func=lambda: None)
+        assert Scheduler([job], state_dir=tmp_path).run_job(job)
+        scheduler = Scheduler([job], state_dir=tmp_path)
+        assert scheduler.state("job").runs == 1
+        assert scheduler.pending() == []
+
+    def test_catch_up(self, *, tmp_path: Path) -> None:
+        job = Job(name="job", schedule=Schedule.parse("60"), func=lambda: None)
+        assert Scheduler([job], state_dir=tmp_path).run_job(job)
+        later = dt.datetime.now().astimezone() + dt.timedelta(hours=1)
+        assert Scheduler([job], state_dir=tmp_path, now=later).due["job"] == later
+        job.catch_up = False
+        scheduler = Scheduler([job], state_dir=tmp_path, now=later)
+        assert scheduler.due["job"] == later + dt.timedelta(minutes=1)
+
+    def test_failure(self, *, tmp_path: Path) -> None:
+        def func() -> None:
+            raise RuntimeError
+
+        job = Job(name="job", schedule=Schedule.parse("60"), func=func)
+        scheduler = Scheduler([job], state_dir=tmp_path)
+        assert not scheduler.run_job(job)
+        state = scheduler.state("job")
+        assert state.failures == 1
+        assert state.last_error == "RuntimeError()"
+
+    def test_locked(self, *, tmp_path: Path) -> None:
+        runs: list[int] = []
+        job = Job(
+            name="a job", schedule=Schedule.parse("60"), func=lambda: runs.append(1)
+        )
+        scheduler = Scheduler([job], state_dir=tmp_path)
+        scheduler.lock_dir.mkdir(parents=True)
+        with scheduler.lock_dir.joinpath("a_job.lock").open("a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            assert not scheduler.run_job(job)
+        assert runs == []
+        assert scheduler.pending() == []
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from pytest import fixture, raises
+from typed_settings import Secret
+
+from restic.repo import Local
+from restic.session import RepoSession
+
+if TYPE_CHECKING:
+    from pytest import MonkeyPatch
+
+
+_FAKE_RESTIC = """\
+import os, sys
+from pathlib import Path
+repo = Path(os.environ["RESTIC_REPOSITORY"].removeprefix("local:"))
+with open(os.environ["FAKE_RESTIC_LOG"], "a") as fh:
+    fh.write(sys.argv[1] + "\\n")
+if sys.argv[1] == "init":
+    repo.mkdir(parents=True)
+    repo.joinpath("config").touch()
+elif not repo.joinpath("config").exists():
+    sys.stderr.write("Is there a repository at the following location?\\n")
+    sys.exit(10)
+"""
+
+
+@fixture
+def log(*, monkeypatch: MonkeyPatch, tmp_path: Path) -> Path:
+    bin_ = tmp_path.joinpath("bin")
+    bin_.mkdir()
+    restic = bin_.joinpath("restic")
+    _ = restic.write_text(f"#!{sys.executable}\n{_FAKE_RESTIC}")
+    restic.chmod(0o755)
+    log = tmp_path.joinpath("log")
+    monkeypatch.setenv("PATH", f"{bin_}:{Path(sys.executable).parent}")
+    monkeypatch.setenv("FAKE_RESTIC_LOG", str(log))
+    return log
+
+
+class TestRepoSession:
+    def test_password_file(self, *, tmp_path: Path) -> None:
+        session = RepoSession(
+            Local(tmp_path.joinpath("repo")), password=Secret("password"), init=False
+        )
+        with session:
+            path = session.password_file
+            assert path.read_text() == "password"
+            assert session.env["RESTIC_PASSWORD_FILE"] == str(path)
+            assert session.password_file == path
+        assert not path.exists()
+        assert session.env == {}
+
+    def test_not_open(self, *, tmp_path: Path) -> None:
+        session = RepoSession(Local(tmp_path.joinpath("repo")), init=False)
+        with raises(RuntimeError, match=r"Session for '.*' is not open"):
+            _ = session.password_file
+
+    def test_probe_missing(self, *, log: Path, tmp_path: Path) -> None:
+        with RepoSession(Local(tmp_path.joinpath("repo")), init=False) as session:
+            assert not session.exists
+            assert not session.exists
+        assert log.read_text().splitlines() == ["cat"]
+
+    def test_probe_present(self, *, log: Path, tmp_path: Path) -> None:
+        repo = tmp_path.joinpath("repo")
+        repo.mkdir()
+        repo.joinpath("config").touch()
+        with RepoSession(Local(repo), init=False) as session:
+            assert session.exists
+        assert log.read_text().splitlines() == ["cat"]
+
+    def test_init(self, *, log: Path, tmp_path: Path) -> None:
+        repo = tmp_path.joinpath("repo")
+        with RepoSession(Local(repo)) as session:
+            assert session.exists
+        assert repo.joinpath("config").exists()
+        assert log.read_text().splitlines() == ["cat", "init"]
+
+    def test_init_existing(self, *, log: Path, tmp_path: Path) -> None:
+        repo = tmp_path.joinpath("repo")
+        repo.mkdir()
+        repo.joinpath("config").touch()
+        with RepoSession(Local(repo)):
+            pass
+        assert log.read_text().splitlines() == ["cat"]
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import sys
+from importlib import import_module
+from inspect import getmembers, isfunction, signature
+from subprocess import check_output
+from typing import TYPE_CHECKING
+
+from pytest import mark, param, raises
+from typed_settings import load_settings
+
+from restic.settings import (
+    SETTINGS,
+    BackupSettings,
+    CacheSettings,
+    Settings,
+    WarmSettings,
+    get_loaders,
+    get_settings,
+    resolve_settings,
+)
+
+if TYPE_CHECKING:
+    from pytest import MonkeyPatch
+
+
+class TestGetSettings:
+    def test_ignores_unrelated_env(self, *, monkeypatch: MonkeyPatch) -> None:
+        first = get_settings()
+        monkeypatch.setenv("RESTIC_PASSWORD_FILE", "/tmp/password")  # noqa: S108
+        assert get_settings() is first
+
+    def test_reloads_on_settings_env(self, *, monkeypatch: MonkeyPatch) -> None:
+        monkeypatch.setenv("DRY_RUN", "true")
+        assert get_settings().dry_run
+
+
+class TestResolveSettings:
+    def test_main(self, *, monkeypatch: MonkeyPatch) -> None:
+        @resolve_settings
+        def func(*, dry_run: bool = SETTINGS.dry_run) -> bool:
+            return dry_run
+
+        assert not func()
+        monkeypatch.setenv("DRY_RUN", "true")
+        assert func()
+        assert not func(dry_run=False)
+
+    def test_positional(self) -> None:
+        with raises(TypeError, match=r"must be keyword-only"):
+
+            @resolve_settings
+            def _(dry_run: bool = SETTINGS.dry_run) -> bool:  # noqa: FBT001
+                return dry_run
+
+    def test_unresolved(self) -> None:
+        with raises(RuntimeError, match=r"'dry_run' was used unresolved"):
+            _ = bool(SETTINGS.dry_run)
+
+    @mark.parametrize(
+        "module",
+        [
+            param("restic.aio"),
+            param("restic.lib"),
+            param("restic.metrics"),
+            param("restic.repo"),
+            param("restic.retry"),
+            param("restic.utilities"),
+        ],
+    )
+    def test_decorated(self, *, module: str) -> None:
+        for name, func in getmembers(import_module(module), isfunction):
+            params = signature(func, follow_wrapped=False).parameters.values()
+            if any(type(p.default).__name__ == "_FromSettings" for p in params):
+                assert hasattr(func, "__wrapped__"), name
+
+    @mark.parametrize("module", [param("restic.cli"), param("restic.lib")])
+    def test_lazy(self, *, module: str) -> None:
+        code = f"import {module}, restic.settings as s; print(s._load_settings.cache_info().currsize)"
+        assert check_output([sys.executable, "-c", code], text=True).strip() == "0"
+
+
+class TestSettings:
+    def test_progress_interval(self) -> None:
+        with raises(ValueError, match="progress_interval"):
+            _ = Settings(progress_interval=0)
+
+
+class TestCommandSettings:
+    @mark.parametrize(
+        "cls", [param(BackupSettings), param(CacheSettings), param(WarmSettings)]
+    )
+    def test_restic_cache_dir(self, *, cls: type, monkeypatch: MonkeyPatch) -> None:
+        monkeypatch.setenv("RESTIC_CACHE_DIR", "/tmp/restic-cache")  # noqa: S108
+        settings = load_settings(cls, get_loaders())
+        assert settings.restic_cache_dir == "/tmp/restic-cache"  # noqa: S108
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+from pytest import raises
+
+from restic.sharding import get_unit_sizes, plan_shards
+
+
+class TestGetUnitSizes:
+    def test_main(self) -> None:
+        nodes = [
+            {"path": "/data", "type": "dir"},
+            {"path": "/data/a", "type": "dir"},
+            {"path": "/data/a/x", "type": "file", "size": 10},
+            {"path": "/data/a/y/z", "type": "file", "size": 5},
+            {"path": "/data/b", "type": "file", "size": 3},
+            {"path": "/data/c", "type": "dir"},
+            {"path": "/other/d", "type": "file", "size": 1},
+        ]
+        assert get_unit_sizes(nodes, ["/data/", "/other"]) == {
+            "/data/a": 15,
+            "/data/b": 3,
+            "/data/c": 0,
+            "/other/d": 1,
+        }
+
+    def test_root(self) -> None:
+        nodes = [{"path": "/a/b", "size": 1}, {"path": "/c", "size": 2}]
+        assert get_unit_sizes(nodes, ["/"]) == {"/a": 1, "/c": 2}
+
+    def test_single_file(self) -> None:
+        nodes = [
+            {"path": "/etc", "type": "dir"},
+            {"path": "/etc/hosts", "type": "file", "size": 7},
+        ]
+        assert get_unit_sizes(nodes, ["/etc/hosts"]) == {"/etc/hosts": 7}
+
+    def test_no_units(self) -> None:
+        assert get_unit_sizes([{"path": "/data", "type": "dir"}], ["/data"]) == {}
+        assert plan_shards({}, n=4) == []
+
+
+class TestPlanShards:
+    def test_main(self) -> None:
+        sizes = {"a": 10, "b": 6, "c": 5, "d": 4, "e": 1}
+        assert plan_shards(sizes, n=2) == [["a", "d"], ["b", "c", "e"]]
+
+    def test_fewer_units(self) -> None:
+        assert plan_shards({"a": 1}, n=4) == [["a"]]
+
+    def test_error(self) -> None:
+        with raises(ValueError, match=r"Number of shards must be positive; got 0"):
+            _ = plan_shards({"a": 1}, n=0)
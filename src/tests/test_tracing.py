@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import json
+from subprocess import CalledProcessError
+from typing import TYPE_CHECKING
+
+from pytest import raises
+
+from restic.results import time_phase
+from restic.tracing import (
+    ChromeTraceSink,
+    Span,
+    add_sink,
+    remove_sink,
+    span,
+    summarize_argv,
+    trace_subprocess,
+    traced,
+)
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+class TestChromeTraceSink:
+    def test_main(self, *, tmp_path: Path) -> None:
+        path = tmp_path.joinpath("trace.json")
+        sink = ChromeTraceSink(path)
+        add_sink(sink)
+        try:
+            with span("backup", category="operation", repo="/repo"):
+                timings: dict[str, float] = {}
+                with time_phase(timings, "permissions"):
+                    pass
+        finally:
+            remove_sink(sink)
+        data = json.loads(path.read_text())
+        events = data["traceEvents"]
+        assert [e["name"] for e in events] == ["permissions", "backup"]
+        assert all(e["ph"] == "X" for e in events)
+        assert events[1]["args"] == {"repo": "/repo"}
+        assert events[1]["ts"] <= events[0]["ts"]
+        assert set(timings) == {"permissions"}
+
+    def test_flushes_on_root_spans_only(self, *, tmp_path: Path) -> None:
+        path = tmp_path.joinpath("trace.json")
+        sink = ChromeTraceSink(path)
+        add_sink(sink)
+        try:
+            with span("outer"):
+                with span("inner"):
+                    pass
+                assert not path.exists()
+        finally:
+            remove_sink(sink)
+        assert path.exists()
+
+    def test_max_events(self, *, tmp_path: Path) -> None:
+        path = tmp_path.joinpath("trace.json")
+        sink = ChromeTraceSink(path, max_events=2)
+        add_sink(sink)
+        try:
+            for i in range(3):
+                with span(f"span{i}"):
+                    pass
+        finally:
+            remove_sink(sink)
+        events = json.loads(path.read_text())["traceEvents"]
+        assert [e["name"] for e in events] == ["span1", "span2"]
+
+
+class TestSpan:
+    def test_no_sinks(self) -> None:
+        with span("phase", repo="/repo") as attrs:
+            attrs["exit_code"] = 0
+        assert attrs == {"repo": "/repo", "exit_code": 0}
+
+    def test_error(self) -> None:
+        spans: list[Span] = []
+        add_sink(spans.append)
+        try:
+            with raises(ValueError, match="boom"), span("phase"):
+                msg = "boom"
+                raise ValueError(msg)
+        finally:
+            remove_sink(spans.append)
+        (span_,) = spans
+        assert span_.attrs == {"error": "ValueError('boom')"}
+        assert span_.depth == 0
+
+
+class TestSummarizeArgv:
+    def test_short(self) -> None:
+        assert summarize_argv(["restic", "snapshots"]) == "restic snapshots"
+
+    def test_many(self) -> None:
+        result = summarize_argv(["restic", *map(str, range(10))])
+        assert result == "restic 0 1 2 3 4 5 6 ... (+3)"
+
+    def test_long(self) -> None:
+        result = summarize_argv(["restic", "x" * 500])
+        assert len(result) == 200
+        assert result.endswith("...")
+
+
+class TestTraceSubprocess:
+    def test_success(self) -> None:
+        spans: list[Span] = []
+        add_sink(spans.append)
+        try:
+            with trace_subprocess(["restic", "init"], repo="/repo"):
+                pass
+        finally:
+            remove_sink(spans.append)
+        (span_,) = spans
+        assert span_.name == "restic"
+        assert span_.category == "subprocess"
+        assert span_.attrs == {"argv": "restic init", "repo": "/repo", "exit_code": 0}
+
+    def test_failure(self) -> None:
+        spans: list[Span] = []
+        add_sink(spans.append)
+        try:
+            with raises(CalledProcessError), trace_subprocess(["restic", "init"]):
+                raise CalledProcessError(11, ["restic", "init"])
+        finally:
+            remove_sink(spans.append)
+        (span_,) = spans
+        assert span_.attrs["exit_code"] == 11
+
+
+class TestTraced:
+    def test_main(self) -> None:
+        @traced("double")
+        def double(x: int, /) -> int:
+            return 2 * x
+
+        spans: list[Span] = []
+        add_sink(spans.append)
+        try:
+            assert double(2) == 4
+        finally:
+            remove_sink(spans.append)
+        (span_,) = spans
+        assert span_.name == "double"
+        assert span_.category == "operation"
+        assert span_.attrs == {"args": ["2"]}
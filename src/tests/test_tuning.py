@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import json
+from functools import partial
+from typing import TYPE_CHECKING
+
+import restic.tuning
+from restic.tuning import (
+    _DEFAULTS,
+    CANDIDATES,
+    calibrate,
+    get_device,
+    resolve_read_concurrency,
+)
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from pytest import MonkeyPatch
+
+
+class TestCalibrate:
+    def test_main(self, *, tmp_path: Path) -> None:
+        for i in range(20):
+            _ = tmp_path.joinpath(f"file-{i}").write_bytes(b"x" * 4096)
+        result = calibrate(tmp_path, candidates=[1, 2], probe_bytes=8192)
+        assert result.read_concurrency in {1, 2}
+        assert set(result.throughput) == {1, 2}
+        assert result.complete
+
+    def test_partial(self, *, tmp_path: Path) -> None:
+        _ = tmp_path.joinpath("file").write_bytes(b"x" * 4096)
+        result = calibrate(tmp_path, candidates=[1, 2], probe_bytes=8192)
+        assert set(result.throughput) == {1}
+        assert not result.complete
+        assert result.read_concurrency == _DEFAULTS[get_device(tmp_path).kind]
+
+    def test_empty(self, *, tmp_path: Path) -> None:
+        result = calibrate(tmp_path)
+        assert result.throughput == {}
+        assert not result.complete
+        assert result.read_concurrency == _DEFAULTS[get_device(tmp_path).kind]
+
+
+class TestGetDevice:
+    def test_main(self, *, tmp_path: Path) -> None:
+        device = get_device(tmp_path)
+        assert device.kind in {"hdd", "ssd", "network", "unknown"}
+        assert device == get_device(tmp_path)
+
+
+class TestResolveReadConcurrency:
+    def test_cached(self, *, tmp_path: Path) -> None:
+        data = tmp_path.joinpath("data")
+        data.mkdir()
+        cache = tmp_path.joinpath("cache")
+        device = get_device(data)
+        cache.mkdir()
+        calibration = {
+            "device": device.id,
+            "kind": device.kind,
+            "path": str(data),
+            "read_concurrency": 3,
+        }
+        _ = cache.joinpath("tuning.json").write_text(
+            json.dumps({"version": 1, "devices": {device.id: calibration}})
+        )
+        assert resolve_read_concurrency([data], cache_dir=cache) == 3
+
+    def test_recalibrate(self, *, tmp_path: Path, monkeypatch: MonkeyPatch) -> None:
+        monkeypatch.setattr(
+            restic.tuning, "calibrate", partial(calibrate, probe_bytes=1)
+        )
+        data = tmp_path.joinpath("data")
+        data.mkdir()
+        for i in range(len(CANDIDATES)):
+            _ = data.joinpath(f"file-{i}").write_bytes(b"x")
+        cache = tmp_path.joinpath("cache")
+        first = resolve_read_concurrency([data], cache_dir=cache)
+        assert first in CANDIDATES
+        assert cache.joinpath("tuning.json").exists()
+        assert resolve_read_concurrency([data], cache_dir=cache, recalibrate=True) in (
+            CANDIDATES
+        )
+
+    def test_partial_not_cached(self, *, tmp_path: Path) -> None:
+        data = tmp_path.joinpath("data")
+        data.mkdir()
+        _ = data.joinpath("file").write_bytes(b"x")
+        cache = tmp_path.joinpath("cache")
+        result = resolve_read_concurrency([data, data], cache_dir=cache)
+        assert result == _DEFAULTS[get_device(data).kind]
+        assert not cache.joinpath("tuning.json").exists()
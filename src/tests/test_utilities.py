@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from hypothesis import given
+from hypothesis.strategies import integers, lists
+from pytest import mark, param, raises
+from utilities.hypothesis import paths
+
+from restic.utilities import group_paths, parse_size, to_paths
+
+
+class TestGroupPaths:
+    @given(paths_=lists(paths(), min_size=1), n=integers(min_value=1, max_value=10))
+    def test_main(self, *, paths_: list[Path], n: int) -> None:
+        groups = group_paths(list(paths_), n=n)
+        assert len(groups) == min(n, len(paths_))
+        assert all(len(g) >= 1 for g in groups)
+        assert [p for g in groups for p in g] == paths_
+        sizes = {len(g) for g in groups}
+        assert max(sizes) - min(sizes) <= 1
+
+    @given(paths_=lists(paths(), min_size=1))
+    def test_none(self, *, paths_: list[Path]) -> None:
+        assert group_paths(list(paths_)) == [paths_]
+
+    def test_error(self) -> None:
+        with raises(ValueError, match=r"Number of groups must be positive; got 0"):
+            _ = group_paths([Path("path")], n=0)
+
+
+class TestParseSize:
+    @mark.parametrize(
+        ("text", "expected"),
+        [
+            param("0 B", 0),
+            param("512", 512),
+            param("1.5 KiB", 1536),
+            param("10G", 10 * 1024**3),
+            param("2 tib", 2 * 1024**4),
+        ],
+    )
+    def test_main(self, *, text: str, expected: int) -> None:
+        assert parse_size(text) == expected
+
+    def test_error(self) -> None:
+        with raises(ValueError, match=r"Invalid size '5%'"):
+            _ = parse_size("5%")
+
+
+class TestToPaths:
+    def test_single(self) -> None:
+        assert to_paths(Path("path")) == [Path("path")]
+
+    def test_many(self) -> None:
+        assert to_paths((Path("a"), "b")) == [Path("a"), "b"]
+
+    def test_error(self) -> None:
+        with raises(ValueError, match=r"At least one path is required"):
+            _ = to_paths([])
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import sys
+from hashlib import sha256
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from pytest import fixture, raises
+
+from restic.verify import hash_file, sample_files, verify_files
+
+if TYPE_CHECKING:
+    from pytest import MonkeyPatch
+
+
+class TestHashFile:
+    def test_main(self, *, tmp_path: Path) -> None:
+        path = tmp_path.joinpath("file")
+        _ = path.write_bytes(b"data")
+        assert hash_file(path) == sha256(b"data").hexdigest()
+
+    def test_empty(self, *, tmp_path: Path) -> None:
+        path = tmp_path.joinpath("file")
+        path.touch()
+        assert hash_file(path) == sha256().hexdigest()
+
+
+class TestSampleFiles:
+    def test_main(self) -> None:
+        nodes = [{"path": f"/{i}", "type": "file"} for i in range(100)]
+        nodes.append({"path": "/dir", "type": "dir"})
+        sample = sample_files(nodes, fraction=0.1, seed=0)
+        assert len(sample) == 10
+        assert all(n["type"] == "file" for n in sample)
+        assert sample == sample_files(nodes, fraction=0.1, seed=0)
+
+    def test_at_least_one(self) -> None:
+        nodes = [{"path": "/a", "type": "file"}]
+        assert sample_files(nodes, fraction=0.01) == nodes
+        assert sample_files(nodes, fraction=0.0) == []
+
+    def test_error(self) -> None:
+        with raises(ValueError, match=r"between 0 and 1; got 2"):
+            _ = sample_files([], fraction=2)
+
+
+_FAKE_RESTIC = """\
+#!{executable}
+import os, re, shutil, sys
+from pathlib import Path
+
+args = sys.argv[1:]
+with open(os.environ["FAKE_RESTIC_LOG"], "a") as fh:
+    _ = fh.write(" ".join(args[:3]) + "\\n")
+if os.environ.get("FAKE_RESTIC_FAIL"):
+    sys.exit(1)
+snapshot = Path(os.environ["FAKE_SNAPSHOT"])
+if "restore" in args:
+    include = Path(args[args.index("--include-file") + 1])
+    target = Path(args[args.index("--target") + 1])
+    for line in include.read_text().splitlines():
+        path = re.sub(r"\\\\(.)", r"\\1", line).lstrip("/")
+        dest = target.joinpath(path)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        _ = shutil.copyfile(snapshot.joinpath(path), dest)
+elif "dump" in args:
+    _ = sys.stdout.buffer.write(snapshot.joinpath(args[-1].lstrip("/")).read_bytes())
+"""
+
+
+class TestVerifyFiles:
+    @fixture
+    def log(self, *, tmp_path: Path, monkeypatch: MonkeyPatch) -> Path:
+        bin_ = tmp_path.joinpath("bin")
+        bin_.mkdir()
+        script = bin_.joinpath("restic")
+        _ = script.write_text(_FAKE_RESTIC.format(executable=sys.executable))
+        script.chmod(0o755)
+        monkeypatch.setenv("PATH", f"{bin_}:{Path(sys.executable).parent}")
+        log = tmp_path.joinpath("log")
+        monkeypatch.setenv("FAKE_RESTIC_LOG", str(log))
+        monkeypatch.setenv("FAKE_SNAPSHOT", str(tmp_path.joinpath("snapshot")))
+        return log
+
+    def _write(self, root: Path, files: dict[str, bytes], /) -> list[dict[str, Any]]:
+        for name, data in files.items():
+            path = root.joinpath(name)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            _ = path.write_bytes(data)
+        return [{"path": f"/{n}", "size": len(d)} for n, d in files.items()]
+
+    def test_batched(self, *, tmp_path: Path, log: Path) -> None:
+        files = {"a": b"a", "dir/b*[1]": b"b", "c": b"c"}
+        nodes = self._write(tmp_path.joinpath("snapshot"), files)
+        _ = self._write(tmp_path.joinpath("target"), {**files, "c": b"x"})
+        result = verify_files("abc", nodes, tmp_path.joinpath("target"), batch_size=2)
+        assert result == ["/c"]
+        assert log.read_text().splitlines() == ["--json restore --no-lock"] * 2
+
+    def test_restore_failure(
+        self, *, tmp_path: Path, log: Path, monkeypatch: MonkeyPatch
+    ) -> None:
+        nodes = self._write(tmp_path.joinpath("target"), {"a": b"a", "b": b"b"})
+        monkeypatch.setenv("FAKE_RESTIC_FAIL", "1")
+        result = verify_files("abc", nodes, tmp_path.joinpath("target"))
+        assert result == ["/a", "/b"]
+        assert len(log.read_text().splitlines()) == 1
+
+    def test_dump(self, *, tmp_path: Path, log: Path) -> None:
+        files = {"$HOME": b"a", "b ": b"b"}
+        nodes = self._write(tmp_path.joinpath("snapshot"), files)
+        _ = self._write(tmp_path.joinpath("target"), files)
+        assert verify_files("abc", nodes, tmp_path.joinpath("target")) == []
+        assert log.read_text().splitlines() == ["dump --no-lock abc"] * 2
+
+    def test_dump_failure(
+        self, *, tmp_path: Path, log: Path, monkeypatch: MonkeyPatch
+    ) -> None:
+        nodes = self._write(tmp_path.joinpath("target"), {"$HOME": b"a"})
+        monkeypatch.setenv("FAKE_RESTIC_FAIL", "1")
+        assert verify_files("abc", nodes, tmp_path.joinpath("target")) == ["/$HOME"]
+        assert log.read_text().splitlines() == ["dump --no-lock abc"]
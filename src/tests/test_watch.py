@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+from threading import Event
+from typing import TYPE_CHECKING
+
+from pytest import mark, param
+
+from restic.watch import Debouncer, Inotify, collapse_subtrees, is_excluded, watch
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+class TestCollapseSubtrees:
+    def test_main(self) -> None:
+        paths = ["/a/b", "/a", "/c/d", "/c/de", "/c/d/e"]
+        assert collapse_subtrees(paths) == ["/a", "/c/d", "/c/de"]
+
+
+class TestDebouncer:
+    def test_debounce(self) -> None:
+        debouncer = Debouncer(debounce=10, min_interval=0, max_interval=100)
+        assert debouncer.wait_time(now=0) is None
+        debouncer.record(["/a"], now=0)
+        debouncer.record(["/a/b"], now=5)
+        assert not debouncer.due(now=14)
+        assert debouncer.due(now=15)
+        assert debouncer.take(now=15) == ["/a"]
+        assert not debouncer.due(now=100)
+
+    def test_max_interval(self) -> None:
+        debouncer = Debouncer(debounce=10, min_interval=0, max_interval=30)
+        for now in range(0, 31, 5):
+            debouncer.record(["/a"], now=now)
+        assert debouncer.due(now=30)
+
+    def test_min_interval(self) -> None:
+        debouncer = Debouncer(debounce=10, min_interval=60, max_interval=30)
+        debouncer.record(["/a"], now=0)
+        _ = debouncer.take(now=10)
+        debouncer.record(["/a"], now=11)
+        assert not debouncer.due(now=30)
+        assert debouncer.wait_time(now=30) == 40
+        assert debouncer.due(now=70)
+
+
+class TestInotify:
+    def test_main(self, *, tmp_path: Path) -> None:
+        tmp_path.joinpath("dir").mkdir()
+        tmp_path.joinpath("skip").mkdir()
+        with Inotify(exclude=["skip"]) as inotify:
+            inotify.add_root(tmp_path)
+            assert inotify.watches == 2
+            _ = tmp_path.joinpath("dir", "file").write_text("data")
+            _ = tmp_path.joinpath("skip", "file").write_text("data")
+            changed = inotify.read(timeout=1.0)
+        assert set(changed) == {str(tmp_path.joinpath("dir"))}
+
+    def test_new_dir(self, *, tmp_path: Path) -> None:
+        with Inotify() as inotify:
+            inotify.add_root(tmp_path)
+            tmp_path.joinpath("dir").mkdir()
+            assert inotify.read(timeout=1.0) == [str(tmp_path)]
+            assert inotify.watches == 2
+
+
+class TestIsExcluded:
+    @mark.parametrize(
+        ("path", "pattern", "expected"),
+        [
+            param("/home/user/.cache", ".cache", True),
+            param("/home/user/.cache/x", ".cache", True),
+            param("/home/user/file.tmp", "*.tmp", True),
+            param("/home/user/file.txt", "*.tmp", False),
+            param("/home/user/.cache", "/home/*/.cache", True),
+            param("/srv/home/user/.cache", "/home/*/.cache", False),
+        ],
+    )
+    def test_main(self, *, path: str, pattern: str, expected: bool) -> None:
+        assert is_excluded(path, [pattern]) is expected
+
+    def test_case_insensitive(self) -> None:
+        assert not is_excluded("/a/FILE.TMP", ["*.tmp"])
+        assert is_excluded("/a/FILE.TMP", ["*.tmp"], case_insensitive=True)
+
+
+class TestWatch:
+    def test_initial_run(self, *, tmp_path: Path) -> None:
+        stop = Event()
+        runs: list[int] = []
+
+        def func() -> None:
+            runs.append(1)
+            stop.set()
+
+        watch([tmp_path], func, stop=stop)
+        assert runs == [1]
+
+    def test_change(self, *, tmp_path: Path) -> None:
+        stop = Event()
+        runs: list[int] = []
+
+        def func() -> None:
+            runs.append(1)
+            if len(runs) == 1:
+                _ = tmp_path.joinpath("file").write_text("data")
+            else:
+                stop.set()
+
+        watch([tmp_path], func, debounce=0, min_interval=0, stop=stop)
+        assert runs == [1, 1]